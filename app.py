@@ -3,7 +3,25 @@ import pandas as pd
 import json
 from pathlib import Path
 import logging
+import numpy as np
 from utils.scene_detection import detect_scenes_streamlit, validate_video_file, get_sample_scenes
+from utils.scene_grouping import (compute_shot_signatures, propose_groups, apply_grouping, merge_scene_range,
+                                  renumber_scenes, split_scene_at)
+from utils.video_proxy import start_proxy, get_playback_url, get_proxy_status, get_proxy_server, video_cache_key
+from utils.project_store import ProjectStore
+from utils.bulk_operations import preview_rule, apply_rule
+from utils.keyframe_index import get_keyframe_index
+from utils.graph_sink import get_graph_sink
+from utils.semantic_search import get_semantic_index, scene_text
+from utils.audio_analysis import start_audio_analysis, load_audio_candidates, attach_boundary_hints
+from utils.face_detection import (detect_faces, cluster_faces, scene_clusters, suggest_characters,
+                                  face_detection_unavailable)
+from utils.speculative_detection import start_speculative_detection, get_speculative_job, cancel_speculative_detection
+from utils.filmstrip import start_sprites, load_sprite_index, sprite_dir_for
+from components.filmstrip import render_filmstrip_minimap
+
+# Grupos de caras mostrados para etiquetar (los más frecuentes)
+MAX_FACE_CLUSTERS = 24
 
 # Configuración de la página
 st.set_page_config(
@@ -37,8 +55,43 @@ def load_characters_data():
             ]
         }
 
+@st.cache_resource
+def get_project_store():
+    """Devuelve el almacén SQLite del proyecto, compartido entre sesiones."""
+    return ProjectStore()
+
+def reindex_episode():
+    """Sincroniza el índice semántico con las escenas guardadas del episodio actual."""
+    episode_id = st.session_state.episode_id
+    changed = get_semantic_index().sync_episode(episode_id, get_project_store().load_scenes(episode_id))
+    print(f"[TERMINAL SEARCH] 🔎 Índice semántico sincronizado: {changed} escenas actualizadas")
+
+def get_character_names(characters_data):
+    """Extrae la lista ordenada de nombres de personajes del JSON (o del fallback)."""
+    names = set()
+    
+    def collect(node):
+        if isinstance(node, dict):
+            if 'name' in node and isinstance(node['name'], str):
+                names.add(node['name'])
+            else:
+                for value in node.values():
+                    collect(value)
+        elif isinstance(node, list):
+            for item in node:
+                collect(item)
+        elif isinstance(node, str):
+            names.add(node)
+    
+    collect(characters_data)
+    return sorted(names)
+
 def initialize_session_state():
     """Inicializa el estado de la sesión con valores por defecto."""
+    # Solo en el primer run de la sesión; los reruns posteriores no tocan nada
+    if st.session_state.get('state_initialized'):
+        return
+    
     print("[TERMINAL INIT] 🔧 Inicializando session state...")
     
     if 'video_file' not in st.session_state:
@@ -77,8 +130,87 @@ def initialize_session_state():
         st.session_state.video_info = None
         print("[TERMINAL INIT] ✅ video_info inicializado")
     
+    if 'shot_signatures' not in st.session_state:
+        st.session_state.shot_signatures = None
+        print("[TERMINAL INIT] ✅ shot_signatures inicializado")
+    
+    if 'episode_id' not in st.session_state:
+        st.session_state.episode_id = None
+        print("[TERMINAL INIT] ✅ episode_id inicializado")
+    
+    if 'face_analysis' not in st.session_state:
+        st.session_state.face_analysis = None
+        print("[TERMINAL INIT] ✅ face_analysis inicializado")
+    
+    if 'scenes_version' not in st.session_state:
+        st.session_state.scenes_version = 0
+        print("[TERMINAL INIT] ✅ scenes_version inicializado")
+    
+    if 'audio_hints_version' not in st.session_state:
+        st.session_state.audio_hints_version = -1
+        print("[TERMINAL INIT] ✅ audio_hints_version inicializado")
+    
+    st.session_state.state_initialized = True
+    
     print(f"[TERMINAL INIT] 🏁 Estado final: analysis_completed={st.session_state.analysis_completed}, scenes={len(st.session_state.scenes)}")
 
+def set_scenes(scenes):
+    """Reemplaza la lista de escenas e invalida las vistas derivadas."""
+    st.session_state.scenes = scenes
+    st.session_state.scenes_version += 1
+    st.session_state.face_analysis = None
+
+def get_scenes_dataframe():
+    """Devuelve el DataFrame de la tabla de escenas, memoizado por scenes_version."""
+    cached = st.session_state.get('scenes_df_cache')
+    if cached is not None and cached[0] == st.session_state.scenes_version:
+        return cached[1]
+    
+    df_display = pd.DataFrame(
+        [(s['id'], s['start_timecode'], s['end_timecode'], s['duration'], format_audio_hints(s))
+         for s in st.session_state.scenes],
+        columns=['id', 'start', 'end', 'duration_s', 'audio']
+    )
+    st.session_state.scenes_df_cache = (st.session_state.scenes_version, df_display)
+    return df_display
+
+def format_audio_hints(scene):
+    """Resume las pistas de audio del corte inicial de una escena (ej. '🔇 0.8s 🎵 +14dB')."""
+    labels = []
+    for hint in scene.get('audio_hints', []):
+        if hint['kind'] == 'silence':
+            labels.append(f"🔇 {hint['strength']:.1f}s")
+        else:
+            labels.append(f"🎵 +{hint['strength']:.0f}dB")
+    return ' '.join(labels)
+
+def apply_audio_hints():
+    """Añade las pistas de audio a las escenas en cuanto termina el análisis de audio."""
+    if st.session_state.audio_hints_version == st.session_state.scenes_version or not st.session_state.video_path:
+        return
+    candidates = load_audio_candidates(st.session_state.video_path)
+    if candidates is None:
+        return  # La pasada de audio sigue en marcha
+    attach_boundary_hints(st.session_state.scenes, candidates)
+    # Invalida la tabla memoizada sin pasar por set_scenes (las escenas no cambian)
+    st.session_state.scenes_version += 1
+    st.session_state.audio_hints_version = st.session_state.scenes_version
+    hinted = sum(1 for scene in st.session_state.scenes if scene['audio_hints'])
+    print(f"[TERMINAL AUDIO] 🎧 {hinted} cortes con pistas de audio")
+
+def on_threshold_change():
+    """Relanza la detección especulativa con el nuevo umbral del slider."""
+    if st.session_state.video_path and not st.session_state.analysis_completed:
+        start_speculative_detection(st.session_state.video_path, st.session_state.threshold_slider)
+
+def load_keyframe_index():
+    """Devuelve el índice de keyframes del video actual (None si no se puede construir)."""
+    try:
+        return get_keyframe_index(st.session_state.video_path)
+    except RuntimeError as e:
+        logging.warning(f"Índice de keyframes no disponible: {e}")
+        return None
+
 def render_sidebar():
     """Renderiza la barra lateral con configuración del episodio."""
     st.sidebar.title("🎬 ST Scene Curat-o-matic")
@@ -109,6 +241,10 @@ def render_sidebar():
             import tempfile
             import os
             
+            # El video anterior ya no necesita su detección especulativa
+            if st.session_state.video_path:
+                cancel_speculative_detection(st.session_state.video_path)
+            
             # Crear archivo temporal con nombre único
             temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f"_{uploaded_file.name}")
             temp_path = temp_file.name
@@ -120,6 +256,27 @@ def render_sidebar():
             st.session_state.video_file = uploaded_file
             st.session_state.video_path = temp_path
             st.session_state.analysis_completed = False  # Reset analysis solo para archivo nuevo
+            st.session_state.shot_signatures = None
+            st.session_state.face_analysis = None
+            
+            # Transcodificar el proxy de reproducción en segundo plano (una sola vez)
+            start_proxy(temp_path)
+            start_sprites(temp_path)
+            start_audio_analysis(temp_path)
+            
+            # Restaurar el proyecto guardado si este episodio ya se curó antes
+            store = get_project_store()
+            st.session_state.episode_id = store.get_or_create_episode(video_cache_key(temp_path), uploaded_file.name)
+            if store.has_scenes(st.session_state.episode_id):
+                set_scenes(store.load_scene_summaries(st.session_state.episode_id))
+                reindex_episode()
+                st.session_state.selected_scene_id = None
+                st.session_state.analysis_completed = True
+                print(f"[TERMINAL SIDEBAR] 💾 Proyecto restaurado: {len(st.session_state.scenes)} escenas")
+                st.sidebar.info(f"💾 Proyecto restaurado con {len(st.session_state.scenes)} escenas")
+            else:
+                # Adelantar la detección mientras el usuario ajusta el umbral
+                start_speculative_detection(temp_path, st.session_state.get('threshold_slider', 27))
             print(f"[TERMINAL SIDEBAR] ✅ Archivo nuevo guardado, analysis_completed reseteado a False")
             
             st.sidebar.success(f"✅ Archivo cargado: {uploaded_file.name}")
@@ -134,6 +291,8 @@ def render_sidebar():
         min_value=10,
         max_value=50,
         value=27,
+        key="threshold_slider",
+        on_change=on_threshold_change,
         help="Valor más bajo = más escenas detectadas. Valor más alto = menos escenas."
     )
     
@@ -161,6 +320,16 @@ def render_sidebar():
                 print(f"[TERMINAL APP] ✅ Archivo de video validado correctamente")
                 st.write("✅ Archivo de video validado correctamente")
                 try:
+                    # Unirse a la detección especulativa si ya está en marcha con este umbral
+                    job = get_speculative_job(st.session_state.video_path, threshold)
+                    if job is not None and job.running:
+                        print(f"[TERMINAL APP] ⏳ Esperando a la detección especulativa en curso...")
+                        status_text = st.empty()
+                        with st.spinner("Completando el análisis iniciado al cargar el video..."):
+                            job.wait(lambda message: status_text.text(message))
+                    # Liberar la CPU de pasadas con otros umbrales
+                    cancel_speculative_detection(st.session_state.video_path)
+                    
                     print(f"[TERMINAL APP] 🚀 Iniciando detección de escenas...")
                     st.write("🚀 Iniciando detección de escenas...")
                     
@@ -180,7 +349,12 @@ def render_sidebar():
                     if scenes:
                         print(f"[TERMINAL APP] ✅ Guardando escenas en session_state...")
                         st.write("✅ Guardando escenas en session_state...")
-                        st.session_state.scenes = scenes
+                        set_scenes(scenes)
+                        st.session_state.shot_signatures = None
+                        get_project_store().replace_scenes(
+                            st.session_state.episode_id, scenes, 'detect', threshold
+                        )
+                        reindex_episode()
                         print(f"[TERMINAL APP] ✅ Escenas guardadas: {len(st.session_state.scenes)} elementos")
                         
                         st.session_state.analysis_completed = True
@@ -214,13 +388,8 @@ def render_sidebar():
 
 # Función handle_scene_merging eliminada - será reemplazada por herramientas de edición
 
-def render_timeline_chips(scenes):
-    """Renderiza la timeline horizontal con chips clickeables para cada escena"""
-    if not scenes:
-        st.info("No hay escenas para mostrar")
-        return
-    
-    # CSS personalizado para los chips
+def inject_styles():
+    """Inyecta el CSS de la app (una vez por run completo, fuera de los fragments)."""
     st.markdown("""
     <style>
     .chip-button {
@@ -257,6 +426,23 @@ def render_timeline_chips(scenes):
     </style>
     """, unsafe_allow_html=True)
     
+
+
+def chip_scene_id(scene_idx):
+    """ID de selección de una escena ('scene_N', N desde 1), el mismo en chips, minimapa y búsqueda."""
+    return f"scene_{scene_idx + 1}"
+
+def select_scene(scene_id):
+    """Callback de los chips: cambia la escena seleccionada."""
+    st.session_state.selected_scene_id = scene_id
+
+
+def render_timeline_chips(scenes):
+    """Renderiza la timeline horizontal con chips clickeables para cada escena"""
+    if not scenes:
+        st.info("No hay escenas para mostrar")
+        return
+    
     st.markdown("**🎞️ Selecciona una escena:**")
     
     # Crear columnas para los chips
@@ -270,7 +456,7 @@ def render_timeline_chips(scenes):
             scene_idx = i + j
             if scene_idx < num_scenes:
                 scene = scenes[scene_idx]
-                scene_id = f"scene_{scene_idx + 1}"
+                scene_id = chip_scene_id(scene_idx)
                 duration = scene['end_time'] - scene['start_time']
                 
                 with cols[j]:
@@ -279,14 +465,455 @@ def render_timeline_chips(scenes):
                     
                     # Crear el botón chip
                     button_key = f"chip_{scene_idx}"
-                    if st.button(
+                    # El callback cambia la selección y el fragment se re-ejecuta solo
+                    st.button(
                         f"Escena {scene_idx + 1}\n{duration:.1f}s",
                         key=button_key,
                         disabled=is_selected,
-                        help=f"Tiempo: {scene['start_time']:.1f}s - {scene['end_time']:.1f}s\nConfianza: {scene['confidence']:.2f}"
-                    ):
-                        st.session_state.selected_scene_id = scene_id
-                        st.rerun()
+                        help=f"Tiempo: {scene['start_time']:.1f}s - {scene['end_time']:.1f}s\nEstado: {scene.get('status', 'detected')}\nAudio: {format_audio_hints(scene) or '—'}",
+                        on_click=select_scene,
+                        args=(scene_id,)
+                    )
+
+def get_page_url():
+    """URL de la app tal como la ve el navegador (para las URLs del servidor de proxies)."""
+    url = getattr(st.context, 'url', None)
+    if url:
+        return url
+    host = st.context.headers.get('Host')
+    return f"http://{host}" if host else None
+
+def render_video_player():
+    """Renderiza el reproductor apuntando a la URL del servidor local de proxies."""
+    # st.video con una URL solo envía la URL; el navegador pide los bytes por rangos
+    st.video(get_playback_url(st.session_state.video_path, page_url=get_page_url()))
+    
+    status = get_proxy_status(st.session_state.video_path)
+    if status == 'running':
+        st.caption("⏳ Generando proxy de reproducción ligero; se usa el original mientras tanto.")
+    elif status == 'error':
+        st.caption("⚠️ No se pudo generar el proxy; se reproduce el archivo original.")
+
+
+def render_minimap(scenes):
+    """Renderiza el mini-mapa con previsualización si los atlas del filmstrip están listos."""
+    index = load_sprite_index(st.session_state.video_path)
+    if index is None:
+        st.caption("⏳ Generando filmstrip para la previsualización de la timeline...")
+        return
+    
+    # Los atlas se sirven por URL desde el servidor local (cacheados por el navegador)
+    server = get_proxy_server()
+    sprite_dir = sprite_dir_for(st.session_state.video_path)
+    page_url = get_page_url()
+    sheet_urls = [server.register(sprite_dir / name, page_url) for name in index['sheets']]
+    scene_ids = [chip_scene_id(i) for i in range(len(scenes))]
+    render_filmstrip_minimap(scenes, index, sheet_urls, scene_ids, st.session_state.get('selected_scene_id'))
+
+
+def render_grouping_panel(scenes):
+    """Renderiza las propuestas de agrupación automática de planos para revisión."""
+    with st.expander("🧩 Agrupación automática de planos"):
+        tolerance = st.slider(
+            "Tolerancia de similitud",
+            min_value=0.05,
+            max_value=0.6,
+            value=0.25,
+            step=0.05,
+            help="Valor más alto = se agrupan planos menos parecidos."
+        )
+        window = st.slider(
+            "Planos vecinos a comparar",
+            min_value=2,
+            max_value=8,
+            value=4,
+            help="Con 2 o más se detectan secuencias plano/contraplano (A B A B)."
+        )
+        
+        if st.session_state.shot_signatures is None or len(st.session_state.shot_signatures) != len(scenes):
+            if not st.button("Calcular firmas de color", key="compute_signatures"):
+                return
+            with st.spinner("Calculando firmas de color por plano..."):
+                st.session_state.shot_signatures = compute_shot_signatures(st.session_state.video_path, scenes)
+            print(f"[TERMINAL GROUPING] ✅ Firmas calculadas para {len(scenes)} planos")
+        
+        proposals = propose_groups(st.session_state.shot_signatures, tolerance, window)
+        if not proposals:
+            st.info("No hay agrupaciones propuestas con esta tolerancia.")
+            return
+        
+        st.markdown(f"**{len(proposals)} agrupaciones propuestas:**")
+        accepted = []
+        for i, proposal in enumerate(proposals):
+            first = scenes[proposal['start_index']]
+            last = scenes[proposal['end_index']]
+            label = (f"{first['id']} → {last['id']} "
+                     f"({proposal['end_index'] - proposal['start_index'] + 1} planos, "
+                     f"{first['start_time']:.1f}s - {last['end_time']:.1f}s, "
+                     f"similitud {proposal['similarity']:.2f})")
+            if st.checkbox(label, value=True, key=f"proposal_{i}_{proposal['start_index']}"):
+                accepted.append(i)
+        
+        if st.button("✅ Aplicar agrupaciones seleccionadas", disabled=not accepted):
+            # Una transacción pequeña por fusión en el proyecto guardado
+            store = get_project_store()
+            for i in accepted:
+                proposal = proposals[i]
+                store.merge_scenes(
+                    st.session_state.episode_id,
+                    merge_scene_range(scenes[proposal['start_index']:proposal['end_index'] + 1])
+                )
+            set_scenes(apply_grouping(scenes, proposals, accepted))
+            reindex_episode()
+            for scene in st.session_state.scenes:
+                if 'merged_from' in scene:
+                    scene['loaded'] = False  # Releer notas/personajes combinados desde la base
+            st.session_state.shot_signatures = None
+            st.session_state.selected_scene_id = None
+            print(f"[TERMINAL GROUPING] ✅ {len(accepted)} agrupaciones aplicadas, {len(st.session_state.scenes)} escenas")
+            st.rerun()
+
+def render_annotation_panel(scenes):
+    """Renderiza la anotación de la escena seleccionada con autoguardado en el proyecto."""
+    if not st.session_state.get('selected_scene_id'):
+        st.info("Selecciona una escena en la timeline para anotarla.")
+        return
+    
+    selected_idx = int(st.session_state.selected_scene_id.split('_')[1]) - 1
+    if not 0 <= selected_idx < len(scenes):
+        return
+    
+    store = get_project_store()
+    episode_id = st.session_state.episode_id
+    scene = scenes[selected_idx]
+    
+    # Carga perezosa: solo se lee de la base la escena que se está anotando
+    if scene.get('loaded') is False:
+        full = store.load_scene(episode_id, scene['start_frame'])
+        if full is not None:
+            scene.update(full)
+    
+    st.subheader(f"{scene['id']} · {scene['duration']:.1f}s")
+    
+    def save_characters():
+        scene['characters'] = st.session_state[f"characters_{scene['start_frame']}"]
+        scene['status'] = 'annotated'
+        store.update_annotation(episode_id, scene['start_frame'], characters=scene['characters'], status='annotated')
+    
+    def save_notes():
+        scene['notes'] = st.session_state[f"notes_{scene['start_frame']}"]
+        scene['status'] = 'annotated'
+        store.update_annotation(episode_id, scene['start_frame'], notes=scene['notes'], status='annotated')
+        # Solo se recalcula el vector de esta escena
+        index = get_semantic_index()
+        index.upsert(episode_id, scene['start_frame'], scene_text(scene))
+        index.flush()
+    
+    options = get_character_names(st.session_state.characters_data)
+    st.multiselect(
+        "Personajes en la escena",
+        options=options,
+        default=[c for c in scene.get('characters', []) if c in options],
+        key=f"characters_{scene['start_frame']}",
+        on_change=save_characters
+    )
+    st.text_area(
+        "Notas de Contexto para la IA (Callbacks, Simbolismo, Lore):",
+        value=scene.get('notes', ''),
+        key=f"notes_{scene['start_frame']}",
+        height=150,
+        on_change=save_notes
+    )
+    
+    suggested = [c for c in get_face_suggestions(selected_idx) if c not in scene.get('characters', [])]
+    if suggested:
+        st.caption(f"👤 Sugeridos por caras: {', '.join(suggested)}")
+        if st.button("Añadir sugeridos", key=f"add_suggested_{scene['start_frame']}"):
+            scene['characters'] = scene.get('characters', []) + suggested
+            scene['status'] = 'annotated'
+            store.update_annotation(episode_id, scene['start_frame'], characters=scene['characters'], status='annotated')
+            # El multiselect toma el nuevo valor por defecto al recrearse
+            st.session_state.pop(f"characters_{scene['start_frame']}", None)
+            st.rerun(scope="fragment")
+    
+    if scene.get('audio_hints'):
+        st.caption(f"🎧 Pistas de audio en el corte inicial: {format_audio_hints(scene)}")
+    
+    if scene['end_frame'] - scene['start_frame'] > 1:
+        col_split, col_split_button = st.columns([3, 1])
+        split_frame = col_split.number_input(
+            "Dividir en el fotograma",
+            min_value=scene['start_frame'] + 1,
+            max_value=scene['end_frame'] - 1,
+            value=(scene['start_frame'] + scene['end_frame']) // 2,
+            key=f"split_frame_{scene['start_frame']}"
+        )
+        if col_split_button.button("✂️ Dividir", key=f"split_{scene['start_frame']}"):
+            left, right = split_scene_at(scene, int(split_frame))
+            store.split_scene(episode_id, left, right)
+            set_scenes(renumber_scenes(scenes[:selected_idx] + [left, right] + scenes[selected_idx + 1:]))
+            reindex_episode()
+            st.session_state.shot_signatures = None
+            print(f"[TERMINAL APP] ✂️ {scene['id']} dividida en el fotograma {int(split_frame)}")
+            st.rerun()
+    
+    st.caption(f"Estado: {scene.get('status', 'detected')} · 💾 Guardado automático")
+
+def parse_time_windows(text):
+    """Convierte líneas 'inicio-fin' (segundos o MM:SS) en una lista de ventanas."""
+    def to_seconds(value):
+        seconds = 0.0
+        for part in value.strip().split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    
+    windows = []
+    for line in text.splitlines():
+        if '-' not in line:
+            continue
+        start, end = line.split('-', 1)
+        windows.append((to_seconds(start), to_seconds(end)))
+    return windows
+
+
+def render_bulk_operations_panel(scenes):
+    """Renderiza las reglas de curación masiva con vista previa (dry-run) del diff."""
+    with st.expander("⚡ Operaciones masivas"):
+        rules = {
+            "Fusionar planos cortos": 'merge_short',
+            "Ajustar cortes a múltiplo de fotogramas": 'snap_to_multiple',
+            "Ajustar cortes al keyframe más cercano": 'snap_to_keyframes',
+            "Unir rangos (créditos, recap)": 'merge_windows',
+            "Descartar rangos (créditos, recap)": 'drop_windows',
+        }
+        rule = rules[st.selectbox("Regla", list(rules.keys()))]
+        
+        if rule == 'merge_short':
+            params = {'min_duration': st.slider("Duración mínima (s)", 0.1, 5.0, 1.0, 0.1)}
+        elif rule == 'snap_to_multiple':
+            params = {'multiple': int(st.number_input("Múltiplo (fotogramas)", min_value=2, value=12))}
+        elif rule == 'snap_to_keyframes':
+            with st.spinner("Indexando keyframes..."):
+                index = load_keyframe_index()
+            if index is None:
+                st.error("No se pudo indexar el video (¿ffprobe instalado?).")
+                return
+            params = {
+                'keyframes': index.frames,
+                'max_distance': st.slider("Distancia máxima (s)", 0.1, 5.0, 1.0, 0.1),
+            }
+        else:
+            try:
+                params = {'windows': parse_time_windows(st.text_area(
+                    "Rangos (uno por línea, 'inicio-fin' en segundos o MM:SS)",
+                    placeholder="00:00-01:30\n52:10-55:00"
+                ))}
+            except ValueError:
+                st.error("Formato de rango inválido.")
+                return
+            if not params['windows']:
+                return
+        
+        # Dry-run: el diff se calcula en cada rerun, es una pasada vectorizada
+        diff = preview_rule(scenes, rule, **params)
+        st.write(f"**Vista previa:** {diff['scenes_before']} → {diff['scenes_after']} escenas · "
+                 f"{len(diff['removed'])} cortes eliminados · {len(diff['added'])} cortes nuevos")
+        if len(diff['removed']) or len(diff['added']):
+            changes = pd.DataFrame(
+                [('eliminado', f / diff['fps']) for f in diff['removed'][:200]] +
+                [('nuevo', f / diff['fps']) for f in diff['added'][:200]],
+                columns=['cambio', 'tiempo_s']
+            ).sort_values('tiempo_s')
+            st.dataframe(changes, use_container_width=True, height=200)
+        
+        if st.button("✅ Aplicar regla", disabled=diff['scenes_after'] == diff['scenes_before'] and not len(diff['added'])):
+            store = get_project_store()
+            # Las escenas restauradas del proyecto solo tienen resumen: cargar notas/personajes
+            base = scenes
+            if any(s.get('loaded') is False for s in scenes):
+                base = store.load_scenes(st.session_state.episode_id)
+                diff = preview_rule(base, rule, diff['fps'], **params)
+            new_scenes = apply_rule(base, diff)
+            store.replace_scenes(st.session_state.episode_id, new_scenes, f"bulk:{rule}")
+            set_scenes(new_scenes)
+            reindex_episode()
+            st.session_state.shot_signatures = None
+            st.session_state.selected_scene_id = None
+            print(f"[TERMINAL BULK] ✅ Regla {rule} aplicada: {diff['scenes_before']} → {len(new_scenes)} escenas")
+            st.rerun()
+
+
+def get_face_suggestions(scene_idx):
+    """Personajes sugeridos por los grupos de caras con nombre para una escena."""
+    analysis = st.session_state.face_analysis
+    if analysis is None or scene_idx >= len(analysis['suggestions']):
+        return []
+    return analysis['suggestions'][scene_idx]
+
+
+def render_face_panel(scenes):
+    """Renderiza la detección de caras y el etiquetado de grupos para sugerir personajes."""
+    with st.expander("👤 Sugerencias de personajes por caras"):
+        st.caption("Agrupación aproximada por apariencia: revisa cada grupo antes de ponerle nombre.")
+        if st.session_state.face_analysis is None:
+            unavailable = face_detection_unavailable()
+            if unavailable:
+                st.warning(f"Detección de caras no disponible: {unavailable}")
+                return
+            if not st.button("Detectar caras en las escenas", key="detect_faces"):
+                return
+            status_text = st.empty()
+            try:
+                with st.spinner("Detectando caras (CPU, en paralelo)..."):
+                    cache = detect_faces(st.session_state.video_path, scenes,
+                                         progress_callback=lambda message: status_text.text(message))
+            except Exception as e:
+                print(f"[TERMINAL FACES] ❌ Error detectando caras: {e}")
+                st.error(f"Error detectando caras: {e}")
+                return
+            labels = cluster_faces(cache.descriptors)
+            clusters = scene_clusters(scenes, cache, labels)
+            names = cache.load_labels(labels)
+            st.session_state.face_analysis = {
+                'cache': cache,
+                'labels': labels,
+                'clusters': clusters,
+                'names': names,
+                'suggestions': suggest_characters(clusters, names),
+            }
+            print(f"[TERMINAL FACES] ✅ {len(labels)} caras en {len(set(labels.tolist()))} grupos")
+        
+        analysis = st.session_state.face_analysis
+        labels = analysis['labels']
+        if labels.size == 0:
+            st.info("No se detectaron caras.")
+            return
+        
+        # Grupos más frecuentes primero
+        cluster_ids, counts = np.unique(labels, return_counts=True)
+        order = np.argsort(-counts)[:MAX_FACE_CLUSTERS]
+        options = ["—"] + get_character_names(st.session_state.characters_data)
+        
+        def rename_cluster(cluster):
+            name = st.session_state[f"face_cluster_{cluster}"]
+            if name == "—":
+                analysis['names'].pop(cluster, None)
+            else:
+                analysis['names'][cluster] = name
+            analysis['cache'].save_labels(labels, analysis['names'])
+            analysis['suggestions'] = suggest_characters(analysis['clusters'], analysis['names'])
+        
+        cols = st.columns(4)
+        for n, k in enumerate(order):
+            cluster = int(cluster_ids[k])
+            first_face = int(np.flatnonzero(labels == cluster)[0])
+            current = analysis['names'].get(cluster, "—")
+            with cols[n % 4]:
+                st.image(analysis['cache'].thumbs[first_face][..., ::-1], caption=f"Grupo {cluster} · {counts[k]} caras")
+                st.selectbox(
+                    "Personaje",
+                    options,
+                    index=options.index(current) if current in options else 0,
+                    key=f"face_cluster_{cluster}",
+                    on_change=rename_cluster,
+                    args=(cluster,),
+                    label_visibility="collapsed"
+                )
+
+
+def render_search_panel(scenes):
+    """Renderiza la búsqueda semántica sobre notas y análisis IA de todos los episodios."""
+    with st.expander("🔎 Búsqueda semántica en notas", expanded=True):
+        col_query, col_scope = st.columns([3, 1])
+        with col_query:
+            query = st.text_input("Buscar", placeholder="ej. escenas que presagian a Vecna",
+                                  key="search_query", label_visibility="collapsed")
+        with col_scope:
+            only_episode = st.checkbox("Solo este episodio", key="search_only_episode")
+        if not query.strip():
+            return
+        
+        index = get_semantic_index()
+        results = index.search(query, k=10, episode_id=st.session_state.episode_id if only_episode else None)
+        if not results:
+            st.caption("Sin resultados.")
+            return
+        
+        scene_indices = {scene['start_frame']: i for i, scene in enumerate(scenes)}
+        filenames = get_project_store().episode_filenames()
+        for n, result in enumerate(results):
+            col_info, col_action = st.columns([4, 1])
+            if result['episode_id'] == st.session_state.episode_id and result['start_frame'] in scene_indices:
+                scene_idx = scene_indices[result['start_frame']]
+                col_info.markdown(f"**Escena {scene_idx + 1}** · similitud {result['score']:.2f}")
+                col_action.button("Ir", key=f"search_result_{n}", on_click=select_scene,
+                                  args=(chip_scene_id(scene_idx),))
+            else:
+                filename = filenames.get(result['episode_id'], '?')
+                col_info.markdown(f"**{filename}** · fotograma {result['start_frame']} · similitud {result['score']:.2f}")
+
+
+def render_graph_sink_panel():
+    """Renderiza el envío de las escenas curadas al knowledge graph (por lotes, vía outbox)."""
+    with st.expander("🧠 Enviar al knowledge graph"):
+        sink = get_graph_sink()
+        if sink is None:
+            st.info("Configura la variable de entorno GRAPHITI_URL para habilitar el envío.")
+            return
+        
+        if st.button("Encolar escenas del episodio", key="enqueue_graph"):
+            scenes = get_project_store().load_scenes(st.session_state.episode_id)
+            episode_name = Path(st.session_state.video_file.name).stem
+            try:
+                added = sink.enqueue_scenes(episode_name, scenes, timeout=30)
+                print(f"[TERMINAL GRAPH] 📤 {added} elementos nuevos en el outbox ({episode_name})")
+                st.success(f"📤 {added} elementos nuevos encolados (los ya enviados se omiten)")
+            except TimeoutError as e:
+                st.warning(f"⏳ {e}")
+        
+        stats = sink.outbox.stats()
+        cols = st.columns(4)
+        cols[0].metric("Pendientes", stats.get('pending', 0))
+        cols[1].metric("En vuelo", stats.get('in_flight', 0))
+        cols[2].metric("Enviados", stats.get('sent', 0))
+        cols[3].metric("Rechazados", stats.get('rejected', 0))
+        if sink.last_error:
+            st.caption(f"Último error: {sink.last_error}")
+
+
+@st.fragment(key="selection_workspace")
+def render_selection_workspace():
+    """Timeline, selección y panel de anotación: se re-ejecutan solos al hacer click en un chip."""
+    col1, col2 = st.columns([3, 2])
+    
+    with col1:
+        # ETAPA 2: Timeline de chips implementada
+        st.subheader("🎞️ Timeline de Escenas")
+        render_minimap(st.session_state.scenes)
+        render_timeline_chips(st.session_state.scenes)
+        
+        # Mostrar información de la escena seleccionada
+        if st.session_state.get('selected_scene_id'):
+            selected_idx = int(st.session_state.selected_scene_id.split('_')[1]) - 1
+            if 0 <= selected_idx < len(st.session_state.scenes):
+                selected_scene = st.session_state.scenes[selected_idx]
+                st.info(f"🎯 **Escena seleccionada:** {st.session_state.selected_scene_id} | "
+                       f"**Tiempo:** {selected_scene['start_time']:.1f}s - {selected_scene['end_time']:.1f}s | "
+                       f"**Duración:** {selected_scene['end_time'] - selected_scene['start_time']:.1f}s")
+    
+    with col2:
+        st.header("📝 Panel de Anotación")
+        render_annotation_panel(st.session_state.scenes)
+
+
+@st.fragment
+def render_scene_table():
+    """Tabla de escenas detectadas; el DataFrame solo se reconstruye si cambian las escenas."""
+    st.subheader("Escenas Detectadas")
+    if st.session_state.scenes:
+        st.dataframe(get_scenes_dataframe(), use_container_width=True)
+    else:
+        st.info("No hay escenas para mostrar.")
 
 
 # --- Interfaz Principal ---
@@ -294,6 +921,9 @@ def main():
     """Función principal que renderiza la aplicación Streamlit."""
     initialize_session_state()
     render_sidebar()
+    if st.session_state.scenes:
+        apply_audio_hints()
+    inject_styles()
 
     st.title("Editor Visual de Escenas")
     st.markdown("---")
@@ -302,7 +932,7 @@ def main():
         st.info("👋 ¡Bienvenido! Por favor, carga un video y haz clic en 'Analizar' en la barra lateral para comenzar.")
         # Mostrar video si ya está cargado pero no analizado
         if st.session_state.video_path:
-            st.video(st.session_state.video_path)
+            render_video_player()
     else:
         # --- Layout principal con columnas ---
         col1, col2 = st.columns([3, 2])
@@ -310,38 +940,22 @@ def main():
         with col1:
             st.header("🎬 Reproductor y Timeline")
             if st.session_state.video_path:
-                st.video(st.session_state.video_path)
-            
-            # ETAPA 2: Timeline de chips implementada
-            st.subheader("🎞️ Timeline de Escenas")
-            render_timeline_chips(st.session_state.scenes)
-            
-            # Mostrar información de la escena seleccionada
-            if st.session_state.get('selected_scene_id'):
-                selected_idx = int(st.session_state.selected_scene_id.split('_')[1]) - 1
-                if 0 <= selected_idx < len(st.session_state.scenes):
-                    selected_scene = st.session_state.scenes[selected_idx]
-                    st.info(f"🎯 **Escena seleccionada:** {st.session_state.selected_scene_id} | "
-                           f"**Tiempo:** {selected_scene['start_time']:.1f}s - {selected_scene['end_time']:.1f}s | "
-                           f"**Duración:** {selected_scene['end_time'] - selected_scene['start_time']:.1f}s")
-            
-            # Herramientas de edición - se implementarán en ETAPA 3
-            st.info("🚧 Herramientas de edición (Group/Cut) se implementarán en ETAPA 3")
+                render_video_player()
 
         with col2:
-            st.header("📝 Panel de Anotación")
-            st.info("🚧 Panel de anotación completo se implementará en ETAPA 4")
-            
-            # Mostrar información básica de escenas por ahora
-            st.subheader("Escenas Detectadas")
-            if st.session_state.scenes:
-                df_display = pd.DataFrame(st.session_state.scenes)
-                df_display['start'] = df_display['start_timecode']
-                df_display['end'] = df_display['end_timecode']
-                df_display['duration_s'] = df_display['duration']
-                st.dataframe(df_display[['id', 'start', 'end', 'duration_s']], use_container_width=True)
-            else:
-                st.info("No hay escenas para mostrar.")
+            render_scene_table()
+        
+        # Los clicks en chips y la anotación solo re-ejecutan este fragment
+        render_selection_workspace()
+        
+        render_search_panel(st.session_state.scenes)
+        render_grouping_panel(st.session_state.scenes)
+        render_bulk_operations_panel(st.session_state.scenes)
+        render_face_panel(st.session_state.scenes)
+        render_graph_sink_panel()
+        
+        # Herramientas de edición - se implementarán en ETAPA 3
+        st.info("🚧 Herramientas de edición (Group/Cut) se implementarán en ETAPA 3")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""Componente de mini-mapa de la timeline con previsualización por sprites.
+
+Cada escena se dibuja como un bloque proporcional a su duración, dividido
+en franjas de `interval` segundos (una por celda del atlas). Al pasar el
+ratón se muestra, solo con CSS, la celda de `tile_for_time` para la franja
+bajo el cursor, así que la previsualización sigue la posición x dentro de
+la escena; el navegador descarga cada atlas una única vez y el resto es
+`background-position`.
+"""
+
+import html
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+import streamlit as st
+
+from utils.filmstrip import tile_for_time
+
+# Franjas máximas por escena (las escenas muy largas se muestrean)
+MAX_SLICES_PER_SCENE = 60
+
+MINIMAP_CSS = """
+<style>
+.st-minimap { display: flex; width: 100%; height: 28px; margin: 8px 0 120px 0; }
+.st-minimap-block {
+    position: relative;
+    display: flex;
+    height: 100%;
+    background-color: #e5e7eb;
+    border-right: 1px solid #ffffff;
+    font-size: 10px;
+    color: #374151;
+    overflow: visible;
+    white-space: nowrap;
+}
+.st-minimap-block:nth-child(odd) { background-color: #d1d5db; }
+.st-minimap-block.selected { background-color: #3b82f6; color: #ffffff; }
+.st-minimap-slice { height: 100%; }
+.st-minimap-preview {
+    display: none;
+    position: absolute;
+    top: 32px;
+    left: 0;
+    z-index: 10;
+    padding: 4px;
+    background: #111827;
+    border-radius: 6px;
+}
+.st-minimap-slice:hover .st-minimap-preview { display: block; }
+.st-minimap-tile { background-repeat: no-repeat; }
+</style>
+"""
+
+
+def _tile_html(index: Dict, sheet_urls: List[str], seconds: float) -> str:
+    """Devuelve el div de una celda del atlas para un instante dado."""
+    sheet, x, y = tile_for_time(index, seconds)
+    return (
+        f'<div class="st-minimap-tile" style="width:{index["tile_width"]}px;'
+        f'height:{index["tile_height"]}px;background-image:url(\'{sheet_urls[sheet]}\');'
+        f'background-position:-{x}px -{y}px;"></div>'
+    )
+
+
+def _slice_edges(index: Dict, start: float, end: float) -> np.ndarray:
+    """Límites (segundos) de las franjas de hover de una escena, una por celda."""
+    n = min(max(math.ceil((end - start) / index['interval']), 1), MAX_SLICES_PER_SCENE)
+    return np.linspace(start, end, n + 1)
+
+
+def render_filmstrip_minimap(scenes: List[Dict], index: Dict, sheet_urls: List[str],
+                             scene_ids: List[str], selected_scene_id: Optional[str] = None) -> None:
+    """
+    Renderiza el mini-mapa de escenas con previsualización al pasar el ratón.
+
+    Args:
+        scenes: Lista de escenas
+        index: Índice de atlas de `utils.filmstrip`
+        sheet_urls: URL de cada atlas (mismo orden que index['sheets'])
+        scene_ids: ID de selección de cada escena (los mismos que usan los chips)
+        selected_scene_id: ID de la escena seleccionada, para resaltarla
+    """
+    if not scenes or not index or index.get('count', 0) == 0:
+        return
+
+    total = scenes[-1]['end_time'] - scenes[0]['start_time']
+    if total <= 0:
+        return
+
+    blocks = []
+    for i, (scene, scene_id) in enumerate(zip(scenes, scene_ids)):
+        duration = scene['end_time'] - scene['start_time']
+        width = 100.0 * duration / total
+        selected = ' selected' if selected_scene_id == scene_id else ''
+        title = html.escape(f"Escena {i + 1}: {scene['start_time']:.1f}s - {scene['end_time']:.1f}s")
+        edges = _slice_edges(index, scene['start_time'], scene['end_time'])
+        slices = []
+        for t0, t1 in zip(edges[:-1], edges[1:]):
+            # Cada franja muestra la celda de su instante central
+            slice_width = 100.0 * (t1 - t0) / duration if duration > 0 else 100.0
+            slices.append(
+                f'<div class="st-minimap-slice" style="width:{slice_width:.4f}%">'
+                f'<div class="st-minimap-preview">{_tile_html(index, sheet_urls, (t0 + t1) / 2)}</div>'
+                f'</div>'
+            )
+        blocks.append(
+            f'<div class="st-minimap-block{selected}" style="width:{width:.4f}%" title="{title}">'
+            f'{"".join(slices)}</div>'
+        )
+
+    st.markdown(MINIMAP_CSS + f'<div class="st-minimap">{"".join(blocks)}</div>',
+                unsafe_allow_html=True)
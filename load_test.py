@@ -0,0 +1,360 @@
+"""Harness de carga para ST Scene Curat-o-matic.
+
+Ejecuta `app.py` en proceso con `streamlit.testing.v1.AppTest`, con listas
+de escenas sintéticas (escaladas a partir de `get_sample_scenes`) y N
+sesiones concurrentes (una por proceso) que hacen click en chips y lanzan el análisis sobre
+un video sintético. Genera un informe JSON con latencias p50/p95 de rerun
+y memoria por sesión, comparable entre commits.
+
+Todo lo que la app escribe (base de datos del proyecto, índice de
+búsqueda, outbox del grafo y cachés) va al directorio temporal del
+harness; las excepciones y los `st.error` de cada rerun cuentan como fallos.
+
+Limitación: cada sesión corre en su propio proceso porque AppTest instala
+un Runtime global y no admite dos sesiones en hilos del mismo proceso. Las
+sesiones sí compiten por lo que está en disco (SQLite, índice, cachés) y
+por la CPU, pero NO se mide la contención del estado compartido en memoria
+de un servidor Streamlit real (registro de trabajos en segundo plano,
+servidor de proxies, `st.cache_resource`, locks globales, GIL). El informe
+lo deja indicado en `concurrency`.
+
+Uso:
+    python load_test.py --scenes 10,500,2000 --sessions 1,4 --clicks 20 --analyze
+    python load_test.py --output report.json --compare baseline.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = str(Path(__file__).parent / 'app.py')
+RUN_TIMEOUT = 600  # segundos por rerun (el análisis puede tardar)
+
+# Qué compiten las sesiones concurrentes del harness y qué no (va en el informe)
+CONCURRENCY_MODEL = {
+    'mode': 'process_per_session',
+    'shared': ['project_db', 'search_index', 'graph_outbox', 'disk_caches', 'cpu'],
+    'not_measured': ['background_job_registry', 'proxy_server', 'st.cache_resource',
+                     'in_process_locks', 'gil'],
+    'note': "Las sesiones corren en procesos separados: no se mide la contención del estado "
+            "compartido en memoria de un único servidor Streamlit.",
+}
+
+
+def isolate_data_dirs(workdir: Path) -> None:
+    """
+    Redirige todos los datos persistentes de la app a `workdir`.
+
+    Debe llamarse antes de importar `utils`: las rutas se leen del entorno
+    al importar cada módulo.
+
+    Args:
+        workdir: Directorio temporal del harness
+    """
+    if any(name == 'utils' or name.startswith('utils.') for name in sys.modules):
+        raise RuntimeError("isolate_data_dirs() debe llamarse antes de importar utils")
+    os.environ['ST_PROJECT_DB'] = str(workdir / 'curator.db')
+    os.environ['ST_SEARCH_DIR'] = str(workdir / 'search')
+    os.environ['ST_GRAPH_OUTBOX'] = str(workdir / 'graph_outbox.db')
+    os.environ['ST_CACHE_DIR'] = str(workdir / 'cache')
+
+
+def scale_sample_scenes(count: int) -> List[Dict]:
+    """
+    Genera `count` escenas contiguas repitiendo el patrón de `get_sample_scenes`.
+
+    Args:
+        count: Número de escenas
+
+    Returns:
+        Lista de escenas sintéticas
+    """
+    from utils.scene_detection import get_sample_scenes
+
+    template = get_sample_scenes()
+    fps = template[0]['end_frame'] / template[0]['end_time']
+    scenes = []
+    start_time = 0.0
+    for i in range(count):
+        duration = template[i % len(template)]['duration']
+        end_time = start_time + duration
+        scene = dict(template[i % len(template)])
+        scene.update({
+            'id': f"scene_{i+1:03d}",
+            'index': i,
+            'start_time': start_time,
+            'end_time': end_time,
+            'duration': duration,
+            'start_frame': int(round(start_time * fps)),
+            'end_frame': int(round(end_time * fps)),
+            'start_timecode': f"{start_time:.3f}",
+            'end_timecode': f"{end_time:.3f}",
+            'characters': [],
+        })
+        scenes.append(scene)
+        start_time = end_time
+    return scenes
+
+
+def make_synthetic_video(path: Path, seconds: int = 20, seed: int = 0,
+                         fps: int = 24, shot_length: float = 2.5) -> Path:
+    """
+    Escribe un video sintético con un cambio de color cada `shot_length` segundos.
+
+    Cada semilla produce un contenido distinto, así ninguna sesión reutiliza
+    el checkpoint de detección de otra.
+
+    Args:
+        path: Ruta de salida (.mp4)
+        seconds: Duración del video
+        seed: Semilla de colores y ruido
+        fps: Fotogramas por segundo
+        shot_length: Duración de cada "plano" en segundos
+
+    Returns:
+        Ruta del video
+    """
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (640, 360))
+    color = rng.integers(0, 255, 3)
+    for frame_idx in range(seconds * fps):
+        if frame_idx % int(shot_length * fps) == 0:
+            color = rng.integers(0, 255, 3)
+        frame = np.empty((360, 640, 3), dtype=np.uint8)
+        frame[:] = color
+        frame += rng.integers(0, 8, frame.shape, dtype=np.uint8)  # ruido para que no sea trivial
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+# Claves de session_state que crecen con el número de escenas
+STATE_KEYS = ('scenes', 'scenes_df_cache', 'shot_signatures', 'characters_data', 'selected_scene_id')
+
+
+def session_state_bytes(at: AppTest) -> int:
+    """Tamaño aproximado (pickle) del session_state de una sesión."""
+    total = 0
+    for key in STATE_KEYS:
+        if key in at.session_state:
+            total += len(pickle.dumps(at.session_state[key]))
+    return total
+
+
+def run_session(scenes: List[Dict], video_path: str, clicks: int, analyze: bool,
+                seed: int) -> Dict:
+    """
+    Simula una sesión de edición: carga, clicks en chips y análisis opcional.
+
+    Se ejecuta en su propio proceso: AppTest instala un Runtime global en
+    cada rerun, así que dos sesiones en hilos del mismo proceso se pisan.
+
+    Args:
+        scenes: Escenas sintéticas iniciales
+        video_path: Video sintético
+        clicks: Número de clicks en chips
+        analyze: Pulsar también "Analizar"
+        seed: Semilla para elegir chips
+
+    Returns:
+        Diccionario con 'first_run', 'rerun', 'analysis' (segundos),
+        'memory' (bytes de session_state) y 'failures'
+    """
+    from utils.project_store import ProjectStore
+    from utils.video_proxy import video_cache_key
+
+    # Episodio real en la base de datos del harness, como tras una subida
+    store = ProjectStore(Path(os.environ['ST_PROJECT_DB']))
+    episode_id = store.get_or_create_episode(video_cache_key(video_path), Path(video_path).name)
+    store.close()
+
+    rng = np.random.default_rng(seed)
+    at = AppTest.from_file(APP_PATH, default_timeout=RUN_TIMEOUT)
+    at.session_state['video_file'] = SimpleNamespace(name=Path(video_path).name)
+    at.session_state['video_path'] = video_path
+    at.session_state['episode_id'] = episode_id
+    at.session_state['scenes'] = [dict(s) for s in scenes]
+    at.session_state['analysis_completed'] = True
+
+    result = {'first_run': [], 'rerun': [], 'analysis': [], 'memory': [], 'failures': []}
+
+    def timed_step(step: str, action: Callable[[], object], times: List[float]) -> None:
+        start = time.perf_counter()
+        try:
+            action()
+        except Exception as e:
+            result['failures'].append(f"{step}: {type(e).__name__}: {e}")
+            return
+        times.append(time.perf_counter() - start)
+        result['failures'].extend(f"{step}: excepción: {e.value}" for e in at.exception)
+        result['failures'].extend(f"{step}: st.error: {e.value}" for e in at.error)
+
+    timed_step('carga', at.run, result['first_run'])
+
+    selected = None
+    for _ in range(clicks):
+        chip = int(rng.integers(0, len(scenes)))
+        if chip == selected:
+            chip = (chip + 1) % len(scenes)  # el chip seleccionado está deshabilitado
+        selected = chip
+        timed_step(f'chip_{chip}', lambda: at.button(key=f"chip_{chip}").click().run(), result['rerun'])
+
+    if analyze:
+        timed_step('análisis', lambda: at.sidebar.button[0].click().run(), result['analysis'])
+
+    result['memory'].append(session_state_bytes(at))
+    return result
+
+
+def _stats_ms(values: List[float]) -> Optional[Dict]:
+    """p50/p95/max en milisegundos."""
+    if not values:
+        return None
+    arr = np.asarray(values) * 1000.0
+    return {
+        'p50': round(float(np.percentile(arr, 50)), 2),
+        'p95': round(float(np.percentile(arr, 95)), 2),
+        'max': round(float(arr.max()), 2),
+        'n': len(values),
+    }
+
+
+def run_scenario(scene_count: int, sessions: int, clicks: int, analyze: bool,
+                 workdir: Path, video_seconds: int, first_seed: int) -> Dict:
+    """
+    Ejecuta N sesiones concurrentes con `scene_count` escenas.
+
+    Args:
+        scene_count: Escenas sintéticas por sesión
+        sessions: Sesiones concurrentes
+        clicks: Clicks en chips por sesión
+        analyze: Pulsar también "Analizar"
+        workdir: Directorio para los videos sintéticos
+        video_seconds: Duración de cada video sintético
+        first_seed: Semilla de la primera sesión (una por sesión)
+
+    Returns:
+        Resultados del escenario
+    """
+    scenes = scale_sample_scenes(scene_count)
+    videos = [str(make_synthetic_video(workdir / f'synthetic_{seed}.mp4', video_seconds, seed))
+              for seed in range(first_seed, first_seed + sessions)]
+
+    results = {'first_run': [], 'rerun': [], 'analysis': [], 'memory': [], 'failures': []}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=sessions, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(run_session, scenes, video_path, clicks, analyze, seed)
+                   for seed, video_path in enumerate(videos, start=first_seed)]
+        for future in futures:
+            for name, values in future.result().items():
+                results[name].extend(values)
+    wall = time.perf_counter() - start
+
+    memory = np.asarray(results['memory'] or [0])
+    return {
+        'scenes': scene_count,
+        'sessions': sessions,
+        'wall_s': round(wall, 2),
+        'first_run_ms': _stats_ms(results['first_run']),
+        'rerun_ms': _stats_ms(results['rerun']),
+        'analysis_ms': _stats_ms(results['analysis']),
+        'session_state_kb': {
+            'mean': round(float(memory.mean()) / 1024, 1),
+            'max': round(float(memory.max()) / 1024, 1),
+        },
+        'failures': len(results['failures']),
+        'failure_samples': results['failures'][:5],
+    }
+
+
+def git_commit() -> str:
+    """Commit actual (para comparar informes)."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        return 'unknown'
+
+
+def compare_reports(current: Dict, baseline: Dict) -> None:
+    """Imprime la variación de p50/p95 de rerun respecto a un informe anterior."""
+    previous = {(r['scenes'], r['sessions']): r for r in baseline.get('results', [])}
+    print(f"\nComparación {baseline.get('commit')} → {current.get('commit')}:")
+    for result in current['results']:
+        old = previous.get((result['scenes'], result['sessions']))
+        if not old or not old.get('rerun_ms') or not result.get('rerun_ms'):
+            continue
+        deltas = []
+        for stat in ('p50', 'p95'):
+            before, after = old['rerun_ms'][stat], result['rerun_ms'][stat]
+            change = 100.0 * (after - before) / before if before else 0.0
+            deltas.append(f"{stat} {before:.1f} → {after:.1f} ms ({change:+.0f}%)")
+        print(f"  {result['scenes']:>6} escenas × {result['sessions']} sesiones: {' | '.join(deltas)}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test de app.py con AppTest")
+    parser.add_argument('--scenes', default='10,500,2000', help="Recuentos de escenas separados por comas")
+    parser.add_argument('--sessions', default='1,4', help="Sesiones concurrentes separadas por comas")
+    parser.add_argument('--clicks', type=int, default=20, help="Clicks en chips por sesión")
+    parser.add_argument('--analyze', action='store_true', help="Pulsar 'Analizar' en cada sesión")
+    parser.add_argument('--video-seconds', type=int, default=20, help="Duración del video sintético")
+    parser.add_argument('--output', default='load_test_report.json', help="Ruta del informe JSON")
+    parser.add_argument('--compare', help="Informe JSON anterior para comparar")
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix='st_load_test_'))
+    isolate_data_dirs(workdir)
+    seed = 0
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': vars(args),
+        'concurrency': CONCURRENCY_MODEL,
+        'results': [],
+    }
+    if any(int(x) > 1 for x in args.sessions.split(',')):
+        print(f"[LOAD TEST] ⚠️ {CONCURRENCY_MODEL['note']}")
+    for scene_count in (int(x) for x in args.scenes.split(',')):
+        for sessions in (int(x) for x in args.sessions.split(',')):
+            print(f"[LOAD TEST] ▶ {scene_count} escenas × {sessions} sesiones...")
+            result = run_scenario(scene_count, sessions, args.clicks, args.analyze,
+                                  workdir, args.video_seconds, seed)
+            seed += sessions
+            print(f"[LOAD TEST]   rerun {result['rerun_ms']} | análisis {result['analysis_ms']}")
+            if result['failures']:
+                print(f"[LOAD TEST]   ❌ {result['failures']} fallos: {result['failure_samples']}")
+            report['results'].append(result)
+
+    # Pico de la sesión más pesada (cada sesión corre en su propio proceso)
+    report['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"[LOAD TEST] ✅ Informe guardado en {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_reports(report, json.load(f))
+    return 1 if any(result['failures'] for result in report['results']) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
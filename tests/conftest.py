@@ -0,0 +1,109 @@
+"""Fixtures y utilidades compartidas: clips de prueba generados con ffmpeg y cachés aisladas.
+
+Las constantes y ayudas que usan varios módulos de test viven aquí y se
+importan con `from conftest import ...`; un test nunca importa de otro.
+"""
+
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+# Las rutas por defecto (base de datos, índice, outbox y cachés) se leen del
+# entorno al importar `utils`: ninguna prueba (ni AppTest) escribe en data/
+_DATA_DIR = tempfile.mkdtemp(prefix='st_tests_')
+os.environ['ST_PROJECT_DB'] = os.path.join(_DATA_DIR, 'curator.db')
+os.environ['ST_SEARCH_DIR'] = os.path.join(_DATA_DIR, 'search')
+os.environ['ST_GRAPH_OUTBOX'] = os.path.join(_DATA_DIR, 'graph_outbox.db')
+os.environ['ST_CACHE_DIR'] = os.path.join(_DATA_DIR, 'cache')
+
+FFMPEG = shutil.which('ffmpeg')
+
+requires_ffmpeg = pytest.mark.skipif(FFMPEG is None, reason="ffmpeg no está instalado")
+
+# `long_gop_clip`: fotogramas por segundo y umbral de ContentDetector que separa sus 4 planos
+CLIP_FPS = 24.0
+THRESHOLD = 27.0
+
+
+class StopAfter(threading.Event):
+    """Evento que se activa solo tras `n` comprobaciones (una por fotograma)."""
+
+    def __init__(self, n):
+        super().__init__()
+        self.remaining = n
+
+    def is_set(self):
+        self.remaining -= 1
+        return self.remaining < 0
+
+
+def make_index(path, keyframes, pts_frames=None, pos=None):
+    """KeyframeIndex de `long_gop_clip` sin ffprobe (PTS en fotogramas, offsets desconocidos)."""
+    from utils.keyframe_index import KeyframeIndex
+
+    keyframes = np.asarray(keyframes, dtype=np.int64)
+    pts = keyframes if pts_frames is None else np.asarray(pts_frames, dtype=np.int64)
+    pos = np.full(len(keyframes), -1, dtype=np.int64) if pos is None else np.asarray(pos, dtype=np.int64)
+    return KeyframeIndex(str(path), keyframes, pts, pos, CLIP_FPS, Fraction(1, int(CLIP_FPS)))
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Cada test escribe sus cachés en su propio directorio temporal."""
+    from utils import background_jobs, detection_checkpoint
+
+    monkeypatch.setattr(background_jobs, 'CACHE_DIR', tmp_path / 'cache')
+    monkeypatch.setattr(detection_checkpoint, 'CHECKPOINT_DIR', tmp_path / 'cache' / 'checkpoints')
+    return tmp_path / 'cache'
+
+
+@pytest.fixture(scope='session')
+def long_gop_clip(tmp_path_factory):
+    """
+    Clip H.264 de 12 s a 24 fps con 4 planos de 3 s, GOP largo y B-frames.
+
+    Un solo keyframe cada 10 s: cualquier seek a mitad de clip tiene que
+    decodificar desde el keyframe anterior y reordenar B-frames.
+    """
+    if FFMPEG is None:
+        pytest.skip("ffmpeg no está instalado")
+    path = tmp_path_factory.mktemp('clips') / 'long_gop.mp4'
+    sources = [
+        'testsrc2=s=320x240:r=24:d=3',
+        'mandelbrot=s=320x240:r=24,trim=duration=3',
+        'color=c=navy:s=320x240:r=24:d=3,noise=alls=30:allf=t',
+        'testsrc=s=320x240:r=24:d=3',
+    ]
+    cmd = [FFMPEG, '-y', '-loglevel', 'error']
+    for source in sources:
+        cmd += ['-f', 'lavfi', '-i', source]
+    cmd += [
+        '-filter_complex', ''.join(f'[{i}:v]' for i in range(len(sources))) + f'concat=n={len(sources)}:v=1[v]',
+        '-map', '[v]', '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+        '-g', '240', '-keyint_min', '240', '-sc_threshold', '0', '-bf', '3',
+        str(path),
+    ]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+@pytest.fixture(scope='session')
+def sequential_frames(long_gop_clip):
+    """Todos los fotogramas de `long_gop_clip` decodificados en orden (referencia)."""
+    import cv2
+
+    cap = cv2.VideoCapture(str(long_gop_clip))
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
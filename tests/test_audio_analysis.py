@@ -0,0 +1,54 @@
+"""Candidatos de audio: silencios y golpes sobre envolventes sintéticas."""
+
+import numpy as np
+
+from utils.audio_analysis import HOP_SECONDS, attach_boundary_hints, find_audio_candidates
+
+
+def envelope(*segments):
+    """Concatena tramos (segundos, dB) en una envolvente de HOP_SECONDS."""
+    return np.concatenate([np.full(int(round(seconds / HOP_SECONDS)), level, dtype=np.float32)
+                           for seconds, level in segments])
+
+
+def kinds(candidates):
+    return [(c['kind'], round(c['time'], 2)) for c in candidates]
+
+
+def test_returning_from_silence_to_the_same_level_is_not_a_sting():
+    candidates = find_audio_candidates(envelope((5, -20), (1, -70), (5, -20)))
+    assert kinds(candidates) == [('silence', 5.5)]
+
+
+def test_silence_does_not_lower_the_reference_level():
+    # Tras el silencio vuelve algo más alto, pero menos de STING_RISE_DB respecto a antes
+    candidates = find_audio_candidates(envelope((5, -25), (0.6, -70), (5, -16)))
+    assert [c['kind'] for c in candidates] == ['silence']
+
+
+def test_a_louder_hit_after_silence_is_a_sting():
+    candidates = find_audio_candidates(envelope((5, -35), (1, -70), (5, -10)))
+    assert kinds(candidates) == [('silence', 5.5), ('sting', 6.0)]
+    assert candidates[1]['strength'] == np.float32(25.0)
+
+
+def test_a_rise_without_silence_is_a_sting():
+    candidates = find_audio_candidates(envelope((5, -35), (5, -15)))
+    assert kinds(candidates) == [('sting', 5.0)]
+
+
+def test_no_sting_without_sound_before_it():
+    candidates = find_audio_candidates(envelope((3, -70), (5, -10)))
+    assert [c['kind'] for c in candidates] == ['silence']
+
+
+def test_hints_snap_to_the_nearest_cut():
+    scenes = [{'start_time': 0.0}, {'start_time': 5.2}, {'start_time': 9.0}]
+    candidates = [{'time': 5.5, 'kind': 'silence', 'strength': 1.0},
+                  {'time': 6.0, 'kind': 'sting', 'strength': 20.0},
+                  {'time': 8.8, 'kind': 'sting', 'strength': 14.0}]
+    attach_boundary_hints(scenes, candidates)
+    assert scenes[0]['audio_hints'] == []
+    assert [h['kind'] for h in scenes[1]['audio_hints']] == ['silence']
+    assert scenes[1]['audio_hints'][0]['offset'] == 5.5 - 5.2
+    assert scenes[2]['audio_hints'] == [{'kind': 'sting', 'strength': 14.0, 'offset': 8.8 - 9.0}]
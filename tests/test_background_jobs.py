@@ -0,0 +1,50 @@
+"""Registro de trabajos en segundo plano: deduplicación y relanzamiento tras cancelar."""
+
+import threading
+
+from utils.background_jobs import find_jobs, get_job, start_job
+
+
+def stubborn(release):
+    """Trabajo que ignora la cancelación hasta que se abre `release`."""
+    def run(job):
+        release.wait(10)
+    return run
+
+
+def test_same_key_returns_the_running_job():
+    release = threading.Event()
+    job = start_job('jobs-test/dedup', stubborn(release))
+    try:
+        assert start_job('jobs-test/dedup', stubborn(release)) is job
+        assert get_job('jobs-test/dedup') is job
+    finally:
+        release.set()
+        job.thread.join(5)
+    assert job.status == 'done'
+
+
+def test_restart_waits_for_the_cancelled_job_without_holding_the_registry():
+    release = threading.Event()
+    old = start_job('jobs-test/restart', stubborn(release))
+    old.cancel()
+
+    restarted = []
+    restarter = threading.Thread(target=lambda: restarted.append(start_job('jobs-test/restart', lambda job: None)))
+    restarter.start()
+    restarter.join(0.2)
+    assert restarter.is_alive()  # espera a que el trabajo cancelado termine
+
+    # Mientras tanto el registro sigue respondiendo a otras sesiones
+    lookup = threading.Thread(target=lambda: (get_job('jobs-test/restart'), find_jobs('jobs-test/')))
+    lookup.start()
+    lookup.join(1)
+    assert not lookup.is_alive()
+
+    release.set()
+    restarter.join(5)
+    assert old.status == 'cancelled'
+    assert restarted[0] is not old
+    restarted[0].thread.join(5)
+    assert restarted[0].status == 'done'
+    assert get_job('jobs-test/restart') is restarted[0]
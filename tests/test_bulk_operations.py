@@ -0,0 +1,69 @@
+"""Reglas masivas sobre listas de escenas, con y sin huecos."""
+
+import numpy as np
+
+from utils.bulk_operations import apply_rule, contiguous_runs, preview_rule
+
+FPS = 24.0
+
+
+def make_scenes(boundaries):
+    return [{'id': f'scene_{i + 1:03d}', 'start_frame': start, 'end_frame': end,
+             'start_time': start / FPS, 'end_time': end / FPS, 'duration': (end - start) / FPS,
+             'notes': '', 'characters': []}
+            for i, (start, end) in enumerate(zip(boundaries[:-1], boundaries[1:]))]
+
+
+def run(scenes, rule, **params):
+    return apply_rule(scenes, preview_rule(scenes, rule, FPS, **params))
+
+
+def ranges(scenes):
+    return [(s['start_frame'], s['end_frame']) for s in scenes]
+
+
+def with_gap():
+    # Escenas [0,100,200,300,305,500] con 200-300 descartado
+    return run(make_scenes([0, 100, 200, 300, 305, 500]), 'drop_windows', windows=[(200 / FPS, 300 / FPS)])
+
+
+def test_drop_windows_leaves_a_gap():
+    scenes = with_gap()
+    assert ranges(scenes) == [(0, 100), (100, 200), (300, 305), (305, 500)]
+    assert [len(r) for r in contiguous_runs(scenes)] == [3, 3]
+
+
+def test_drop_overlapping_windows_drops_their_union():
+    scenes = run(make_scenes([0, 100, 200]), 'drop_windows', windows=[(10 / FPS, 50 / FPS), (30 / FPS, 80 / FPS)])
+    assert ranges(scenes) == [(0, 10), (80, 100), (100, 200)]
+
+
+def test_drop_nested_and_touching_windows():
+    windows = [(120 / FPS, 140 / FPS), (100 / FPS, 160 / FPS), (160 / FPS, 180 / FPS)]
+    scenes = run(make_scenes([0, 100, 200]), 'drop_windows', windows=windows)
+    assert ranges(scenes) == [(0, 100), (180, 200)]
+
+
+def test_merge_short_never_absorbs_the_gap():
+    scenes = run(with_gap(), 'merge_short', min_duration=1.0)
+    assert ranges(scenes) == [(0, 100), (100, 200), (300, 500)]
+
+
+def test_snap_to_multiple_never_crosses_the_gap():
+    scenes = run(with_gap(), 'snap_to_multiple', multiple=48)
+    assert ranges(scenes) == [(0, 96), (96, 200), (300, 500)]
+
+
+def test_merge_windows_inside_one_run():
+    scenes = run(make_scenes([0, 50, 100, 150, 200]), 'merge_windows', windows=[(40 / FPS, 160 / FPS)])
+    assert ranges(scenes) == [(0, 40), (40, 160), (160, 200)]
+    assert scenes[1]['status'] == 'edited'
+
+
+def test_preview_counts_and_identity():
+    scenes = make_scenes([0, 100, 200])
+    diff = preview_rule(scenes, 'snap_to_multiple', FPS, multiple=50)
+    assert diff['scenes_before'] == diff['scenes_after'] == 2
+    assert not len(diff['removed']) and not len(diff['added'])
+    assert np.array_equal(diff['after'], [0, 100, 200])
+    assert apply_rule(scenes, diff)[0]['id'] == 'scene_001'
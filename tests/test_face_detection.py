@@ -0,0 +1,136 @@
+"""Detección de caras: lectura exacta de fotogramas, workers con 'spawn' y OpenCV sin Haar."""
+
+import os
+import shutil
+import textwrap
+from pathlib import Path
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+from conftest import make_index
+from streamlit.testing.v1 import AppTest
+
+from utils import face_detection
+from utils.face_detection import THUMB_SIZE, FaceCache, _detect_batch, detect_faces
+
+APP_PATH = str(Path(__file__).parent.parent / 'app.py')
+
+# OpenCV 5 movió el detector Haar fuera del paquete principal
+HAS_HAAR = hasattr(cv2, 'CascadeClassifier')
+
+BOX = (40, 30, 96, 96)  # x, y, w, h en el fotograma a 320x240 (no se reescala)
+
+
+class FixedBoxCascade:
+    """Detector falso: una "cara" en la misma posición de cada fotograma."""
+
+    def __init__(self, *args):
+        pass
+
+    def detectMultiScale(self, gray, **kwargs):
+        return np.array([BOX])
+
+
+def expected_thumb(frame):
+    x, y, w, h = BOX
+    return cv2.resize(frame[y:y + h, x:x + w], (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+
+
+@pytest.fixture
+def clip_copy(long_gop_clip, tmp_path):
+    # El índice se guarda junto al video: copia propia para no compartirlo entre tests
+    copy = tmp_path / 'clip.mp4'
+    shutil.copyfile(long_gop_clip, copy)
+    return copy
+
+
+@pytest.mark.parametrize('with_index', [True, False], ids=['indice', 'secuencial'])
+def test_detect_batch_reads_the_exact_frames(clip_copy, sequential_frames, monkeypatch, with_index):
+    if with_index:
+        make_index(clip_copy, [0, 240]).save()
+    monkeypatch.setattr(cv2, 'CascadeClassifier', FixedBoxCascade, raising=False)
+
+    frames = [3, 71, 72, 150, 239, 240, 286]
+    results = _detect_batch(str(clip_copy), frames)
+
+    assert [r['frame'] for r in results] == frames
+    for result in results:
+        assert result['boxes'].tolist() == [list(BOX)]
+        assert np.array_equal(result['thumbs'][0], expected_thumb(sequential_frames[result['frame']])), result['frame']
+
+
+@pytest.fixture
+def haar_in_workers(tmp_path, monkeypatch):
+    """
+    Garantiza un CascadeClassifier también en los workers 'spawn'.
+
+    Con un OpenCV que lo trae no hace nada (se usa el detector real). Si no,
+    un `sitecustomize` en PYTHONPATH instala uno falso sin caras al arrancar
+    cada worker, para que la ruta de procesos se ejecute igualmente.
+    """
+    if HAS_HAAR:
+        return
+    site_dir = tmp_path / 'site'
+    site_dir.mkdir()
+    (site_dir / 'sitecustomize.py').write_text(textwrap.dedent("""
+        import cv2
+        import numpy as np
+
+        class NoFacesCascade:
+            def __init__(self, *args):
+                pass
+
+            def detectMultiScale(self, gray, **kwargs):
+                return np.empty((0, 4), dtype=np.int32)
+
+        cv2.CascadeClassifier = NoFacesCascade
+    """))
+    monkeypatch.setenv('PYTHONPATH', os.pathsep.join(filter(None, [str(site_dir), os.environ.get('PYTHONPATH')])))
+    monkeypatch.setattr(cv2, 'CascadeClassifier', FixedBoxCascade, raising=False)  # comprobación del padre
+
+
+def test_detect_faces_runs_in_spawned_workers(clip_copy, tmp_path, monkeypatch, haar_in_workers):
+    monkeypatch.setattr(face_detection, 'FACES_DIR', tmp_path / 'faces')
+    monkeypatch.setattr(face_detection, 'BATCH_SIZE', 2)
+    make_index(clip_copy, [0, 240]).save()
+    scenes = [{'start_frame': start, 'end_frame': start + 72} for start in (0, 72, 144, 216)]
+
+    cache = detect_faces(str(clip_copy), scenes, samples_per_scene=3, workers=2)
+
+    expected = np.unique(face_detection.scene_sample_frames(scenes, 3))
+    assert cache.processed.tolist() == expected.tolist()
+    # Persistido: la segunda pasada no tiene nada pendiente
+    assert FaceCache(str(clip_copy)).missing(expected).size == 0
+
+
+@pytest.fixture
+def without_haar(monkeypatch):
+    if HAS_HAAR:
+        monkeypatch.delattr(cv2, 'CascadeClassifier')
+
+
+def test_detect_faces_fails_before_starting_workers_without_haar(clip_copy, without_haar, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("no debería lanzar workers")
+
+    monkeypatch.setattr(face_detection, 'ProcessPoolExecutor', no_pool)
+    assert 'CascadeClassifier' in face_detection.face_detection_unavailable()
+    with pytest.raises(RuntimeError, match='CascadeClassifier'):
+        detect_faces(str(clip_copy), [{'start_frame': 0, 'end_frame': 72}])
+
+
+def test_face_panel_warns_instead_of_offering_detection_without_haar(long_gop_clip, without_haar):
+    from utils.scene_detection import get_sample_scenes
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.session_state['video_file'] = SimpleNamespace(name='clip.mp4')
+    at.session_state['video_path'] = str(long_gop_clip)
+    at.session_state['scenes'] = get_sample_scenes()
+    at.session_state['analysis_completed'] = True
+    at.run()
+
+    assert not at.exception
+    assert any('CascadeClassifier' in warning.value for warning in at.warning)
+    assert not [button for button in at.button if button.key == 'detect_faces']
@@ -0,0 +1,114 @@
+"""Atlas del filmstrip: generación, búsqueda de celdas y mini-mapa con hover."""
+
+import re
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from components import filmstrip as minimap
+from utils import filmstrip
+from utils.filmstrip import generate_sprites, load_sprite_index, sprite_dir_for, tile_for_time
+
+INDEX = {'interval': 2.0, 'tile_width': 160, 'tile_height': 90, 'columns': 10, 'rows': 10,
+         'count': 250, 'sheets': ['sheet_000.jpg', 'sheet_001.jpg', 'sheet_002.jpg']}
+
+
+@pytest.mark.parametrize('seconds, expected', [
+    (0.0, (0, 0, 0)),
+    (1.99, (0, 0, 0)),
+    (2.0, (0, 160, 0)),
+    (19.0, (0, 1440, 0)),
+    (20.0, (0, 0, 90)),
+    (199.9, (0, 1440, 810)),
+    (200.0, (1, 0, 0)),
+    (442.0, (2, 160, 180)),
+    (-5.0, (0, 0, 0)),       # antes del inicio: primera celda
+    (10_000.0, (2, 1440, 360)),  # después del final: última celda (k = 249)
+])
+def test_tile_for_time(seconds, expected):
+    assert tile_for_time(INDEX, seconds) == expected
+
+
+def test_tile_for_time_rejects_an_empty_filmstrip():
+    with pytest.raises(ValueError):
+        tile_for_time(dict(INDEX, count=0), 0.0)
+
+
+@pytest.fixture
+def sprite_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(filmstrip, 'SPRITE_DIR', tmp_path / 'sprites')
+    return tmp_path / 'sprites'
+
+
+def test_generate_sprites_packs_one_tile_per_interval(long_gop_clip, sequential_frames, sprite_dir):
+    tile_size = (64, 48)
+    index = generate_sprites(str(long_gop_clip), interval=2.0, tile_size=tile_size, grid=(2, 2))
+
+    # 12 s a 24 fps cada 2 s -> fotogramas 0, 48, ..., 240 en atlas de 2x2
+    assert index['count'] == 6
+    assert index['sheets'] == ['sheet_000.jpg', 'sheet_001.jpg']
+    out_dir = sprite_dir_for(str(long_gop_clip), 2.0, tile_size)
+    first = cv2.imread(str(out_dir / 'sheet_000.jpg'))
+    last = cv2.imread(str(out_dir / 'sheet_001.jpg'))
+    assert first.shape == (96, 128, 3)
+    assert last.shape == (48, 128, 3)  # filas vacías recortadas
+
+    sampled = [cv2.resize(sequential_frames[48 * k], tile_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+               for k in range(index['count'])]
+    for k in range(index['count']):
+        sheet, x, y = tile_for_time(index, k * 2.0 + 0.5)
+        image = first if sheet == 0 else last
+        tile = image[y:y + 48, x:x + 64].astype(np.int16)
+        # La celda se parece más a su fotograma muestreado que a cualquier otro
+        distances = [np.abs(tile - reference).mean() for reference in sampled]
+        assert int(np.argmin(distances)) == k, distances
+
+
+def test_generate_sprites_reuses_the_cache(long_gop_clip, sprite_dir, monkeypatch):
+    assert load_sprite_index(str(long_gop_clip)) is None
+    index = generate_sprites(str(long_gop_clip))
+    assert load_sprite_index(str(long_gop_clip)) == index
+
+    # Con el índice escrito no se vuelve a abrir el video
+    monkeypatch.setattr(filmstrip.cv2, 'VideoCapture', None)
+    assert generate_sprites(str(long_gop_clip)) == index
+
+
+def render(monkeypatch, scenes, index, scene_ids, selected=None):
+    calls = []
+    monkeypatch.setattr(minimap, 'st', SimpleNamespace(markdown=lambda body, **kwargs: calls.append(body)))
+    minimap.render_filmstrip_minimap(scenes, index, ['a.jpg', 'b.jpg', 'c.jpg'], scene_ids, selected)
+    return calls[0] if calls else None
+
+
+def make_scene(start, end):
+    return {'start_time': start, 'end_time': end}
+
+
+def test_minimap_hover_follows_the_x_position(monkeypatch):
+    scenes = [make_scene(0.0, 10.0), make_scene(10.0, 11.0)]
+    body = render(monkeypatch, scenes, INDEX, ['scene_1', 'scene_2'])
+
+    blocks = body.split('class="st-minimap-block')[1:]
+    positions = [re.findall(r'background-position:-(\d+)px -(\d+)px', block) for block in blocks]
+    # 10 s en franjas de 2 s: una celda distinta por franja, en orden
+    assert positions[0] == [('0', '0'), ('160', '0'), ('320', '0'), ('480', '0'), ('640', '0')]
+    assert positions[1] == [('800', '0')]
+    assert blocks[0].count('width:20.0000%') == 5
+
+
+def test_minimap_caps_slices_on_long_scenes(monkeypatch):
+    body = render(monkeypatch, [make_scene(0.0, 480.0)], INDEX, ['scene_1'])
+    assert body.count('st-minimap-slice"') == minimap.MAX_SLICES_PER_SCENE
+    assert "url('c.jpg')" in body  # la última franja llega al tercer atlas
+
+
+def test_minimap_highlights_the_scene_id_given_by_the_caller(monkeypatch):
+    scenes = [make_scene(0.0, 4.0), make_scene(4.0, 8.0)]
+    body = render(monkeypatch, scenes, INDEX, ['scene_007', 'scene_008'], selected='scene_008')
+    blocks = body.split('class="st-minimap-block')[1:]
+    assert not blocks[0].startswith(' selected') and blocks[1].startswith(' selected')
+
+    assert 'selected"' not in render(monkeypatch, scenes, INDEX, ['scene_007', 'scene_008'], selected='scene_2')
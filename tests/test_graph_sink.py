@@ -0,0 +1,195 @@
+"""Envío al grafo por lotes contra `MockGraphServer`."""
+
+import pytest
+
+from utils import graph_sink
+from utils.graph_sink import GraphSink, MockGraphServer, Outbox
+
+
+def make_items(count, prefix='scene'):
+    return [('episode', {'name': f"{prefix}/{i}", 'episode_body': 'x' * 50}) for i in range(count)]
+
+
+class RecordingOutbox(Outbox):
+    """Outbox que anota el backlog justo después de cada `add`."""
+
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.backlog_after_add = []
+
+    def add(self, items):
+        added = super().add(items)
+        self.backlog_after_add.append(self.backlog())
+        return added
+
+
+@pytest.fixture
+def server():
+    server = MockGraphServer()
+    yield server
+    server.shutdown()
+
+
+def make_sink(server, outbox, **kwargs):
+    kwargs.setdefault('flush_interval', 0.05)
+    return GraphSink(server.base_url, outbox=outbox, api_key=None, **kwargs)
+
+
+def test_every_item_is_confirmed_exactly_once_despite_failures(server, tmp_path):
+    server.httpd.fail_every = 3  # 503 con Retry-After: 0 en una de cada 3 peticiones
+    outbox = Outbox(tmp_path / 'outbox.db')
+    sink = make_sink(server, outbox, max_items=20)
+
+    items = make_items(250)
+    assert sink.enqueue(items) == 250
+    assert sink.enqueue(items) == 0  # misma clave de idempotencia: no se duplica
+    assert sink.flush(timeout=30)
+    sink.close()
+
+    assert len(server.received) == 250
+    # Solo cuentan los lotes aceptados: cada elemento llegó en exactamente uno
+    assert sum(server.batch_sizes) == 250
+    assert server.httpd.requests > len(server.batch_sizes)  # hubo fallos reintentados
+    assert outbox.stats() == {'sent': 250}
+    outbox.close()
+
+
+def test_requests_in_flight_never_exceed_the_cap(server, tmp_path):
+    server.httpd.delay = 0.05
+    outbox = Outbox(tmp_path / 'outbox.db')
+    sink = make_sink(server, outbox, max_items=5, max_in_flight=2)
+
+    sink.enqueue(make_items(100))
+    assert sink.flush(timeout=30)
+    sink.close()
+
+    assert len(server.received) == 100
+    assert server.max_concurrent == 2
+    outbox.close()
+
+
+def test_enqueue_rechecks_backpressure_between_chunks(server, tmp_path):
+    server.httpd.delay = 0.02
+    outbox = RecordingOutbox(tmp_path / 'outbox.db')
+    sink = make_sink(server, outbox, max_items=10, max_pending=30)
+
+    assert sink.enqueue(make_items(200), timeout=30) == 200
+    assert sink.flush(timeout=30)
+    sink.close()
+
+    assert len(outbox.backlog_after_add) == 20
+    assert max(outbox.backlog_after_add) <= 30
+    assert len(server.received) == 200
+    outbox.close()
+
+
+def test_enqueue_times_out_when_the_server_does_not_drain(tmp_path):
+    outbox = Outbox(tmp_path / 'outbox.db')
+    # Puerto cerrado: nada se confirma nunca
+    sink = GraphSink('http://127.0.0.1:9', outbox=outbox, api_key=None,
+                     max_items=10, max_pending=20, flush_interval=0.05, timeout=0.5)
+
+    with pytest.raises(TimeoutError):
+        sink.enqueue(make_items(50), timeout=0.5)
+    assert outbox.backlog() == 20  # las tandas que cabían quedan en el outbox
+    sink.close(timeout=0.1)
+    outbox.close()
+
+
+def test_items_claimed_by_a_dead_process_are_sent_after_the_lease(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_sink, 'LEASE_SECONDS', 0.3)
+    db_path = tmp_path / 'outbox.db'
+
+    # Un proceso reclama un lote y muere antes de confirmarlo
+    crashed = Outbox(db_path)
+    crashed.add(make_items(30))
+    claimed = crashed.claim(max_items=20, max_bytes=1 << 20)
+    assert len(claimed) == 20
+    crashed.close()
+
+    outbox = Outbox(db_path)
+    assert outbox.stats() == {'in_flight': 20, 'pending': 10}
+    sink = make_sink(server, outbox, max_items=20)
+    assert sink.flush(timeout=10)
+    sink.close()
+
+    assert len(server.received) == 30
+    assert sum(server.batch_sizes) == 30
+    assert outbox.stats() == {'sent': 30}
+    outbox.close()
+
+
+def make_scene(notes, characters=('Once',)):
+    return {'start_frame': 48, 'start_time': 2.0, 'end_time': 4.0,
+            'notes': notes, 'characters': list(characters), 'ai_analysis': None}
+
+
+def test_edited_scene_is_a_new_version_of_the_same_entity(server, tmp_path):
+    outbox = Outbox(tmp_path / 'outbox.db')
+    sink = make_sink(server, outbox)
+
+    assert sink.enqueue_scenes('S04E07', [make_scene("Primera nota")]) == 2  # escena + APPEARS_IN
+    assert sink.flush(timeout=10)
+    assert sink.enqueue_scenes('S04E07', [make_scene("Nota corregida")]) == 1  # la relación no cambió
+    assert sink.enqueue_scenes('S04E07', [make_scene("Nota corregida")]) == 0
+    assert sink.flush(timeout=10)
+    sink.close()
+
+    episodes = [item for item in server.received.values() if item['kind'] == 'episode']
+    assert {item['entity'] for item in episodes} == {'episode:S04E07/48'}
+    assert sorted(item['version'] for item in episodes) == [1, 2]
+    latest = server.entities['episode:S04E07/48']
+    assert latest['version'] == 2 and latest['payload']['episode_body'] == "Nota corregida"
+    outbox.close()
+
+
+def test_unsent_version_is_superseded(tmp_path):
+    outbox = Outbox(tmp_path / 'outbox.db')
+    outbox.add([('episode', {'name': 'S04E07/48', 'episode_body': 'v1'})])
+    outbox.add([('episode', {'name': 'S04E07/48', 'episode_body': 'v2'})])
+
+    assert outbox.stats() == {'pending': 1}
+    [item] = outbox.claim(max_items=10, max_bytes=1 << 20)
+    assert (item['version'], item['payload']['episode_body']) == (2, 'v2')
+    outbox.close()
+
+
+def test_sent_items_are_pruned_after_the_retention(tmp_path):
+    outbox = Outbox(tmp_path / 'outbox.db')
+    items = make_items(10)
+    outbox.add(items)
+    keys = [item['key'] for item in outbox.claim(max_items=10, max_bytes=1 << 20)]
+    outbox.mark_sent(keys)
+    outbox.add(make_items(2, prefix='nueva'))
+
+    # Cinco confirmados hace 8 días, cinco hace un momento
+    with outbox._lock:
+        outbox._conn.executemany('UPDATE outbox SET sent_at = sent_at - 8 * 86400 WHERE key = ?',
+                                 [(key,) for key in keys[:5]])
+    assert outbox.prune_sent(older_than_days=7) == 5
+    assert outbox.stats() == {'sent': 5, 'pending': 2}
+
+    # La versión se recuerda: reencolar lo ya enviado y borrado no lo duplica
+    assert outbox.add(items) == 0
+    outbox.close()
+
+
+def test_outbox_created_before_versioning_is_upgraded(tmp_path):
+    import sqlite3
+
+    db_path = tmp_path / 'outbox.db'
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE outbox (key TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, "
+                 "size INTEGER NOT NULL, state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+                 "next_attempt_at REAL NOT NULL, created_at REAL NOT NULL, sent_at REAL, last_error TEXT) WITHOUT ROWID")
+    conn.execute("INSERT INTO outbox (key, kind, payload, size, next_attempt_at, created_at) "
+                 "VALUES ('old', 'episode', '{}', 2, 0, 0)")
+    conn.commit()
+    conn.close()
+
+    outbox = Outbox(db_path)
+    assert outbox.add(make_items(1)) == 1
+    claimed = outbox.claim(max_items=10, max_bytes=1 << 20)
+    assert [(item['key'], item['version']) for item in claimed][0] == ('old', 1)
+    assert len(claimed) == 2
+    outbox.close()
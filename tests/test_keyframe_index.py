@@ -0,0 +1,62 @@
+"""Lectura exacta de fotogramas con el índice de keyframes."""
+
+import shutil
+
+import numpy as np
+import pytest
+from conftest import CLIP_FPS, make_index
+
+from utils.keyframe_index import KeyframeIndex, index_path_for
+
+
+def test_read_frame_matches_sequential_decode(long_gop_clip, sequential_frames):
+    index = make_index(long_gop_clip, [0, 240])
+    # Orden mezclado: saltos hacia atrás, dentro del mismo GOP y cruzando keyframes
+    for n in [5, 100, 101, 239, 240, 241, 287, 3, 150, 149, 0, 200]:
+        assert np.array_equal(index.read_frame(n), sequential_frames[n]), n
+    index.close()
+
+
+def test_read_frame_trusts_the_decoder_position(long_gop_clip, sequential_frames):
+    # El PTS del índice cae un fotograma después del keyframe que dice (ej. edit list)
+    index = make_index(long_gop_clip, [0, 120], pts_frames=[0, 121])
+    for n in [121, 130, 125]:
+        assert np.array_equal(index.read_frame(n), sequential_frames[n]), n
+    index.close()
+
+
+def test_save_and_load_roundtrip(long_gop_clip, tmp_path):
+    copy = tmp_path / 'clip.mp4'
+    shutil.copyfile(long_gop_clip, copy)
+    make_index(copy, [0, 240], pos=[48, 9000]).save()
+    loaded = KeyframeIndex.load(str(copy))
+    assert loaded.frames.tolist() == [0, 240]
+    assert loaded.nearest_keyframe(239) == 0 and loaded.nearest_keyframe(240) == 240
+    assert loaded.keyframe_info(250) == {'frame': 240, 'pts_time': 10.0, 'pos': 9000}
+
+
+def test_load_index_saved_without_offsets(long_gop_clip, tmp_path):
+    copy = tmp_path / 'clip.mp4'
+    shutil.copyfile(long_gop_clip, copy)
+    # Formato anterior: sin el arreglo 'pos'
+    np.savez(index_path_for(str(copy)), frames=np.array([0, 240]), pts=np.array([0, 240]),
+             fps=CLIP_FPS, time_base=np.array([1, int(CLIP_FPS)]), start_time=0.0)
+    loaded = KeyframeIndex.load(str(copy))
+    assert loaded.pos.tolist() == [-1, -1]
+    assert loaded.keyframe_info(10)['pos'] == -1
+
+
+def test_offsets_beyond_the_file_invalidate_the_index(long_gop_clip, tmp_path):
+    copy = tmp_path / 'clip.mp4'
+    shutil.copyfile(long_gop_clip, copy)
+    make_index(copy, [0, 240], pos=[48, copy.stat().st_size]).save()
+    assert KeyframeIndex.load(str(copy)) is None
+
+
+@pytest.mark.skipif(shutil.which('ffprobe') is None, reason="ffprobe no está instalado")
+def test_build_finds_the_keyframes(long_gop_clip, tmp_path):
+    copy = tmp_path / 'clip.mp4'
+    shutil.copyfile(long_gop_clip, copy)
+    index = KeyframeIndex.build(str(copy))
+    assert index.frames.tolist() == [0, 240]
+    assert index.pos[0] > 0 and index.pos[1] > index.pos[0]
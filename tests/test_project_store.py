@@ -0,0 +1,160 @@
+"""Almacén SQLite del proyecto: ediciones pequeñas, carga perezosa e historial."""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from utils.project_store import ProjectStore
+from utils.scene_grouping import apply_grouping, merge_scene_range, split_scene_at
+
+APP_PATH = str(Path(__file__).parent.parent / 'app.py')
+FPS = 24
+
+
+def make_scenes(bounds):
+    """Escenas contiguas a partir de fotogramas de corte (ej. [0, 48, 96])."""
+    scenes = []
+    for i, (start, end) in enumerate(zip(bounds, bounds[1:])):
+        scenes.append({
+            'id': f"scene_{i+1:03d}", 'index': i,
+            'start_frame': start, 'end_frame': end,
+            'start_time': start / FPS, 'end_time': end / FPS, 'duration': (end - start) / FPS,
+            'start_timecode': f"{start / FPS:.3f}", 'end_timecode': f"{end / FPS:.3f}",
+            'status': 'detected', 'characters': [], 'notes': '', 'ai_analysis': None, 'thumbnail_path': None,
+        })
+    return scenes
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProjectStore(tmp_path / 'curator.db')
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def episode(store):
+    episode_id = store.get_or_create_episode('video-key', 'S04E07.mp4')
+    store.replace_scenes(episode_id, make_scenes([0, 48, 96, 144, 192]), threshold=27.0)
+    return episode_id
+
+
+def test_get_or_create_episode_is_idempotent(store):
+    first = store.get_or_create_episode('video-key', 'a.mp4')
+    assert store.get_or_create_episode('video-key', 'b.mp4') == first
+    assert store.episode_filenames() == {first: 'a.mp4'}
+    assert not store.has_scenes(first)
+
+
+def test_summaries_are_light_and_load_scene_is_full(store, episode):
+    store.update_annotation(episode, 48, characters=['Once', 'Hopper'], notes="Flashback", status='annotated')
+
+    summaries = store.load_scene_summaries(episode)
+    assert [s['id'] for s in summaries] == ['scene_001', 'scene_002', 'scene_003', 'scene_004']
+    assert all(s['loaded'] is False and s['notes'] == '' and s['characters'] == [] for s in summaries)
+    assert summaries[1]['status'] == 'annotated'
+
+    full = store.load_scene(episode, 48)
+    assert full['loaded'] is True
+    assert full['characters'] == ['Hopper', 'Once']
+    assert full['notes'] == "Flashback"
+    assert 'id' not in full and 'merged_from' not in full
+    assert store.load_scene(episode, 50) is None
+
+
+def test_update_annotation_only_touches_given_fields(store, episode):
+    store.update_annotation(episode, 0, characters=['Once'], notes="Nota")
+    store.update_annotation(episode, 0, characters=['Will'])
+    scene = store.load_scene(episode, 0)
+    assert scene['characters'] == ['Will']
+    assert scene['notes'] == "Nota"
+    assert scene['status'] == 'detected'
+
+
+def test_merge_combines_notes_and_characters_in_sql(store, episode):
+    store.update_annotation(episode, 48, characters=['Once'], notes="A")
+    store.update_annotation(episode, 96, characters=['Will', 'Once'], notes="B")
+
+    # En memoria solo hay resúmenes: la fusión combina lo guardado en la base
+    summaries = store.load_scene_summaries(episode)
+    merged = merge_scene_range(summaries[1:3])
+    store.merge_scenes(episode, merged)
+
+    scenes = store.load_scenes(episode)
+    assert [(s['start_frame'], s['end_frame']) for s in scenes] == [(0, 48), (48, 144), (144, 192)]
+    assert scenes[1]['characters'] == ['Once', 'Will']
+    assert scenes[1]['notes'] == "A\nB"
+    assert scenes[1]['merged_from'] == [[48, 96], [96, 144]]
+
+
+def test_merged_from_survives_renumbering(store, episode):
+    scenes = store.load_scenes(episode)
+    grouped = apply_grouping(scenes, [{'start_index': 0, 'end_index': 1}, {'start_index': 2, 'end_index': 3}])
+    assert [s['id'] for s in grouped] == ['scene_001', 'scene_002']
+    assert grouped[1]['merged_from'] == [[96, 144], [144, 192]]
+
+    # Fusionar de nuevo conserva los rangos originales, no IDs reasignados
+    again = merge_scene_range(grouped)
+    assert again['merged_from'] == [[0, 48], [48, 96], [96, 144], [144, 192]]
+
+
+def test_split_updates_left_and_inserts_right(store, episode):
+    store.update_annotation(episode, 48, characters=['Once'], notes="Antes del corte")
+    left, right = split_scene_at(store.load_scene(episode, 48), 60)
+    store.split_scene(episode, left, right)
+
+    scenes = store.load_scenes(episode)
+    assert [(s['start_frame'], s['end_frame']) for s in scenes] == [(0, 48), (48, 60), (60, 96), (96, 144), (144, 192)]
+    assert scenes[1]['notes'] == "Antes del corte" and scenes[2]['notes'] == ''
+    assert scenes[2]['characters'] == ['Once']
+    assert scenes[1]['end_time'] == scenes[2]['start_time'] == pytest.approx(60 / FPS)
+    assert scenes[2]['start_timecode'] == '00:00:02.500'
+
+
+def test_split_outside_the_scene_is_rejected(store, episode):
+    with pytest.raises(ValueError):
+        split_scene_at(store.load_scene(episode, 48), 48)
+
+
+def test_history_records_each_edit_newest_first(store, episode):
+    store.update_annotation(episode, 0, notes="x")
+    store.merge_scenes(episode, merge_scene_range(store.load_scenes(episode)[2:4]))
+    left, right = split_scene_at(store.load_scene(episode, 0), 24)
+    store.split_scene(episode, left, right)
+
+    history = store.get_history(episode)
+    assert [h['operation'] for h in history] == ['split', 'merge', 'annotate', 'detect']
+    assert history[0]['payload'] == {'start_frame': 0, 'split_frame': 24}
+    assert history[1]['payload']['merged_from'] == [[96, 144], [144, 192]]
+    assert history[3]['payload'] == {'scene_count': 4, 'threshold': 27.0}
+    assert len(store.get_history(episode, limit=2)) == 2
+
+
+def test_split_button_in_the_annotation_panel(long_gop_clip):
+    # La app abre el almacén por defecto (ST_PROJECT_DB, aislado en conftest)
+    store = ProjectStore()
+    episode = store.get_or_create_episode('split-ui', 'clip.mp4')
+    store.replace_scenes(episode, make_scenes([0, 48, 96, 144]))
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.session_state['video_file'] = SimpleNamespace(name='clip.mp4')
+    at.session_state['video_path'] = str(long_gop_clip)
+    at.session_state['episode_id'] = episode
+    at.session_state['scenes'] = store.load_scene_summaries(episode)
+    at.session_state['analysis_completed'] = True
+    at.session_state['selected_scene_id'] = 'scene_2'
+    at.run()
+
+    at.number_input(key='split_frame_48').set_value(60)
+    at.button(key='split_48').click().run()
+
+    assert not at.exception
+    assert [(s['start_frame'], s['end_frame']) for s in at.session_state['scenes']] == \
+        [(0, 48), (48, 60), (60, 96), (96, 144)]
+    assert at.session_state['scenes'][2]['id'] == 'scene_003'
+    assert [(s['start_frame'], s['end_frame']) for s in store.load_scenes(episode)] == \
+        [(0, 48), (48, 60), (60, 96), (96, 144)]
+    assert store.get_history(episode, limit=1)[0]['operation'] == 'split'
+    store.close()
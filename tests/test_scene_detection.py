@@ -0,0 +1,93 @@
+"""Reanudación de la detección desde checkpoint frente a una pasada completa."""
+
+import threading
+
+import pytest
+from conftest import THRESHOLD, StopAfter
+from scenedetect import SceneManager, open_video
+from scenedetect.detectors import ContentDetector
+
+from utils.detection_checkpoint import checkpoint_path_for, load_checkpoint
+from utils.scene_detection import DetectionCancelled, SceneDetector
+
+class ProcessKilled(BaseException):
+    """Simula que el proceso muere (no es una Exception: nada la captura ni guarda)."""
+
+
+class KillAfter(threading.Event):
+    """Evento que "mata" la detección tras `n` comprobaciones, sin pasar por el guardado al detener."""
+
+    def __init__(self, n):
+        super().__init__()
+        self.remaining = n
+
+    def is_set(self):
+        self.remaining -= 1
+        if self.remaining < 0:
+            raise ProcessKilled()
+        return False
+
+
+def frame_ranges(scenes):
+    return [(scene['start_frame'], scene['end_frame']) for scene in scenes]
+
+
+def scene_manager_ranges(path):
+    manager = SceneManager()
+    manager.add_detector(ContentDetector(threshold=THRESHOLD))
+    manager.detect_scenes(open_video(str(path)))
+    return [(start.frame_num, end.frame_num) for start, end in manager.get_scene_list()]
+
+
+@pytest.mark.parametrize('killed_at', [1, 101, 144, 150, 287])
+def test_killed_run_resumes_from_last_periodic_checkpoint(long_gop_clip, killed_at):
+    with pytest.raises(ProcessKilled):
+        SceneDetector(str(long_gop_clip), THRESHOLD).detect_scenes(
+            checkpoint_every=40, stop_event=KillAfter(killed_at))
+
+    boundary = killed_at // 40 * 40
+    state = load_checkpoint(str(long_gop_clip), THRESHOLD)
+    if boundary == 0:
+        assert state is None  # murió antes del primer checkpoint: se empieza de cero
+    else:
+        assert not state['complete'] and state['next_frame'] == boundary
+
+    messages = []
+    resumed = SceneDetector(str(long_gop_clip), THRESHOLD).detect_scenes(
+        messages.append, checkpoint_every=40)
+    assert (f"Reanudando desde el fotograma {boundary}..." in messages) == (boundary > 0)
+
+    fresh = SceneDetector(str(long_gop_clip), THRESHOLD).detect_scenes(use_checkpoint=False)
+    assert len(fresh) == 4
+    assert frame_ranges(resumed) == frame_ranges(fresh)
+    assert frame_ranges(fresh) == scene_manager_ranges(long_gop_clip)
+
+
+@pytest.mark.parametrize('stop_after', [101, 150])
+def test_cancelled_run_saves_at_the_stop_frame(long_gop_clip, stop_after):
+    with pytest.raises(DetectionCancelled):
+        SceneDetector(str(long_gop_clip), THRESHOLD).detect_scenes(
+            checkpoint_every=40, stop_event=StopAfter(stop_after))
+    state = load_checkpoint(str(long_gop_clip), THRESHOLD)
+    assert not state['complete'] and state['next_frame'] == stop_after
+
+    resumed = SceneDetector(str(long_gop_clip), THRESHOLD).detect_scenes(checkpoint_every=40)
+    assert frame_ranges(resumed) == scene_manager_ranges(long_gop_clip)
+
+
+def test_complete_checkpoint_is_reused(long_gop_clip):
+    first = SceneDetector(str(long_gop_clip), THRESHOLD).detect_scenes()
+    state = load_checkpoint(str(long_gop_clip), THRESHOLD)
+    assert state['complete'] and state['next_frame'] == 288
+
+    # Sin decodificar de nuevo: el checkpoint completo es la caché del resultado
+    again = SceneDetector(str(long_gop_clip), THRESHOLD).detect_scenes()
+    assert frame_ranges(again) == frame_ranges(first)
+
+
+def test_corrupt_checkpoint_is_discarded(long_gop_clip):
+    path = checkpoint_path_for(str(long_gop_clip), THRESHOLD)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'not a checkpoint')
+    assert load_checkpoint(str(long_gop_clip), THRESHOLD) is None
+    assert not path.exists()
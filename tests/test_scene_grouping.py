@@ -0,0 +1,66 @@
+"""Firmas de color por plano y propuestas de agrupación."""
+
+import numpy as np
+import pytest
+from conftest import THRESHOLD, StopAfter
+
+from utils.scene_detection import DetectionCancelled, SceneDetector
+from utils.scene_grouping import (SIGNATURE_SIZE, compute_frame_signatures, compute_shot_signatures,
+                                  propose_groups, signatures_path_for)
+
+
+def unit(*hot):
+    v = np.zeros(SIGNATURE_SIZE, dtype=np.float32)
+    v[list(hot)] = 1.0
+    return v / np.linalg.norm(v)
+
+
+def test_full_tolerance_groups_everything():
+    # Firmas ortogonales: similitud 0, enlazadas solo con tolerancia 1.0
+    signatures = np.stack([unit(0), unit(1), unit(2)])
+    assert propose_groups(signatures, tolerance=1.0, window=4) == [
+        {'start_index': 0, 'end_index': 2, 'similarity': 0.0}]
+    assert propose_groups(signatures[:2], tolerance=1.0, window=4)[0]['end_index'] == 1
+
+
+def test_padding_never_links_the_last_shots():
+    signatures = np.stack([unit(0), unit(0), unit(5), unit(9)])
+    assert propose_groups(signatures, tolerance=0.1, window=4) == [
+        {'start_index': 0, 'end_index': 1, 'similarity': pytest.approx(1.0)}]
+
+
+def test_shot_reverse_shot_is_grouped():
+    a, b, c = unit(0, 1), unit(1, 2), unit(7)
+    signatures = np.stack([c, a, b, a, b, c])
+    proposals = propose_groups(signatures, tolerance=0.05, window=2)
+    assert [(p['start_index'], p['end_index']) for p in proposals] == [(1, 4)]
+
+
+def test_shot_signatures_average_the_frames_inside_each_shot():
+    frames = np.stack([unit(0)] * 4 + [unit(3)] * 4)  # stride 2 -> fotogramas 0..15
+    scenes = [{'start_frame': 0, 'end_frame': 8}, {'start_frame': 8, 'end_frame': 15},
+              {'start_frame': 9, 'end_frame': 10}]
+    signatures = compute_shot_signatures('unused.mp4', scenes, stride=2, frame_signatures=frames)
+    np.testing.assert_allclose(signatures[0], unit(0), atol=1e-6)
+    np.testing.assert_allclose(signatures[1], unit(3), atol=1e-6)
+    # Plano más corto que el paso: toma la muestra siguiente a su inicio
+    np.testing.assert_allclose(signatures[2], unit(3), atol=1e-6)
+
+
+def test_detection_pass_caches_the_same_signatures_as_a_sequential_pass(long_gop_clip):
+    path = str(long_gop_clip)
+    with pytest.raises(DetectionCancelled):
+        SceneDetector(path, THRESHOLD).detect_scenes(checkpoint_every=40, stop_event=StopAfter(101))
+    scenes = SceneDetector(path, THRESHOLD).detect_scenes(checkpoint_every=40)
+    from_detection = np.load(signatures_path_for(path)).astype(np.float32)
+
+    signatures_path_for(path).unlink()
+    sequential = compute_frame_signatures(path)
+    assert sequential.shape == from_detection.shape == (48, SIGNATURE_SIZE)
+    # Mismos fotogramas; como mucho algún píxel cambia de bin entre decodificadores
+    assert np.einsum('ij,ij->i', from_detection, sequential).min() > 0.99
+
+    shots = compute_shot_signatures(path, scenes)
+    assert shots.shape == (4, SIGNATURE_SIZE)
+    np.testing.assert_allclose(np.linalg.norm(shots, axis=1), 1.0, atol=1e-5)
+    assert propose_groups(shots, tolerance=0.05) == []
@@ -0,0 +1,62 @@
+"""Los clicks en chips solo re-ejecutan el fragment de selección, no la app entera."""
+
+import functools
+from pathlib import Path
+from types import SimpleNamespace
+
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+from streamlit.testing.v1 import AppTest
+from streamlit.testing.v1 import local_script_runner
+
+from utils import filmstrip, video_proxy
+from utils.scene_detection import get_sample_scenes
+
+APP_PATH = str(Path(__file__).parent.parent / 'app.py')
+
+
+def counting(monkeypatch, module, name):
+    """Sustituye `module.name` por un envoltorio que cuenta sus llamadas."""
+    calls = []
+    original = getattr(module, name)
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(module, name, wrapper)
+    return calls
+
+
+def click_in_fragment(at, monkeypatch, button_key, fragment_key):
+    """Hace click como el navegador: la petición de rerun lleva el ID del fragment."""
+    fragment_ids = at._fragment_storage.resolve_target(fragment_key)
+    with monkeypatch.context() as patch:
+        patch.setattr(local_script_runner, 'RerunData',
+                      functools.partial(RerunData, fragment_id_queue=fragment_ids))
+        at.button(key=button_key).click().run()
+
+
+def test_chip_click_reruns_only_the_selection_fragment(long_gop_clip, monkeypatch):
+    # El reproductor está en el cuerpo principal; el minimapa, dentro del fragment
+    main_body = counting(monkeypatch, video_proxy, 'get_playback_url')
+    in_fragment = counting(monkeypatch, filmstrip, 'load_sprite_index')
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.session_state['video_file'] = SimpleNamespace(name='clip.mp4')
+    at.session_state['video_path'] = str(long_gop_clip)
+    at.session_state['scenes'] = get_sample_scenes()
+    at.session_state['analysis_completed'] = True
+    at.run()
+    assert (len(main_body), len(in_fragment)) == (1, 1)
+
+    click_in_fragment(at, monkeypatch, 'chip_1', 'selection_workspace')
+
+    assert not at.exception
+    assert at.session_state['selected_scene_id'] == 'scene_2'
+    assert at.button(key='chip_1').disabled
+    assert len(in_fragment) == 2
+    assert len(main_body) == 1  # el cuerpo principal no se volvió a ejecutar
+
+    # Un rerun completo sí vuelve a pasar por el cuerpo principal
+    at.run()
+    assert (len(main_body), len(in_fragment)) == (2, 3)
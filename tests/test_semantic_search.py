@@ -0,0 +1,94 @@
+"""Búsqueda semántica: elección del embedder, búsqueda y salto a la escena."""
+
+import sys
+import types
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from utils import semantic_search
+from utils.semantic_search import HashedTfidfEmbedder, SemanticIndex, get_embedder
+
+APP_PATH = str(Path(__file__).parent.parent / 'app.py')
+
+
+class FakeSentenceTransformer:
+    def __init__(self, model_name, device):
+        self.model_name = model_name
+
+    def get_sentence_embedding_dimension(self):
+        return 8
+
+    def encode(self, texts, **kwargs):
+        return np.ones((len(texts), 8), dtype=np.float32) / np.sqrt(8)
+
+
+@pytest.fixture
+def fake_sentence_transformers(monkeypatch):
+    module = types.ModuleType('sentence_transformers')
+    module.SentenceTransformer = FakeSentenceTransformer
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', module)
+
+
+def test_model_is_the_default_when_installed(fake_sentence_transformers, monkeypatch):
+    monkeypatch.setattr(semantic_search, 'EMBEDDING_MODEL', semantic_search.DEFAULT_EMBEDDING_MODEL)
+    embedder = get_embedder()
+    assert not embedder.uses_idf
+    assert embedder.name == f"st-{semantic_search.DEFAULT_EMBEDDING_MODEL}"
+
+
+def test_tfidf_can_be_forced(fake_sentence_transformers, monkeypatch):
+    monkeypatch.setattr(semantic_search, 'EMBEDDING_MODEL', 'tfidf')
+    assert isinstance(get_embedder(), HashedTfidfEmbedder)
+
+
+def test_hashing_is_the_fallback_without_the_package(monkeypatch):
+    monkeypatch.setattr(semantic_search, 'EMBEDDING_MODEL', semantic_search.DEFAULT_EMBEDDING_MODEL)
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', None)  # import -> ImportError
+    assert isinstance(get_embedder(), HashedTfidfEmbedder)
+
+
+def test_search_ranks_the_matching_scene_first(tmp_path):
+    index = SemanticIndex(tmp_path / 'search', HashedTfidfEmbedder())
+    index.upsert(1, 0, "Hopper entra en el laboratorio de Hawkins")
+    index.upsert(1, 100, "Once pelea contra el Demogorgon en el bosque")
+    index.upsert(2, 0, "Dustin y Steve buscan a Dart en el sótano")
+
+    results = index.search("demogorgon bosque")
+    assert (results[0]['episode_id'], results[0]['start_frame']) == (1, 100)
+    assert index.search("demogorgon", episode_id=2) == []
+
+    index.remove(1, 100)
+    assert all(r['start_frame'] != 100 for r in index.search("demogorgon bosque", exact=True))
+
+
+def test_search_result_selects_the_same_chip(long_gop_clip, tmp_path, monkeypatch):
+    from utils.project_store import ProjectStore
+    from utils.scene_detection import get_sample_scenes
+
+    store = ProjectStore()
+    episode_id = store.get_or_create_episode('search-test', 'clip.mp4')
+    store.close()
+    scenes = get_sample_scenes()
+
+    index = SemanticIndex(tmp_path / 'search', HashedTfidfEmbedder())
+    index.upsert(episode_id, scenes[1]['start_frame'], "Once pelea contra el Demogorgon")
+    monkeypatch.setattr(semantic_search, '_index', index)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.session_state['video_file'] = SimpleNamespace(name='clip.mp4')
+    at.session_state['video_path'] = str(long_gop_clip)
+    at.session_state['episode_id'] = episode_id
+    at.session_state['scenes'] = scenes
+    at.session_state['analysis_completed'] = True
+    at.run()
+
+    at.text_input(key='search_query').input('demogorgon').run()
+    at.button(key='search_result_0').click().run()
+
+    assert not at.exception
+    assert at.session_state['selected_scene_id'] == 'scene_2'
+    assert at.button(key='chip_1').disabled  # el chip de esa escena queda seleccionado
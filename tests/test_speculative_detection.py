@@ -0,0 +1,82 @@
+"""Detección especulativa compartida entre sesiones."""
+
+import shutil
+import threading
+
+import pytest
+
+from utils import scene_detection
+from utils.detection_checkpoint import load_checkpoint
+from utils.speculative_detection import (cancel_speculative_detection, get_speculative_job,
+                                         start_speculative_detection)
+
+
+def test_same_content_joins_one_job(long_gop_clip, tmp_path):
+    # Dos sesiones suben el mismo episodio con nombres temporales distintos
+    copy = tmp_path / 'other_upload.mp4'
+    shutil.copyfile(long_gop_clip, copy)
+
+    first = start_speculative_detection(str(long_gop_clip), 27)
+    second = start_speculative_detection(str(copy), 27)
+    assert second is first
+    assert get_speculative_job(str(copy), 27) is first
+
+    first.wait(poll_interval=0.05)
+    assert first.status == 'done'
+    assert load_checkpoint(str(copy), 27)['complete']
+
+
+@pytest.fixture
+def gated_video(monkeypatch):
+    """Fuente de fotogramas que se bloquea en la primera lectura hasta abrir `gate`."""
+    reading, gate = threading.Event(), threading.Event()
+    open_video = scene_detection.open_video
+
+    def gated_open_video(path):
+        video = open_video(path)
+        read = video.read
+
+        def gated_read(*args, **kwargs):
+            reading.set()
+            gate.wait(10)
+            return read(*args, **kwargs)
+
+        video.read = gated_read
+        return video
+
+    monkeypatch.setattr(scene_detection, 'open_video', gated_open_video)
+    yield reading, gate
+    gate.set()
+
+
+def test_cancel_by_content_and_restart(long_gop_clip, tmp_path, gated_video):
+    reading, gate = gated_video
+    copy = tmp_path / 'other_upload.mp4'
+    shutil.copyfile(long_gop_clip, copy)
+
+    job = start_speculative_detection(str(long_gop_clip), 31)
+    assert reading.wait(10)  # la pasada está dentro del bucle de fotogramas
+    assert job.running
+
+    # Se cancela por contenido (otra ruta, mismo episodio) y se deja avanzar
+    cancel_speculative_detection(str(copy))
+    gate.set()
+    job.wait(poll_interval=0.05)
+    assert job.status == 'cancelled'
+    assert job.message == "Detenida"
+    assert not load_checkpoint(str(long_gop_clip), 31)['complete']
+
+    restarted = start_speculative_detection(str(long_gop_clip), 31)
+    assert restarted is not job
+    restarted.wait(poll_interval=0.05)
+    assert restarted.status == 'done'
+    assert load_checkpoint(str(copy), 31)['complete']
+
+
+def test_other_threshold_is_stopped(long_gop_clip):
+    slow = start_speculative_detection(str(long_gop_clip), 33)
+    fast = start_speculative_detection(str(long_gop_clip), 35)
+    assert slow.stop_event.is_set()
+    fast.wait(poll_interval=0.05)
+    slow.wait(poll_interval=0.05)
+    assert fast.status == 'done'
@@ -0,0 +1,172 @@
+"""Servidor de proxies con rangos, URLs públicas y transcodificación en segundo plano."""
+
+import http.client
+import logging
+from urllib.parse import urlsplit
+
+import pytest
+from conftest import requires_ffmpeg
+
+from utils import video_proxy
+from utils.video_proxy import ProxyServer, get_proxy_status, proxy_path_for, start_proxy
+
+PAYLOAD = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def server():
+    server = ProxyServer(host='127.0.0.1', port=0, public_url='')
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def served_url(server, tmp_path):
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(PAYLOAD)
+    return server.register(path)
+
+
+def request(url, method='GET', range_header=None):
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=5)
+    headers = {'Range': range_header} if range_header else {}
+    conn.request(method, parts.path, headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response, body
+
+
+def test_full_file_without_range(served_url):
+    response, body = request(served_url)
+    assert response.status == 200
+    assert response.getheader('Accept-Ranges') == 'bytes'
+    assert response.getheader('Content-Type') == 'video/mp4'
+    assert body == PAYLOAD
+
+
+def test_closed_range_returns_206(served_url):
+    response, body = request(served_url, range_header='bytes=100-199')
+    assert response.status == 206
+    assert response.getheader('Content-Range') == f'bytes 100-199/{len(PAYLOAD)}'
+    assert response.getheader('Content-Length') == '100'
+    assert body == PAYLOAD[100:200]
+
+
+def test_range_end_is_clamped_to_the_file(served_url):
+    response, body = request(served_url, range_header='bytes=10000-99999')
+    assert response.status == 206
+    assert response.getheader('Content-Range') == f'bytes 10000-{len(PAYLOAD) - 1}/{len(PAYLOAD)}'
+    assert body == PAYLOAD[10000:]
+
+
+def test_open_ended_range(served_url):
+    response, body = request(served_url, range_header='bytes=5000-')
+    assert response.status == 206
+    assert response.getheader('Content-Range') == f'bytes 5000-{len(PAYLOAD) - 1}/{len(PAYLOAD)}'
+    assert body == PAYLOAD[5000:]
+
+
+def test_suffix_range_returns_the_last_bytes(served_url):
+    response, body = request(served_url, range_header='bytes=-300')
+    assert response.status == 206
+    assert response.getheader('Content-Range') == f'bytes {len(PAYLOAD) - 300}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}'
+    assert body == PAYLOAD[-300:]
+
+
+@pytest.mark.parametrize('range_header', [f'bytes={len(PAYLOAD)}-', 'bytes=300-200'])
+def test_unsatisfiable_range_returns_416(served_url, range_header):
+    response, body = request(served_url, range_header=range_header)
+    assert response.status == 416
+    assert response.getheader('Content-Range') == f'bytes */{len(PAYLOAD)}'
+    assert body == b''
+
+
+@pytest.mark.parametrize('range_header', ['bytes=-', 'items=0-10'])
+def test_malformed_range_returns_416(served_url, range_header):
+    response, _ = request(served_url, range_header=range_header)
+    assert response.status == 416
+
+
+def test_head_sends_headers_only(served_url):
+    response, body = request(served_url, method='HEAD', range_header='bytes=0-9')
+    assert response.status == 206
+    assert response.getheader('Content-Length') == '10'
+    assert body == b''
+
+
+def test_unregistered_token_is_404(server):
+    response, _ = request(f"{server.base_url}/desconocido.mp4")
+    assert response.status == 404
+
+
+def test_public_url_prefers_the_configured_base(tmp_path):
+    server = ProxyServer(host='127.0.0.1', port=0, public_url='https://curator.example.com/media/')
+    try:
+        path = tmp_path / 'clip.mp4'
+        path.write_bytes(PAYLOAD)
+        url = server.register(path, page_url='https://curator.example.com/')
+        assert url.startswith('https://curator.example.com/media/')
+        assert url.endswith('.mp4') and '//' not in url[len('https://'):]
+    finally:
+        server.shutdown()
+
+
+def test_public_url_uses_the_page_host_and_server_port(caplog):
+    server = ProxyServer(host='0.0.0.0', port=0, public_url='')
+    try:
+        port = server.httpd.server_address[1]
+        assert server.base_url == f"http://127.0.0.1:{port}"
+        assert server.public_base_url(None) == server.base_url
+        assert server.public_base_url('http://192.168.1.20:8501/') == f"http://192.168.1.20:{port}"
+        assert server.public_base_url('http://[fd00::1]:8501/') == f"http://[fd00::1]:{port}"
+        assert not caplog.records
+    finally:
+        server.shutdown()
+
+
+def test_public_url_warns_once_about_loopback_and_https(server, caplog):
+    port = server.httpd.server_address[1]
+    with caplog.at_level(logging.WARNING):
+        for _ in range(2):
+            assert server.public_base_url('http://editor.lan:8501/') == f"http://editor.lan:{port}"
+            server.public_base_url('https://editor.lan/')
+    assert len(caplog.records) == 2
+    assert 'ST_PROXY_HOST' in caplog.records[0].message
+    assert 'ST_PROXY_PUBLIC_URL' in caplog.records[1].message
+
+
+def test_transcode_job_produces_a_servable_proxy(long_gop_clip, tmp_path, monkeypatch, server):
+    monkeypatch.setattr(video_proxy, 'PROXY_DIR', tmp_path / 'proxies')
+    monkeypatch.setattr(video_proxy, '_server', server)
+    assert get_proxy_status(str(long_gop_clip)) == 'missing'
+
+    job = start_proxy(str(long_gop_clip), height=120)
+    assert start_proxy(str(long_gop_clip), height=120) is job  # misma clave: un solo trabajo
+    job.wait(poll_interval=0.1)
+
+    assert job.status == 'done', job.error
+    output = proxy_path_for(str(long_gop_clip), height=120)
+    assert output.exists()
+    assert not list(output.parent.glob('.*'))  # sin temporales a medias
+    assert get_proxy_status(str(long_gop_clip), height=120) == 'ready'
+    assert start_proxy(str(long_gop_clip), height=120) is None
+
+    url = video_proxy.get_playback_url(str(long_gop_clip), height=120)
+    response, body = request(url, range_header='bytes=0-7')
+    assert response.status == 206 and body[4:8] == b'ftyp'
+
+
+@requires_ffmpeg
+def test_transcode_failure_is_reported_as_error(tmp_path, monkeypatch):
+    monkeypatch.setattr(video_proxy, 'PROXY_DIR', tmp_path / 'proxies')
+    broken = tmp_path / 'roto.mp4'
+    broken.write_bytes(b'no es un video')
+
+    job = start_proxy(str(broken))
+    job.wait(poll_interval=0.1)
+
+    assert job.status == 'error' and 'ffmpeg' in job.error
+    assert get_proxy_status(str(broken)) == 'error'
+    assert not list((tmp_path / 'proxies').iterdir())
@@ -0,0 +1,254 @@
+"""Módulo de análisis de la pista de audio para sugerir cortes semánticos.
+
+Los cortes de `_process_scenes` salen solo del cambio visual, pero los
+cambios de escena "de verdad" suelen coincidir con silencios o con golpes
+de música. Aquí se decodifica el audio con ffmpeg (mono, 8 kHz, PCM por
+un pipe) en bloques de tamaño fijo y se calcula con NumPy una envolvente
+RMS en dB por ventana de `HOP_SECONDS`; la memoria de decodificación es
+constante y la envolvente de un episodio ocupa unos cientos de KB.
+
+De la envolvente salen dos tipos de candidatos:
+
+- 'silence': tramos por debajo de `SILENCE_DB` de al menos `MIN_SILENCE` s.
+- 'sting': subidas bruscas de energía (media de después frente a media de
+  antes >= `STING_RISE_DB`). El "antes" son los últimos `STING_BEFORE` s
+  con sonido: las ventanas de silencio no cuentan, así que volver al mismo
+  nivel tras un silencio no es un golpe.
+
+Los candidatos se alinean al corte de plano más cercano (dentro de
+`SNAP_TOLERANCE`) y se exponen como pistas en la escena que empieza en
+ese corte. La pasada corre en segundo plano junto a la detección de
+video y se cachea por contenido del video.
+"""
+
+import logging
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .background_jobs import BackgroundJob, atomic_output, cache_dir, start_job
+from .video_proxy import video_cache_key
+
+SAMPLE_RATE = 8000
+HOP_SECONDS = 0.05
+HOP_SAMPLES = int(SAMPLE_RATE * HOP_SECONDS)
+CHUNK_HOPS = 200  # ventanas por lectura del pipe (10 s de audio)
+
+SILENCE_DB = -45.0
+MIN_SILENCE = 0.4
+STING_RISE_DB = 12.0
+STING_BEFORE = 1.0  # segundos de contexto antes de la subida
+STING_AFTER = 0.25  # segundos de contexto después de la subida
+SNAP_TOLERANCE = 0.5
+
+AUDIO_DIR = cache_dir('audio', 'ST_AUDIO_DIR')
+
+
+def envelope_path_for(video_path: str) -> Path:
+    """
+    Devuelve la ruta de caché de la envolvente de un video.
+
+    Args:
+        video_path: Ruta al archivo de video
+
+    Returns:
+        Ruta del archivo .npy (puede no existir todavía)
+    """
+    return AUDIO_DIR / f"{video_cache_key(video_path)}_{SAMPLE_RATE}hz_{HOP_SECONDS:g}s.npy"
+
+
+def compute_envelope(video_path: str,
+                     progress_callback: Optional[Callable[[str], None]] = None) -> np.ndarray:
+    """
+    Decodifica el audio en bloques y calcula la envolvente RMS en dBFS.
+
+    Args:
+        video_path: Ruta al archivo de video
+        progress_callback: Función opcional que recibe mensajes de progreso
+
+    Returns:
+        Array float32 con un valor por ventana de HOP_SECONDS (vacío si no hay audio)
+    """
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg no está instalado o no está en el PATH")
+
+    cmd = [
+        ffmpeg, '-nostdin', '-loglevel', 'error', '-i', str(video_path),
+        '-map', '0:a:0', '-vn', '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 's16le', '-',
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    chunk_bytes = CHUNK_HOPS * HOP_SAMPLES * 2
+    blocks = []
+    pending = b''
+    try:
+        while True:
+            data = process.stdout.read(chunk_bytes)
+            if not data:
+                break
+            data = pending + data
+            usable = len(data) - len(data) % (HOP_SAMPLES * 2)
+            pending = data[usable:]
+            if not usable:
+                continue
+            samples = np.frombuffer(data[:usable], dtype='<i2').reshape(-1, HOP_SAMPLES)
+            power = np.square(samples, dtype=np.float32).mean(axis=1) / (32768.0 ** 2)
+            blocks.append((10.0 * np.log10(np.maximum(power, 1e-10))).astype(np.float32))
+            if progress_callback and len(blocks) % 30 == 0:
+                progress_callback(f"Audio analizado: {len(blocks) * CHUNK_HOPS * HOP_SECONDS / 60:.0f} min")
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode('utf-8', errors='replace')
+        returncode = process.wait()
+
+    if returncode != 0:
+        if not blocks:
+            # Video sin pista de audio: no hay pistas que sugerir
+            logging.warning(f"Sin audio analizable en {video_path}: {stderr.strip()}")
+            return np.zeros(0, dtype=np.float32)
+        raise RuntimeError(f"ffmpeg falló decodificando el audio: {stderr.strip()}")
+    return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.float32)
+
+
+def _runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Inicio y fin (exclusivo) de cada tramo contiguo de True."""
+    edges = np.diff(np.r_[0, mask.astype(np.int8), 0])
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def find_audio_candidates(envelope: np.ndarray, hop: float = HOP_SECONDS) -> List[Dict]:
+    """
+    Busca silencios y golpes de energía en la envolvente.
+
+    Args:
+        envelope: Envolvente RMS en dBFS (una muestra por ventana)
+        hop: Segundos por ventana
+
+    Returns:
+        Lista ordenada de candidatos con 'time', 'kind' y 'strength'
+        (duración en s para silencios, subida en dB para golpes)
+    """
+    candidates = []
+    if envelope.size == 0:
+        return candidates
+
+    # Silencios: el candidato es el centro del tramo
+    starts, ends = _runs(envelope < SILENCE_DB)
+    keep = (ends - starts) * hop >= MIN_SILENCE
+    for start, end in zip(starts[keep], ends[keep]):
+        candidates.append({'time': float((start + end) / 2 * hop), 'kind': 'silence',
+                           'strength': float((end - start) * hop)})
+
+    # Golpes: media posterior menos media de las últimas `before` ventanas con
+    # sonido (saltando silencios), con sumas acumuladas
+    before = max(int(round(STING_BEFORE / hop)), 1)
+    after = max(int(round(STING_AFTER / hop)), 1)
+    n = envelope.size
+    if n > before + after:
+        cumsum = np.r_[0.0, np.cumsum(envelope, dtype=np.float64)]
+        sounding = envelope >= SILENCE_DB
+        sounding_cumsum = np.r_[0.0, np.cumsum(envelope[sounding], dtype=np.float64)]
+        sounding_count = np.r_[0, np.cumsum(sounding)]
+
+        idx = np.arange(before, n - after + 1)
+        count = sounding_count[idx]
+        has_context = count >= before
+        count = np.where(has_context, count, before)  # sin contexto: índice válido, se descarta abajo
+        reference = (sounding_cumsum[count] - sounding_cumsum[count - before]) / before
+        rise = np.where(has_context, (cumsum[idx + after] - cumsum[idx]) / after - reference, -np.inf)
+
+        # Máximos locales en una ventana de `before` para no repetir el mismo golpe
+        padded = np.pad(rise, before, constant_values=-np.inf)
+        local_max = np.lib.stride_tricks.sliding_window_view(padded, 2 * before + 1).max(axis=1)
+        peaks = np.flatnonzero((rise >= STING_RISE_DB) & (rise == local_max))
+        for peak in peaks:
+            candidates.append({'time': float(idx[peak] * hop), 'kind': 'sting', 'strength': float(rise[peak])})
+
+    candidates.sort(key=lambda c: c['time'])
+    return candidates
+
+
+def attach_boundary_hints(scenes: List[Dict], candidates: List[Dict],
+                          tolerance: float = SNAP_TOLERANCE) -> List[Dict]:
+    """
+    Alinea los candidatos de audio a los cortes de plano y los añade a las escenas.
+
+    Cada escena recibe 'audio_hints' (lista, vacía si no hay nada cerca de
+    su corte inicial) con 'kind', 'strength' y 'offset' (segundos entre el
+    candidato y el corte). Se conserva el candidato más fuerte de cada tipo.
+
+    Args:
+        scenes: Lista de escenas (se modifica en el sitio)
+        candidates: Salida de `find_audio_candidates`
+        tolerance: Distancia máxima en segundos entre candidato y corte
+
+    Returns:
+        La misma lista de escenas
+    """
+    for scene in scenes:
+        scene['audio_hints'] = []
+    if len(scenes) < 2 or not candidates:
+        return scenes
+
+    # El inicio del episodio no es un corte
+    cuts = np.array([scene['start_time'] for scene in scenes[1:]], dtype=np.float64)
+    times = np.array([c['time'] for c in candidates], dtype=np.float64)
+    right = np.minimum(np.searchsorted(cuts, times), len(cuts) - 1)
+    left = np.maximum(right - 1, 0)
+    nearest = np.where(np.abs(cuts[left] - times) <= np.abs(cuts[right] - times), left, right)
+    offsets = times - cuts[nearest]
+
+    for candidate, cut, offset in zip(candidates, nearest, offsets):
+        if abs(offset) > tolerance:
+            continue
+        hints = scenes[cut + 1]['audio_hints']
+        hint = {'kind': candidate['kind'], 'strength': candidate['strength'], 'offset': float(offset)}
+        existing = next((h for h in hints if h['kind'] == hint['kind']), None)
+        if existing is None:
+            hints.append(hint)
+        elif hint['strength'] > existing['strength']:
+            existing.update(hint)
+    return scenes
+
+
+def load_audio_candidates(video_path: str) -> Optional[List[Dict]]:
+    """
+    Devuelve los candidatos de audio si la envolvente ya está calculada.
+
+    Args:
+        video_path: Ruta al archivo de video
+
+    Returns:
+        Lista de candidatos o None si el análisis no ha terminado
+    """
+    path = envelope_path_for(video_path)
+    if not path.exists():
+        return None
+    return find_audio_candidates(np.load(path))
+
+
+def start_audio_analysis(video_path: str) -> Optional[BackgroundJob]:
+    """
+    Lanza el cálculo de la envolvente en segundo plano (una vez por video).
+
+    Args:
+        video_path: Ruta al archivo de video
+
+    Returns:
+        Trabajo en segundo plano, o None si la envolvente ya estaba en caché
+    """
+    path = envelope_path_for(video_path)
+    if path.exists():
+        return None
+
+    def run(job: BackgroundJob) -> None:
+        envelope = compute_envelope(video_path, lambda message: setattr(job, 'message', message))
+        with atomic_output(path) as tmp_path:
+            np.save(tmp_path, envelope)
+        print(f"[TERMINAL AUDIO] ✅ Envolvente de audio lista: {envelope.size * HOP_SECONDS:.0f}s")
+
+    return start_job(str(path), run, name='audio-analysis')
@@ -0,0 +1,207 @@
+"""Módulo de trabajos en segundo plano compartido por los pasos de caché.
+
+Proxies, filmstrips, análisis de audio y detección especulativa lanzan un
+hilo daemon por video. Este registro común:
+
+- evita lanzar dos veces el mismo trabajo (misma clave = mismo resultado);
+- guarda el estado ('running', 'done', 'cancelled', 'error'), el último mensaje de
+  progreso y el error, con la misma semántica para todos;
+- descarta los trabajos terminados pasados `FINISHED_TTL` segundos, así
+  un fallo se puede reintentar más tarde y el registro no crece sin fin.
+
+`cache_dir` centraliza dónde se guardan los resultados: bajo el directorio
+de datos de la aplicación (`data/cache`, o `ST_CACHE_DIR`), nunca en el
+directorio temporal compartido del sistema.
+"""
+
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+CACHE_DIR = Path(os.environ.get('ST_CACHE_DIR', 'data/cache'))
+
+# Segundos que un trabajo terminado sigue en el registro (para consultar su estado)
+FINISHED_TTL = 600.0
+
+
+def cache_dir(name: str, env_var: str) -> Path:
+    """
+    Devuelve el directorio de caché de un tipo de resultado.
+
+    Args:
+        name: Nombre del subdirectorio dentro de CACHE_DIR (ej. 'proxies')
+        env_var: Variable de entorno que, si existe, lo redirige (ej. 'ST_PROXY_DIR')
+
+    Returns:
+        Ruta del directorio (puede no existir todavía)
+    """
+    return Path(os.environ.get(env_var, CACHE_DIR / name))
+
+
+@contextlib.contextmanager
+def atomic_output(path: Path) -> Iterator[Path]:
+    """
+    Da una ruta temporal única junto a `path` y la renombra al terminar.
+
+    El nombre temporal es único por escritor, así que dos sesiones que
+    generan el mismo resultado no se pisan; el último `os.replace` gana y
+    nunca se lee un archivo a medias. Si el bloque falla se borra.
+
+    Args:
+        path: Ruta final
+
+    Yields:
+        Ruta temporal en el mismo directorio (conserva la extensión de `path`)
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f".{path.stem}.",
+                                     suffix=path.suffix, delete=False) as handle:
+        tmp_path = Path(handle.name)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+class BackgroundJob:
+    """Un trabajo en un hilo daemon con estado, progreso y cancelación."""
+
+    def __init__(self, key: str, target: Callable[['BackgroundJob'], None],
+                 name: str = 'job', niceness: int = 0):
+        """
+        Inicializa el trabajo (no lo arranca).
+
+        Args:
+            key: Clave única del trabajo
+            target: Función que recibe el propio trabajo (para `message` y `stop_event`)
+            name: Nombre del hilo (para logs)
+            niceness: Incremento de "nice" del hilo (solo Linux; 0 = sin cambios)
+        """
+        self.key = key
+        self.target = target
+        self.niceness = niceness
+        self.stop_event = threading.Event()
+        self.message = "En cola"
+        self.status = 'running'
+        self.error: Optional[str] = None
+        self.finished_at: Optional[float] = None
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def _run(self) -> None:
+        if self.niceness:
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), self.niceness)
+            except (AttributeError, OSError):
+                pass
+        try:
+            self.target(self)
+            self.status = 'cancelled' if self.stop_event.is_set() else 'done'
+        except Exception as e:
+            self.status = 'error'
+            self.error = str(e)
+            logging.error(f"Error en el trabajo en segundo plano {self.thread.name}: {e}")
+        finally:
+            self.finished_at = time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self.thread.is_alive()
+
+    def cancel(self) -> None:
+        """Pide al trabajo que se detenga (lo comprueba `target` vía `stop_event`)."""
+        self.stop_event.set()
+
+    def wait(self, progress_callback: Optional[Callable[[str], None]] = None,
+             poll_interval: float = 0.5) -> None:
+        """
+        Espera a que termine el trabajo, informando del progreso.
+
+        Args:
+            progress_callback: Función que recibe el mensaje de progreso
+            poll_interval: Segundos entre comprobaciones
+        """
+        while self.running:
+            if progress_callback:
+                progress_callback(self.message)
+            self.thread.join(poll_interval)
+
+
+_jobs: Dict[str, BackgroundJob] = {}
+_lock = threading.Lock()
+
+
+def _prune_locked() -> None:
+    """Quita del registro los trabajos terminados hace más de FINISHED_TTL."""
+    now = time.monotonic()
+    for key, job in list(_jobs.items()):
+        if job.finished_at is not None and now - job.finished_at > FINISHED_TTL:
+            del _jobs[key]
+
+
+def start_job(key: str, target: Callable[[BackgroundJob], None],
+              name: str = 'job', niceness: int = 0) -> BackgroundJob:
+    """
+    Lanza un trabajo, o devuelve el que ya existe con la misma clave.
+
+    Un trabajo cancelado se sustituye por uno nuevo (esperando antes a que
+    el anterior termine, para no tener dos escritores del mismo resultado).
+
+    Args:
+        key: Clave única del trabajo
+        target: Función que recibe el trabajo
+        name: Nombre del hilo
+        niceness: Incremento de "nice" del hilo
+
+    Returns:
+        Trabajo en curso o terminado
+    """
+    while True:
+        with _lock:
+            _prune_locked()
+            job = _jobs.get(key)
+            if job is None or (job.stop_event.is_set() and not job.running):
+                job = BackgroundJob(key, target, name, niceness)
+                _jobs[key] = job
+                job.thread.start()
+                return job
+            if not job.stop_event.is_set():
+                return job
+        # Cancelado pero aún vivo: se espera fuera del lock para no bloquear el
+        # registro; después se vuelve a mirar (otra sesión pudo relanzarlo ya)
+        job.thread.join()
+
+
+def get_job(key: str) -> Optional[BackgroundJob]:
+    """
+    Devuelve el trabajo con una clave, si sigue en el registro.
+
+    Args:
+        key: Clave del trabajo
+
+    Returns:
+        BackgroundJob o None
+    """
+    with _lock:
+        _prune_locked()
+        return _jobs.get(key)
+
+
+def find_jobs(prefix: str) -> List[BackgroundJob]:
+    """
+    Devuelve los trabajos cuya clave empieza por `prefix`.
+
+    Args:
+        prefix: Prefijo de la clave
+
+    Returns:
+        Lista de trabajos
+    """
+    with _lock:
+        _prune_locked()
+        return [job for key, job in _jobs.items() if key.startswith(prefix)]
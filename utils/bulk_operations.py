@@ -0,0 +1,334 @@
+"""Módulo de operaciones masivas de curación sobre la lista de escenas.
+
+La lista de escenas se representa como un array ordenado de límites en
+fotogramas (inicio de cada escena más el final de la última). Cada regla
+es una pasada vectorizada de NumPy sobre ese array:
+
+- `merge_short`: fusiona planos más cortos que X segundos con su vecino.
+- `snap_to_multiple` / `snap_to_keyframes`: ajusta los cortes al múltiplo
+  de fotogramas o keyframe más cercano.
+- `merge_windows`: une (o descarta) rangos de tiempo como créditos o recaps.
+
+Si la lista tiene huecos (escenas descartadas antes con `drop_windows`),
+cada tramo contiguo de escenas se procesa por separado: un hueco nunca se
+fusiona con un plano ni lo absorbe.
+
+`preview_rule` calcula el resultado sin tocar nada y devuelve un diff para
+revisarlo; `apply_rule` construye la nueva lista de escenas a partir de él.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .scene_grouping import merge_scene_range, renumber_scenes
+
+# Pasadas máximas de merge_short (los planos cortos encadenados convergen en 2-3)
+MAX_PASSES = 8
+
+
+def estimate_fps(scenes: List[Dict]) -> float:
+    """
+    Estima los FPS del video a partir de los fotogramas y tiempos de las escenas.
+
+    Args:
+        scenes: Lista de escenas
+
+    Returns:
+        Fotogramas por segundo
+    """
+    frames = np.array([s['end_frame'] for s in scenes], dtype=np.float64)
+    seconds = np.array([s['end_time'] for s in scenes], dtype=np.float64)
+    valid = seconds > 0
+    if not valid.any():
+        raise ValueError("No se pueden estimar los FPS sin escenas con duración")
+    return float(np.median(frames[valid] / seconds[valid]))
+
+
+def scenes_to_boundaries(scenes: List[Dict]) -> np.ndarray:
+    """
+    Convierte la lista de escenas en un array ordenado de límites (fotogramas).
+
+    Args:
+        scenes: Lista de escenas
+
+    Returns:
+        Array int64 con inicios y finales únicos, ordenado
+    """
+    starts = np.fromiter((s['start_frame'] for s in scenes), dtype=np.int64, count=len(scenes))
+    ends = np.fromiter((s['end_frame'] for s in scenes), dtype=np.int64, count=len(scenes))
+    return np.union1d(starts, ends)
+
+
+def contiguous_runs(scenes: List[Dict]) -> List[np.ndarray]:
+    """
+    Separa la lista de escenas en tramos sin huecos, como arrays de límites.
+
+    Args:
+        scenes: Lista de escenas
+
+    Returns:
+        Lista de arrays de límites, uno por tramo contiguo, en orden
+    """
+    boundaries = scenes_to_boundaries(scenes)
+    starts = np.fromiter((s['start_frame'] for s in scenes), dtype=np.int64, count=len(scenes))
+    ends = np.fromiter((s['end_frame'] for s in scenes), dtype=np.int64, count=len(scenes))
+    # Un hueco es un límite que solo termina escenas seguido de otro que solo las empieza
+    gap_starts = np.setdiff1d(ends, starts)[:-1]
+    split = np.searchsorted(boundaries, gap_starts) + 1
+    return np.split(boundaries, split)
+
+
+def seconds_to_timecode(seconds: float) -> str:
+    """
+    Formatea segundos como HH:MM:SS.mmm (mismo formato que PySceneDetect).
+
+    Args:
+        seconds: Tiempo en segundos
+
+    Returns:
+        Timecode como string
+    """
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+# --- Reglas (boundaries -> boundaries) ---
+
+def merge_short(boundaries: np.ndarray, fps: float, min_duration: float) -> np.ndarray:
+    """
+    Fusiona cada plano más corto que `min_duration` con el plano anterior.
+
+    Los planos cortos consecutivos se unen al plano largo que los precede; si
+    el primer plano es corto se une al siguiente.
+
+    Args:
+        boundaries: Array de límites
+        fps: Fotogramas por segundo
+        min_duration: Duración mínima en segundos
+
+    Returns:
+        Nuevo array de límites
+    """
+    min_frames = int(round(min_duration * fps))
+    for _ in range(MAX_PASSES):
+        lengths = np.diff(boundaries)
+        short = lengths < min_frames
+        if len(lengths) <= 1 or not short.any():
+            break
+
+        remove = np.zeros(len(boundaries), dtype=bool)
+        remove[1:-1] = short[1:]  # el plano i>0 pierde su límite inicial
+        remove[1] |= short[0]     # el primer plano pierde su límite final
+        boundaries = boundaries[~remove]
+    return boundaries
+
+
+def snap_to_multiple(boundaries: np.ndarray, fps: float, multiple: int) -> np.ndarray:
+    """
+    Ajusta los cortes interiores al múltiplo de `multiple` fotogramas más cercano.
+
+    Args:
+        boundaries: Array de límites
+        fps: Fotogramas por segundo (no usado, por uniformidad de la API)
+        multiple: Múltiplo en fotogramas
+
+    Returns:
+        Nuevo array de límites (los planos que colapsan desaparecen)
+    """
+    interior = boundaries[1:-1]
+    snapped = np.rint(interior / multiple).astype(np.int64) * multiple
+    snapped = np.clip(snapped, boundaries[0], boundaries[-1])
+    return np.unique(np.concatenate(([boundaries[0]], snapped, [boundaries[-1]])))
+
+
+def snap_to_keyframes(boundaries: np.ndarray, fps: float, keyframes: Sequence[int],
+                      max_distance: Optional[float] = None) -> np.ndarray:
+    """
+    Ajusta los cortes interiores al keyframe más cercano.
+
+    Args:
+        boundaries: Array de límites
+        fps: Fotogramas por segundo
+        keyframes: Números de fotograma de los keyframes (ordenados)
+        max_distance: Distancia máxima en segundos para ajustar (None = sin límite)
+
+    Returns:
+        Nuevo array de límites
+    """
+    keyframes = np.asarray(keyframes, dtype=np.int64)
+    if keyframes.size == 0:
+        return boundaries
+
+    interior = boundaries[1:-1]
+    pos = np.searchsorted(keyframes, interior)
+    before = keyframes[np.clip(pos - 1, 0, keyframes.size - 1)]
+    after = keyframes[np.clip(pos, 0, keyframes.size - 1)]
+    nearest = np.where(np.abs(interior - before) <= np.abs(after - interior), before, after)
+
+    if max_distance is not None:
+        limit = int(round(max_distance * fps))
+        nearest = np.where(np.abs(nearest - interior) <= limit, nearest, interior)
+
+    nearest = np.clip(nearest, boundaries[0], boundaries[-1])
+    return np.unique(np.concatenate(([boundaries[0]], nearest, [boundaries[-1]])))
+
+
+def merge_windows(boundaries: np.ndarray, fps: float,
+                  windows: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """
+    Convierte cada ventana de tiempo (inicio, fin) en una única escena.
+
+    Args:
+        boundaries: Array de límites
+        fps: Fotogramas por segundo
+        windows: Lista de ventanas en segundos
+
+    Returns:
+        Nuevo array de límites
+    """
+    window_frames = _windows_to_frames(boundaries, fps, windows)
+    if window_frames.size == 0:
+        return boundaries
+
+    starts, ends = window_frames[:, 0], window_frames[:, 1]
+    inside = ((boundaries[:, None] > starts) & (boundaries[:, None] < ends)).any(axis=1)
+    return np.unique(np.concatenate((boundaries[~inside], starts, ends)))
+
+
+def _windows_to_frames(boundaries: np.ndarray, fps: float,
+                       windows: Sequence[Tuple[float, float]]) -> np.ndarray:
+    """
+    Convierte ventanas en segundos a fotogramas, recortadas al video.
+
+    Las ventanas que se solapan o se tocan se unen en una sola, de modo que
+    el resultado está ordenado y sin solapes.
+    """
+    if not windows:
+        return np.empty((0, 2), dtype=np.int64)
+    frames = np.rint(np.asarray(windows, dtype=np.float64) * fps).astype(np.int64)
+    frames = np.clip(frames, boundaries[0], boundaries[-1])
+    frames = frames[frames[:, 1] > frames[:, 0]]
+    if frames.size == 0:
+        return frames
+
+    frames = frames[np.argsort(frames[:, 0], kind='stable')]
+    # Una ventana empieza un grupo nuevo si arranca después de todas las anteriores
+    reach = np.maximum.accumulate(frames[:, 1])
+    new_group = np.concatenate(([True], frames[1:, 0] > reach[:-1]))
+    group_ends = np.concatenate((np.flatnonzero(new_group)[1:] - 1, [len(frames) - 1]))
+    return np.column_stack((frames[new_group, 0], reach[group_ends]))
+
+
+RULES: Dict[str, Callable[..., np.ndarray]] = {
+    'merge_short': merge_short,
+    'snap_to_multiple': snap_to_multiple,
+    'snap_to_keyframes': snap_to_keyframes,
+    'merge_windows': merge_windows,
+    'drop_windows': merge_windows,
+}
+
+
+# --- Vista previa y aplicación ---
+
+def preview_rule(scenes: List[Dict], rule: str, fps: Optional[float] = None, **params) -> Dict:
+    """
+    Ejecuta una regla en modo simulación y devuelve el diff resultante.
+
+    Args:
+        scenes: Lista de escenas actual
+        rule: Nombre de la regla (ver RULES)
+        fps: Fotogramas por segundo (None = estimar desde las escenas)
+        **params: Parámetros de la regla
+
+    Returns:
+        Diccionario con el diff ('removed', 'added', recuentos) y los datos
+        necesarios para `apply_rule`: 'after' (límites) y 'covered' (por
+        segmento, False si es un hueco sin escena)
+    """
+    if rule not in RULES:
+        raise ValueError(f"Regla desconocida: {rule}")
+    if fps is None:
+        fps = estimate_fps(scenes)
+
+    before = scenes_to_boundaries(scenes)
+    pieces, covered = [], []
+    for run in contiguous_runs(scenes):
+        run_after = RULES[rule](run, fps, **params)
+        run_covered = np.ones(len(run_after) - 1, dtype=bool)
+        if rule == 'drop_windows':
+            window_frames = _windows_to_frames(run, fps, params.get('windows', []))
+            # Un segmento se descarta si cae dentro de alguna ventana
+            inside = ((run_after[:-1, None] >= window_frames[:, 0])
+                      & (run_after[1:, None] <= window_frames[:, 1])).any(axis=1)
+            run_covered &= ~inside
+        if pieces:
+            # El hueco entre dos tramos queda como segmento sin escena
+            covered.append(np.zeros(1, dtype=bool))
+        pieces.append(run_after)
+        covered.append(run_covered)
+
+    after = np.concatenate(pieces)
+    covered = np.concatenate(covered)
+    return {
+        'rule': rule,
+        'params': params,
+        'fps': fps,
+        'before': before,
+        'after': after,
+        'covered': covered,
+        'removed': np.setdiff1d(before, after),
+        'added': np.setdiff1d(after, before),
+        'scenes_before': len(scenes),
+        'scenes_after': int(covered.sum()),
+    }
+
+
+def apply_rule(scenes: List[Dict], diff: Dict) -> List[Dict]:
+    """
+    Construye la nueva lista de escenas a partir de un diff de `preview_rule`.
+
+    Cada segmento cubierto se mapea a las escenas originales que solapa con
+    `searchsorted`; si coincide exactamente con una escena se conserva tal
+    cual y, si no, se fusionan y se ajustan sus límites. Los huecos se omiten.
+
+    Args:
+        scenes: Lista de escenas usada en la vista previa
+        diff: Resultado de `preview_rule`
+
+    Returns:
+        Nueva lista de escenas renumerada
+    """
+    fps = diff['fps']
+    after = diff['after']
+    seg_starts, seg_ends = after[:-1], after[1:]
+
+    orig_starts = np.fromiter((s['start_frame'] for s in scenes), dtype=np.int64, count=len(scenes))
+    first = np.searchsorted(orig_starts, seg_starts, side='right') - 1
+    last = np.searchsorted(orig_starts, seg_ends, side='left') - 1
+
+    result = []
+    for k in np.flatnonzero(diff['covered']):
+        start, end = int(seg_starts[k]), int(seg_ends[k])
+        i, j = int(first[k]), int(last[k])
+        original = scenes[i]
+        if i == j and original['start_frame'] == start and original['end_frame'] == end:
+            result.append(dict(original))
+            continue
+
+        scene = merge_scene_range(scenes[i:j + 1]) if j > i else dict(original, status='edited')
+        scene.update({
+            'start_frame': start,
+            'end_frame': end,
+            'start_time': start / fps,
+            'end_time': end / fps,
+            'duration': (end - start) / fps,
+            'start_timecode': seconds_to_timecode(start / fps),
+            'end_timecode': seconds_to_timecode(end / fps),
+        })
+        result.append(scene)
+
+    return renumber_scenes(result)
@@ -0,0 +1,212 @@
+"""Módulo de checkpoints para reanudar la detección de escenas.
+
+Durante la detección se guarda periódicamente en disco el siguiente
+fotograma a procesar, los cortes confirmados y el estado interno del
+detector (fotograma anterior, puntuación y filtro de flashes). Si el
+proceso de Streamlit se reinicia, volver a analizar el mismo video con la
+misma configuración continúa desde el checkpoint y no desde 0.
+
+El estado se guarda de forma explícita en un `.npz` (arrays y contadores,
+sin pickle) dentro del directorio de caché de la aplicación, así que
+cargar un checkpoint nunca ejecuta código. Al terminar, el checkpoint
+queda marcado como completo y sirve como caché del resultado.
+"""
+
+import json
+import logging
+from fractions import Fraction
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+from .background_jobs import atomic_output, cache_dir
+from .video_proxy import video_cache_key
+
+try:
+    from scenedetect import __version__ as SCENEDETECT_VERSION
+    from scenedetect.frame_timecode import FrameTimecode
+except ImportError:  # pragma: no cover
+    SCENEDETECT_VERSION = 'unknown'
+    FrameTimecode = None
+
+try:
+    from scenedetect.common import Timecode
+except ImportError:  # scenedetect < 0.7: las posiciones son números de fotograma
+    Timecode = None
+
+# Formato del checkpoint; incrementarlo invalida los existentes
+CHECKPOINT_VERSION = 3
+
+# Fotogramas procesados entre checkpoints (~1-2 min de video a 24-30 fps)
+CHECKPOINT_EVERY = 3000
+
+CHECKPOINT_DIR = cache_dir('checkpoints', 'ST_CHECKPOINT_DIR')
+
+# Planos del último fotograma que guarda ContentDetector
+_FRAME_PLANES = ('hue', 'sat', 'lum', 'edges')
+
+
+def checkpoint_path_for(video_path: str, threshold: float) -> Path:
+    """
+    Devuelve la ruta del checkpoint para un video y una configuración.
+
+    Args:
+        video_path: Ruta al archivo de video
+        threshold: Umbral de detección
+
+    Returns:
+        Ruta del archivo de checkpoint (puede no existir)
+    """
+    return CHECKPOINT_DIR / f"{video_cache_key(video_path)}_content_{threshold:g}.npz"
+
+
+def _encode_position(position) -> np.ndarray:
+    """Posición del filtro de flashes -> [pts, num, den] ([-1, 0, 0] si no hay)."""
+    if position is None:
+        return np.array([-1, 0, 0], dtype=np.int64)
+    if isinstance(position, int):
+        return np.array([position, 0, 0], dtype=np.int64)
+    time_base = Fraction(position.time_base)
+    return np.array([position.pts, time_base.numerator, time_base.denominator], dtype=np.int64)
+
+
+def _decode_position(encoded: np.ndarray, frame_rate):
+    """Inversa de `_encode_position` con el framerate del video."""
+    pts, num, den = (int(v) for v in encoded)
+    if pts < 0:
+        return None
+    if den == 0:
+        return pts
+    if Timecode is not None:
+        return FrameTimecode(Timecode(pts=pts, time_base=Fraction(num, den)), fps=frame_rate)
+    return FrameTimecode(int(round(pts * num / den * float(frame_rate))), fps=frame_rate)
+
+
+def detector_state(detector) -> Dict[str, np.ndarray]:
+    """
+    Extrae el estado interno de un ContentDetector como arrays.
+
+    Args:
+        detector: ContentDetector en uso
+
+    Returns:
+        Diccionario nombre -> array, apto para `np.savez`
+    """
+    arrays = {}
+    last_frame = detector._last_frame
+    if last_frame is not None:
+        for plane in _FRAME_PLANES:
+            value = getattr(last_frame, plane)
+            if value is not None:
+                arrays[f'last_{plane}'] = np.asarray(value)
+    if detector._frame_score is not None:
+        arrays['frame_score'] = np.array(detector._frame_score, dtype=np.float64)
+
+    flash = detector._flash_filter
+    arrays['flash_last_above'] = _encode_position(flash._last_above)
+    arrays['flash_merge_start'] = _encode_position(flash._merge_start)
+    arrays['flash_flags'] = np.array([flash._merge_enabled, flash._merge_triggered], dtype=np.bool_)
+    return arrays
+
+
+def restore_detector(detector, arrays: Dict[str, np.ndarray], frame_rate) -> None:
+    """
+    Carga en un ContentDetector recién creado el estado de `detector_state`.
+
+    Args:
+        detector: ContentDetector con la misma configuración que el guardado
+        arrays: Arrays guardados
+        frame_rate: Framerate del video (para reconstruir las posiciones)
+    """
+    if 'last_lum' in arrays:
+        planes = [arrays.get(f'last_{plane}') for plane in _FRAME_PLANES]
+        detector._last_frame = type(detector)._FrameData(*planes)
+    if 'frame_score' in arrays:
+        detector._frame_score = float(arrays['frame_score'])
+
+    flash = detector._flash_filter
+    flash._last_above = _decode_position(arrays['flash_last_above'], frame_rate)
+    flash._merge_start = _decode_position(arrays['flash_merge_start'], frame_rate)
+    flash._merge_enabled, flash._merge_triggered = (bool(v) for v in arrays['flash_flags'])
+
+
+def save_checkpoint(video_path: str, threshold: float, state: Dict) -> None:
+    """
+    Guarda el estado de la detección de forma atómica.
+
+    Args:
+        video_path: Ruta al archivo de video
+        threshold: Umbral de detección
+        state: Diccionario con 'next_frame', 'cuts', 'detector', 'complete' y
+            opcionalmente 'signatures' (firmas de color por fotograma)
+    """
+    path = checkpoint_path_for(video_path, threshold)
+    meta = {
+        'version': CHECKPOINT_VERSION,
+        'scenedetect_version': SCENEDETECT_VERSION,
+        'next_frame': int(state['next_frame']),
+        'complete': bool(state['complete']),
+    }
+    arrays = {f'detector_{name}': value for name, value in detector_state(state['detector']).items()}
+
+    # Nombre temporal único: dos sesiones con el mismo video no se pisan, y un
+    # corte de luz a mitad de escritura deja el checkpoint anterior intacto
+    with atomic_output(path) as partial:
+        np.savez(partial, meta=np.array(json.dumps(meta)),
+                 cuts=np.asarray(state['cuts'], dtype=np.int64),
+                 signatures=np.asarray(state.get('signatures', []), dtype=np.float16), **arrays)
+
+
+def load_checkpoint(video_path: str, threshold: float) -> Optional[Dict]:
+    """
+    Carga el checkpoint de un video si existe y es compatible.
+
+    Args:
+        video_path: Ruta al archivo de video
+        threshold: Umbral de detección
+
+    Returns:
+        Diccionario con 'next_frame', 'cuts', 'complete', 'signatures' y
+        'detector_state' (para `restore_detector`), o None si no hay checkpoint válido
+    """
+    path = checkpoint_path_for(video_path, threshold)
+    if not path.exists():
+        return None
+
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            cuts = [int(c) for c in data['cuts']]
+            signatures = data['signatures'].astype(np.float32)
+            arrays = {name[len('detector_'):]: data[name] for name in data.files
+                      if name.startswith('detector_')}
+    except Exception as e:
+        logging.warning(f"Checkpoint ilegible, se descarta ({path}): {e}")
+        clear_checkpoint(video_path, threshold)
+        return None
+
+    if (meta.get('version') != CHECKPOINT_VERSION
+            or meta.get('scenedetect_version') != SCENEDETECT_VERSION):
+        logging.info(f"Checkpoint de otra versión, se descarta: {path}")
+        clear_checkpoint(video_path, threshold)
+        return None
+
+    return {
+        'next_frame': meta['next_frame'],
+        'cuts': cuts,
+        'complete': meta['complete'],
+        'signatures': signatures,
+        'detector_state': arrays,
+    }
+
+
+def clear_checkpoint(video_path: str, threshold: float) -> None:
+    """
+    Elimina el checkpoint de un video y configuración.
+
+    Args:
+        video_path: Ruta al archivo de video
+        threshold: Umbral de detección
+    """
+    checkpoint_path_for(video_path, threshold).unlink(missing_ok=True)
@@ -0,0 +1,376 @@
+"""Módulo de detección y agrupación de caras para sugerir personajes.
+
+Etapa offline y solo CPU:
+
+1. Se muestrean algunos fotogramas por escena y se pasan por el detector
+   Haar de caras que viene incluido con OpenCV, en lotes repartidos entre
+   procesos (`ProcessPoolExecutor` con contexto 'spawn': hacer fork de un
+   servidor de Streamlit con hilos vivos puede dejar locks tomados). Cada
+   worker lee los fotogramas con el índice de keyframes, decodificando
+   solo desde el keyframe anterior en lugar de fiarse del seek de OpenCV.
+2. Cada cara se reduce a un descriptor compacto (recorte en gris 24x24
+   ecualizado y normalizado) y se agrupan todas las del episodio por
+   similitud coseno. Es solo una heurística de apariencia, no un
+   reconocimiento de identidad: la iluminación, la pose o el maquillaje
+   separan a un mismo personaje en varios grupos y dos caras parecidas
+   pueden caer en el mismo. Los grupos son sugerencias que el usuario
+   revisa antes de poner nombre.
+3. Cuando el usuario pone nombre a un grupo, la sugerencia se propaga a
+   todas las escenas donde aparece ese grupo.
+
+Los resultados por fotograma se cachean en disco por video, así que volver
+a curar un episodio no repite la detección.
+
+OpenCV 5 sacó el detector Haar (`CascadeClassifier`) del paquete
+principal; `face_detection_unavailable` lo comprueba antes de lanzar los
+workers.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - OpenCV viene con scenedetect[opencv]
+    cv2 = None
+
+from .background_jobs import atomic_output, cache_dir
+from .keyframe_index import KeyframeIndex, get_keyframe_index
+from .video_proxy import video_cache_key
+
+FACES_DIR = cache_dir('faces', 'ST_FACES_DIR')
+
+CASCADE_FILE = 'haarcascade_frontalface_default.xml'
+DETECT_WIDTH = 640  # los fotogramas se reducen a este ancho antes de detectar
+DESCRIPTOR_SIZE = 24  # lado del recorte en gris -> 576 dimensiones
+THUMB_SIZE = 48
+BATCH_SIZE = 32  # fotogramas por tarea de worker
+
+
+def _face_descriptor(gray_face: np.ndarray) -> np.ndarray:
+    """Descriptor compacto: recorte ecualizado, centrado y con norma unitaria."""
+    crop = cv2.resize(gray_face, (DESCRIPTOR_SIZE, DESCRIPTOR_SIZE), interpolation=cv2.INTER_AREA)
+    crop = cv2.equalizeHist(crop).astype(np.float32).ravel()
+    crop -= crop.mean()
+    norm = np.linalg.norm(crop)
+    return crop / norm if norm > 0 else crop
+
+
+def _open_keyframe_index(video_path: str) -> KeyframeIndex:
+    """
+    Índice de keyframes guardado junto al video (lo construye `detect_faces`).
+
+    Sin índice (ej. sin ffprobe) se usa uno con un único keyframe en 0: los
+    lotes van ordenados, así que cada worker decodifica secuencialmente una
+    sola vez hasta su último fotograma, sin seeks por fotograma.
+    """
+    index = KeyframeIndex.load(video_path)
+    if index is None:
+        cap = cv2.VideoCapture(video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 1.0
+        cap.release()
+        index = KeyframeIndex(video_path, np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64),
+                              np.full(1, -1, dtype=np.int64), fps, Fraction(1, 1))
+    return index
+
+
+def _detect_batch(video_path: str, frames: List[int]) -> List[Dict]:
+    """
+    Detecta caras en un lote de fotogramas (se ejecuta en un proceso worker).
+
+    Args:
+        video_path: Ruta al archivo de video
+        frames: Números de fotograma ordenados
+
+    Returns:
+        Lista de {'frame', 'boxes', 'descriptors', 'thumbs'} por fotograma
+    """
+    cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, CASCADE_FILE))
+    index = _open_keyframe_index(video_path)
+    results = []
+    try:
+        for frame_number in frames:
+            image = index.read_frame(frame_number)
+            ok = image is not None
+            boxes = np.empty((0, 4), dtype=np.int32)
+            descriptors = np.empty((0, DESCRIPTOR_SIZE * DESCRIPTOR_SIZE), dtype=np.float32)
+            thumbs = np.empty((0, THUMB_SIZE, THUMB_SIZE, 3), dtype=np.uint8)
+
+            if ok:
+                scale = min(1.0, DETECT_WIDTH / image.shape[1])
+                small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else image
+                gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+                found = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(32, 32))
+                if len(found):
+                    boxes = (np.asarray(found) / scale).astype(np.int32)
+                    descriptors = np.stack([_face_descriptor(gray[y:y + h, x:x + w]) for x, y, w, h in found])
+                    thumbs = np.stack([
+                        cv2.resize(small[y:y + h, x:x + w], (THUMB_SIZE, THUMB_SIZE), interpolation=cv2.INTER_AREA)
+                        for x, y, w, h in found
+                    ])
+
+            results.append({'frame': frame_number, 'boxes': boxes,
+                            'descriptors': descriptors, 'thumbs': thumbs})
+    finally:
+        index.close()
+    return results
+
+
+class FaceCache:
+    """Caras detectadas por fotograma de un video, persistidas en un .npz."""
+
+    def __init__(self, video_path: str):
+        """
+        Carga la caché del video (vacía si no existe).
+
+        Args:
+            video_path: Ruta al archivo de video
+        """
+        self.path = FACES_DIR / f"{video_cache_key(video_path)}.npz"
+        self.labels_path = self.path.with_suffix('.labels.json')
+        self.processed = np.empty(0, dtype=np.int64)
+        self.frames = np.empty(0, dtype=np.int64)
+        self.boxes = np.empty((0, 4), dtype=np.int32)
+        self.descriptors = np.empty((0, DESCRIPTOR_SIZE * DESCRIPTOR_SIZE), dtype=np.float32)
+        self.thumbs = np.empty((0, THUMB_SIZE, THUMB_SIZE, 3), dtype=np.uint8)
+
+        if self.path.exists():
+            with np.load(self.path) as data:
+                self.processed = data['processed']
+                self.frames = data['frames']
+                self.boxes = data['boxes']
+                self.descriptors = data['descriptors']
+                self.thumbs = data['thumbs']
+
+    def missing(self, frames: np.ndarray) -> np.ndarray:
+        """Fotogramas de `frames` que aún no se han procesado."""
+        return np.setdiff1d(frames, self.processed)
+
+    def add(self, results: List[Dict]) -> None:
+        """Incorpora resultados de `_detect_batch`."""
+        if not results:
+            return
+        self.processed = np.union1d(self.processed, [r['frame'] for r in results])
+        self.frames = np.concatenate([self.frames] + [np.full(len(r['boxes']), r['frame'], dtype=np.int64) for r in results])
+        self.boxes = np.concatenate([self.boxes] + [r['boxes'] for r in results])
+        self.descriptors = np.concatenate([self.descriptors] + [r['descriptors'] for r in results])
+        self.thumbs = np.concatenate([self.thumbs] + [r['thumbs'] for r in results])
+
+        # Orden determinista (fotograma, posición) sin importar en qué orden acabaron los lotes
+        order = np.lexsort((self.boxes[:, 1], self.boxes[:, 0], self.frames))
+        self.frames, self.boxes = self.frames[order], self.boxes[order]
+        self.descriptors, self.thumbs = self.descriptors[order], self.thumbs[order]
+
+    def save(self) -> None:
+        """Guarda la caché de forma atómica."""
+        with atomic_output(self.path) as partial:
+            np.savez(partial, processed=self.processed, frames=self.frames, boxes=self.boxes,
+                     descriptors=self.descriptors, thumbs=self.thumbs)
+
+    def _face_key(self, i: int) -> List[int]:
+        """Identificador estable de una cara: fotograma y esquina del recuadro."""
+        return [int(self.frames[i]), int(self.boxes[i, 0]), int(self.boxes[i, 1])]
+
+    def load_labels(self, labels: np.ndarray) -> Dict[int, str]:
+        """
+        Nombres asignados por el usuario a cada grupo de caras.
+
+        Se guardan con una cara representativa y no con el número de grupo,
+        porque los números pueden cambiar si se analizan más fotogramas.
+
+        Args:
+            labels: Grupo de cada cara (de `cluster_faces`)
+
+        Returns:
+            Diccionario grupo -> nombre
+        """
+        if not self.labels_path.exists():
+            return {}
+        with open(self.labels_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+
+        keys = {tuple(self._face_key(i)): i for i in range(len(self.frames))}
+        names = {}
+        for entry in saved:
+            i = keys.get(tuple(entry['face']))
+            if i is not None:
+                names[int(labels[i])] = entry['name']
+        return names
+
+    def save_labels(self, labels: np.ndarray, cluster_names: Dict[int, str]) -> None:
+        """
+        Guarda los nombres de los grupos de caras.
+
+        Args:
+            labels: Grupo de cada cara (de `cluster_faces`)
+            cluster_names: Diccionario grupo -> nombre
+        """
+        entries = []
+        for cluster, name in cluster_names.items():
+            members = np.flatnonzero(labels == cluster)
+            if members.size:
+                entries.append({'name': name, 'face': self._face_key(int(members[0]))})
+        self.labels_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.labels_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, ensure_ascii=False)
+
+
+def scene_sample_frames(scenes: List[Dict], samples_per_scene: int = 3) -> np.ndarray:
+    """
+    Fotogramas a analizar: `samples_per_scene` interiores por escena.
+
+    Args:
+        scenes: Lista de escenas
+        samples_per_scene: Fotogramas por escena
+
+    Returns:
+        Matriz (n_escenas, samples_per_scene) de números de fotograma
+    """
+    starts = np.array([s['start_frame'] for s in scenes], dtype=np.float64)
+    ends = np.maximum(np.array([s['end_frame'] for s in scenes], dtype=np.float64), starts + 1)
+    fractions = np.arange(1, samples_per_scene + 1) / (samples_per_scene + 1)
+    return (starts[:, None] + (ends - starts)[:, None] * fractions).astype(np.int64)
+
+
+def face_detection_unavailable() -> Optional[str]:
+    """
+    Comprueba si el OpenCV instalado puede detectar caras.
+
+    Returns:
+        Motivo por el que no se puede (para mostrarlo en la interfaz) o None
+    """
+    if cv2 is None:
+        return "OpenCV no está instalado. Ejecuta: pip install opencv-python"
+    if not hasattr(cv2, 'CascadeClassifier'):
+        return (f"OpenCV {cv2.__version__} no incluye el detector de caras Haar (CascadeClassifier). "
+                "Instala opencv-python<5.")
+    return None
+
+
+def detect_faces(video_path: str, scenes: List[Dict], samples_per_scene: int = 3,
+                 workers: Optional[int] = None, progress_callback=None) -> FaceCache:
+    """
+    Detecta caras en los fotogramas de muestra de cada escena (con caché).
+
+    Args:
+        video_path: Ruta al archivo de video
+        scenes: Lista de escenas
+        samples_per_scene: Fotogramas por escena
+        workers: Procesos worker (None = núcleos disponibles)
+        progress_callback: Función callback para mostrar progreso
+
+    Returns:
+        FaceCache con todas las caras de los fotogramas pedidos
+
+    Raises:
+        RuntimeError: Si el OpenCV instalado no puede detectar caras
+    """
+    reason = face_detection_unavailable()
+    if reason:
+        raise RuntimeError(reason)
+
+    cache = FaceCache(video_path)
+    pending = cache.missing(np.unique(scene_sample_frames(scenes, samples_per_scene)))
+    if pending.size == 0:
+        return cache
+
+    # Los workers leen el índice de disco; construirlo aquí evita que lo haga cada uno
+    try:
+        get_keyframe_index(str(video_path))
+    except RuntimeError as e:
+        logging.warning(f"Índice de keyframes no disponible, lectura secuencial: {e}")
+
+    batches = [pending[i:i + BATCH_SIZE].tolist() for i in range(0, len(pending), BATCH_SIZE)]
+    logging.info(f"Detectando caras en {len(pending)} fotogramas ({len(batches)} lotes)")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = [pool.submit(_detect_batch, str(video_path), batch) for batch in batches]
+        for done, future in enumerate(futures, start=1):
+            cache.add(future.result())
+            if progress_callback:
+                progress_callback(f"Lotes procesados: {done}/{len(batches)}")
+
+    cache.save()
+    return cache
+
+
+def cluster_faces(descriptors: np.ndarray, threshold: float = 0.6) -> np.ndarray:
+    """
+    Agrupa caras por similitud coseno con un algoritmo de líder (una pasada).
+
+    Args:
+        descriptors: Matriz (n, d) de descriptores con norma unitaria
+        threshold: Similitud mínima con el centroide para unirse a un grupo
+
+    Returns:
+        Array (n,) con el número de grupo de cada cara
+    """
+    labels = np.full(len(descriptors), -1, dtype=np.int64)
+    centroids = np.empty((0, descriptors.shape[1]), dtype=np.float32)
+    counts: List[int] = []
+
+    for i, descriptor in enumerate(descriptors):
+        if len(centroids):
+            sims = centroids @ descriptor
+            best = int(np.argmax(sims))
+            if sims[best] >= threshold:
+                labels[i] = best
+                counts[best] += 1
+                # Media incremental, renormalizada
+                centroid = centroids[best] + (descriptor - centroids[best]) / counts[best]
+                centroids[best] = centroid / (np.linalg.norm(centroid) or 1.0)
+                continue
+        labels[i] = len(counts)
+        counts.append(1)
+        centroids = np.vstack([centroids, descriptor[None, :]])
+    return labels
+
+
+def scene_clusters(scenes: List[Dict], cache: FaceCache, labels: np.ndarray,
+                   samples_per_scene: int = 3) -> List[Set[int]]:
+    """
+    Grupos de caras presentes en cada escena.
+
+    Args:
+        scenes: Lista de escenas
+        cache: Caché de caras
+        labels: Grupo de cada cara (de `cluster_faces`)
+        samples_per_scene: Fotogramas por escena usados en la detección
+
+    Returns:
+        Lista (una por escena) de conjuntos de grupos
+    """
+    sample_frames = scene_sample_frames(scenes, samples_per_scene)
+    order = np.argsort(cache.frames, kind='stable')
+    sorted_frames = cache.frames[order]
+
+    result = []
+    for frames in sample_frames:
+        clusters: Set[int] = set()
+        for frame in frames:
+            lo, hi = np.searchsorted(sorted_frames, [frame, frame + 1])
+            clusters.update(int(c) for c in labels[order[lo:hi]])
+        result.append(clusters)
+    return result
+
+
+def suggest_characters(clusters_per_scene: List[Set[int]], cluster_names: Dict[int, str]) -> List[List[str]]:
+    """
+    Propaga los nombres de los grupos a las escenas donde aparecen.
+
+    Args:
+        clusters_per_scene: Grupos de caras de cada escena
+        cluster_names: Nombre asignado a cada grupo
+
+    Returns:
+        Lista (una por escena) de personajes sugeridos
+    """
+    return [sorted({cluster_names[c] for c in clusters if c in cluster_names})
+            for clusters in clusters_per_scene]
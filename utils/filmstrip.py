@@ -0,0 +1,204 @@
+"""Módulo de filmstrips (sprite sheets) para previsualizar la timeline.
+
+Muestrea un fotograma cada `interval` segundos en una sola pasada de
+decodificación y los empaqueta en unas pocas imágenes grandes (atlas) más
+un índice JSON. Cualquier posición de hover o scrub se traduce a una
+celda del atlas en O(1) con `tile_for_time`, sin pedir imágenes sueltas.
+
+Los atlas se cachean por video, resolución de celda e intervalo.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - OpenCV viene con scenedetect[opencv]
+    cv2 = None
+
+from .background_jobs import BackgroundJob, atomic_output, cache_dir, start_job
+from .video_proxy import video_cache_key
+
+# Configuración por defecto de los atlas
+SPRITE_INTERVAL = 2.0
+TILE_SIZE = (160, 90)  # (ancho, alto)
+GRID = (10, 10)  # (columnas, filas) -> 100 celdas por atlas
+JPEG_QUALITY = 80
+SPRITE_DIR = cache_dir('sprites', 'ST_SPRITE_DIR')
+
+INDEX_FILENAME = 'index.json'
+
+
+def sprite_dir_for(video_path: str, interval: float = SPRITE_INTERVAL,
+                   tile_size: Tuple[int, int] = TILE_SIZE) -> Path:
+    """
+    Devuelve el directorio de caché de los atlas de un video.
+
+    Args:
+        video_path: Ruta al archivo de video
+        interval: Segundos entre fotogramas muestreados
+        tile_size: Tamaño (ancho, alto) de cada celda
+
+    Returns:
+        Ruta del directorio (puede no existir todavía)
+    """
+    width, height = tile_size
+    return SPRITE_DIR / f"{video_cache_key(video_path)}_{width}x{height}_{interval:g}s"
+
+
+def generate_sprites(video_path: str, interval: float = SPRITE_INTERVAL,
+                     tile_size: Tuple[int, int] = TILE_SIZE,
+                     grid: Tuple[int, int] = GRID) -> Dict:
+    """
+    Genera los atlas del video en una sola pasada secuencial.
+
+    Args:
+        video_path: Ruta al archivo de video
+        interval: Segundos entre fotogramas muestreados
+        tile_size: Tamaño (ancho, alto) de cada celda
+        grid: Columnas y filas por atlas
+
+    Returns:
+        Índice de los atlas (el mismo contenido que `index.json`)
+    """
+    if cv2 is None:
+        raise ImportError("OpenCV no está instalado. Ejecuta: pip install opencv-python")
+
+    out_dir = sprite_dir_for(video_path, interval, tile_size)
+    cached = load_sprite_index(video_path, interval, tile_size)
+    if cached is not None:
+        return cached
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise IOError(f"No se pudo abrir el video: {video_path}")
+
+    width, height = tile_size
+    columns, rows = grid
+    per_sheet = columns * rows
+    sheet = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+    sheets: List[str] = []
+    count = 0
+
+    def flush(n_tiles: int) -> None:
+        # Recortar las filas vacías del último atlas
+        used_rows = (n_tiles + columns - 1) // columns
+        name = f"sheet_{len(sheets):03d}.jpg"
+        cv2.imwrite(str(out_dir / name), sheet[:used_rows * height],
+                    [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        sheets.append(name)
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_idx = 0
+        next_sample = 0
+        while True:
+            # grab() avanza sin convertir; solo se decodifica del todo el fotograma muestreado
+            if not cap.grab():
+                break
+            if frame_idx >= next_sample:
+                ok, frame = cap.retrieve()
+                if ok:
+                    slot = count % per_sheet
+                    y, x = (slot // columns) * height, (slot % columns) * width
+                    sheet[y:y + height, x:x + width] = cv2.resize(frame, tile_size, interpolation=cv2.INTER_AREA)
+                    count += 1
+                    if count % per_sheet == 0:
+                        flush(per_sheet)
+                        sheet[:] = 0
+                next_sample = int(round(count * interval * fps))
+            frame_idx += 1
+
+        if count % per_sheet:
+            flush(count % per_sheet)
+    finally:
+        cap.release()
+
+    index = {
+        'interval': interval,
+        'tile_width': width,
+        'tile_height': height,
+        'columns': columns,
+        'rows': rows,
+        'count': count,
+        'sheets': sheets,
+    }
+    # El índice se escribe al final: su existencia marca la caché como completa
+    with atomic_output(out_dir / INDEX_FILENAME) as partial:
+        with open(partial, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+
+    logging.info(f"Filmstrip generado: {count} celdas en {len(sheets)} atlas ({out_dir})")
+    return index
+
+
+def load_sprite_index(video_path: str, interval: float = SPRITE_INTERVAL,
+                      tile_size: Tuple[int, int] = TILE_SIZE) -> Optional[Dict]:
+    """
+    Carga el índice de atlas en caché, si existe.
+
+    Args:
+        video_path: Ruta al archivo de video
+        interval: Segundos entre fotogramas muestreados
+        tile_size: Tamaño (ancho, alto) de cada celda
+
+    Returns:
+        Índice de los atlas o None si no están generados
+    """
+    index_path = sprite_dir_for(video_path, interval, tile_size) / INDEX_FILENAME
+    if not index_path.exists():
+        return None
+    with open(index_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def tile_for_time(index: Dict, seconds: float) -> Tuple[int, int, int]:
+    """
+    Traduce un instante del video a su celda en los atlas (O(1)).
+
+    Args:
+        index: Índice de los atlas
+        seconds: Tiempo en segundos
+
+    Returns:
+        Tupla (número de atlas, x, y) con el desplazamiento en píxeles
+    """
+    if index['count'] == 0:
+        raise ValueError("El filmstrip no contiene fotogramas")
+
+    k = min(max(int(seconds // index['interval']), 0), index['count'] - 1)
+    per_sheet = index['columns'] * index['rows']
+    slot = k % per_sheet
+    x = (slot % index['columns']) * index['tile_width']
+    y = (slot // index['columns']) * index['tile_height']
+    return k // per_sheet, x, y
+
+
+def start_sprites(video_path: str, interval: float = SPRITE_INTERVAL,
+                  tile_size: Tuple[int, int] = TILE_SIZE) -> Optional[BackgroundJob]:
+    """
+    Lanza la generación de atlas en segundo plano (una vez por video).
+
+    Args:
+        video_path: Ruta al archivo de video
+        interval: Segundos entre fotogramas muestreados
+        tile_size: Tamaño (ancho, alto) de cada celda
+
+    Returns:
+        Trabajo en segundo plano, o None si los atlas ya estaban en caché
+    """
+    if load_sprite_index(video_path, interval, tile_size) is not None:
+        return None
+    key = str(sprite_dir_for(video_path, interval, tile_size))
+
+    def run(job: BackgroundJob) -> None:
+        job.message = "Generando filmstrip"
+        generate_sprites(video_path, interval, tile_size)
+        print(f"[TERMINAL SPRITES] ✅ Filmstrip listo: {key}")
+
+    return start_job(key, run, name='sprites')
@@ -0,0 +1,715 @@
+"""Módulo de envío por lotes de escenas curadas al knowledge graph (Graphiti).
+
+En vez de una llamada HTTP por escena, las escenas y sus relaciones se
+escriben primero en un outbox SQLite en disco (nada se pierde si el
+proceso muere) y un hilo de fondo las agrupa en lotes acotados por número
+de elementos, por bytes y por tiempo de espera:
+
+- Cada elemento tiene una identidad estable (la escena `episodio/fotograma`
+  o la relación) y una versión que sube cuando cambia su contenido. La
+  clave de idempotencia es identidad + versión: volver a encolar lo mismo
+  no lo duplica, el servidor puede descartar reenvíos tras un fallo a mitad
+  de petición y editar una escena envía una versión nueva de la misma
+  entidad (no otra escena); una versión aún no enviada se sustituye.
+- Las filas ya enviadas se borran pasados `SENT_RETENTION_DAYS` días; la
+  última versión de cada entidad se conserva aparte para seguir numerando.
+- Los lotes se envían con una `requests.Session` con pool de conexiones y
+  un máximo de peticiones simultáneas; `enqueue` añade en tandas y, antes
+  de cada una, espera (backpressure) si el outbox superaría `max_pending`.
+- Los fallos transitorios se reintentan con backoff exponencial; los
+  elementos reclamados por un proceso que murió vuelven a estar
+  disponibles al expirar su lease.
+
+`MockGraphServer` es un servidor local que acepta el mismo formato, para
+probar el flujo sin una instancia de Graphiti.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:  # pragma: no cover - requests está en requirements.txt
+    requests = None
+
+DEFAULT_OUTBOX_PATH = Path(os.environ.get('ST_GRAPH_OUTBOX', 'data/graph_outbox.db'))
+GRAPHITI_URL = os.environ.get('GRAPHITI_URL')
+GRAPHITI_BATCH_PATH = os.environ.get('GRAPHITI_BATCH_PATH', '/batch')
+GRAPHITI_API_KEY = os.environ.get('GRAPHITI_API_KEY')
+
+# Límites de cada lote
+BATCH_MAX_ITEMS = 100
+BATCH_MAX_BYTES = 512 * 1024
+FLUSH_INTERVAL = 2.0  # segundos que un elemento puede esperar a completar lote
+
+MAX_IN_FLIGHT = 4
+MAX_PENDING = 10000
+LEASE_SECONDS = 60.0  # un lote reclamado y no confirmado vuelve a la cola tras este tiempo
+MAX_BACKOFF = 300.0
+REQUEST_TIMEOUT = 30.0
+SENT_RETENTION_DAYS = 7.0  # días que se conservan los elementos ya confirmados
+PRUNE_INTERVAL = 3600.0  # segundos entre limpiezas del outbox
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT,
+    entity TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox(state, next_attempt_at);
+
+CREATE TABLE IF NOT EXISTS entity_versions (
+    entity TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    content_hash TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def entity_key(kind: str, payload: Dict) -> str:
+    """
+    Devuelve la identidad estable de un elemento, que no cambia al editarlo.
+
+    Args:
+        kind: Tipo de elemento ('episode' o 'relation')
+        payload: Contenido del elemento
+
+    Returns:
+        Identidad: la referencia de la escena para 'episode' y
+        origen/relación/destino para 'relation'
+    """
+    if kind == 'episode':
+        return f"episode:{payload['name']}"
+    if kind == 'relation':
+        return f"relation:{payload['source']}|{payload['relation']}|{payload['target']}"
+    return f"{kind}:{content_hash(kind, payload)}"
+
+
+def content_hash(kind: str, payload: Dict) -> str:
+    """
+    Calcula el hash del contenido de un elemento (detecta si cambió).
+
+    Args:
+        kind: Tipo de elemento
+        payload: Contenido serializable a JSON
+
+    Returns:
+        Hash hexadecimal estable
+    """
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(f"{kind}\n{canonical}".encode('utf-8')).hexdigest()[:32]
+
+
+def idempotency_key(entity: str, version: int) -> str:
+    """
+    Calcula la clave de idempotencia de una versión de una entidad.
+
+    Args:
+        entity: Identidad estable (ver `entity_key`)
+        version: Versión del contenido (empieza en 1)
+
+    Returns:
+        Hash hexadecimal estable
+    """
+    return hashlib.sha256(f"{entity}\n{version}".encode('utf-8')).hexdigest()[:32]
+
+
+def scene_items(episode_name: str, scene: Dict) -> List[Tuple[str, Dict]]:
+    """
+    Convierte una escena curada en elementos del grafo.
+
+    Genera un 'episode' con el texto de la escena y una 'relation'
+    APPEARS_IN por cada personaje anotado.
+
+    Args:
+        episode_name: Nombre del episodio (grupo en el grafo, ej. 'S04E07')
+        scene: Escena completa (con notas, personajes y análisis IA)
+
+    Returns:
+        Lista de tuplas (kind, payload)
+    """
+    scene_ref = f"{episode_name}/{int(scene['start_frame'])}"
+    items = [('episode', {
+        'group_id': episode_name,
+        'name': scene_ref,
+        'episode_body': scene.get('notes') or '',
+        'ai_analysis': scene.get('ai_analysis'),
+        'start_time': float(scene['start_time']),
+        'end_time': float(scene['end_time']),
+        'characters': list(scene.get('characters', [])),
+        'source_description': 'ST Scene Curat-o-matic',
+    })]
+    for character in scene.get('characters', []):
+        items.append(('relation', {
+            'group_id': episode_name,
+            'source': character,
+            'target': scene_ref,
+            'relation': 'APPEARS_IN',
+        }))
+    return items
+
+
+class Outbox:
+    """Cola duradera de elementos pendientes de envío, respaldada por SQLite (WAL)."""
+
+    def __init__(self, db_path: Path = DEFAULT_OUTBOX_PATH):
+        """
+        Abre (o crea) el outbox.
+
+        Args:
+            db_path: Ruta del archivo SQLite
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(outbox)')}
+        if 'entity' not in columns:
+            # Outbox creado antes de versionar por entidad
+            self._conn.execute('ALTER TABLE outbox ADD COLUMN entity TEXT')
+            self._conn.execute('ALTER TABLE outbox ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_entity ON outbox(entity, state)')
+
+    @contextmanager
+    def _transaction(self):
+        """Ejecuta un bloque dentro de una transacción explícita."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            else:
+                self._conn.execute('COMMIT')
+
+    def add(self, items: Iterable[Tuple[str, Dict]]) -> int:
+        """
+        Añade elementos al outbox como nuevas versiones de sus entidades.
+
+        Un elemento igual a la última versión de su entidad se ignora. Si el
+        contenido cambió se añade con la versión siguiente y se descartan las
+        versiones anteriores que aún no se habían enviado.
+
+        Args:
+            items: Tuplas (kind, payload)
+
+        Returns:
+            Número de elementos nuevos
+        """
+        now = time.time()
+        added = 0
+        with self._transaction() as conn:
+            for kind, payload in items:
+                entity, digest = entity_key(kind, payload), content_hash(kind, payload)
+                row = conn.execute('SELECT version, content_hash FROM entity_versions WHERE entity = ?',
+                                   (entity,)).fetchone()
+                if row is not None and row['content_hash'] == digest:
+                    continue
+                version = row['version'] + 1 if row is not None else 1
+                conn.execute('INSERT OR REPLACE INTO entity_versions (entity, version, content_hash) '
+                             'VALUES (?, ?, ?)', (entity, version, digest))
+                conn.execute("DELETE FROM outbox WHERE entity = ? AND state = 'pending'", (entity,))
+                data = json.dumps(payload, ensure_ascii=False)
+                conn.execute(
+                    'INSERT OR IGNORE INTO outbox (key, kind, payload, size, next_attempt_at, created_at, '
+                    'entity, version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (idempotency_key(entity, version), kind, data, len(data.encode('utf-8')), now, now,
+                     entity, version)
+                )
+                added += 1
+        return added
+
+    def ready(self, max_items: int, max_bytes: int, max_wait: float) -> bool:
+        """
+        Indica si hay un lote listo: lleno por número o bytes, o con espera vencida.
+
+        Args:
+            max_items: Elementos por lote
+            max_bytes: Bytes por lote
+            max_wait: Segundos máximos que espera el elemento más antiguo
+
+        Returns:
+            True si conviene enviar ya
+        """
+        now = time.time()
+        with self._lock:
+            count, size, oldest = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(created_at) FROM outbox "
+                "WHERE state IN ('pending', 'in_flight') AND next_attempt_at <= ?", (now,)
+            ).fetchone()
+        if not count:
+            return False
+        return count >= max_items or size >= max_bytes or now - oldest >= max_wait
+
+    def claim(self, max_items: int, max_bytes: int) -> List[Dict]:
+        """
+        Reclama el siguiente lote (pendientes y leases vencidos) en orden de llegada.
+
+        Args:
+            max_items: Elementos por lote
+            max_bytes: Bytes por lote (siempre se incluye al menos un elemento)
+
+        Returns:
+            Lista de elementos con 'key', 'kind', 'entity', 'version', 'payload' y 'attempts'
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT key, kind, payload, size, attempts, entity, version FROM outbox "
+                "WHERE state IN ('pending', 'in_flight') AND next_attempt_at <= ? ORDER BY created_at, key LIMIT ?",
+                (now, max_items)
+            ).fetchall()
+            batch, total = [], 0
+            for row in rows:
+                if batch and total + row['size'] > max_bytes:
+                    break
+                total += row['size']
+                batch.append({'key': row['key'], 'kind': row['kind'], 'entity': row['entity'],
+                              'version': row['version'], 'payload': json.loads(row['payload']),
+                              'attempts': row['attempts']})
+            conn.executemany(
+                "UPDATE outbox SET state = 'in_flight', attempts = attempts + 1, next_attempt_at = ? WHERE key = ?",
+                [(now + LEASE_SECONDS, item['key']) for item in batch]
+            )
+        return batch
+
+    def mark_sent(self, keys: List[str]) -> None:
+        """Marca elementos como confirmados por el servidor."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("UPDATE outbox SET state = 'sent', sent_at = ?, last_error = NULL WHERE key = ?",
+                             [(now, key) for key in keys])
+
+    def mark_failed(self, keys: List[str], error: str, retry_after: float) -> None:
+        """
+        Devuelve elementos a la cola para reintentarlos más tarde.
+
+        Args:
+            keys: Claves del lote fallido
+            error: Descripción del error
+            retry_after: Segundos hasta el siguiente intento
+        """
+        next_attempt = time.time() + retry_after
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE outbox SET state = 'pending', next_attempt_at = ?, last_error = ? WHERE key = ?",
+                [(next_attempt, error, key) for key in keys]
+            )
+
+    def mark_rejected(self, keys: List[str], error: str) -> None:
+        """Aparta elementos que el servidor rechazó de forma permanente (4xx)."""
+        with self._transaction() as conn:
+            conn.executemany("UPDATE outbox SET state = 'rejected', last_error = ? WHERE key = ?",
+                             [(error, key) for key in keys])
+
+    def prune_sent(self, older_than_days: float = SENT_RETENTION_DAYS) -> int:
+        """
+        Borra los elementos confirmados hace más de `older_than_days` días.
+
+        La versión de cada entidad se guarda aparte, así que volver a encolar
+        una escena ya enviada y borrada sigue sin duplicarla.
+
+        Args:
+            older_than_days: Días de retención de los elementos enviados
+
+        Returns:
+            Número de elementos borrados
+        """
+        cutoff = time.time() - older_than_days * 86400
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM outbox WHERE state = 'sent' AND sent_at < ?", (cutoff,)).rowcount
+
+    def backlog(self) -> int:
+        """Número de elementos aún no confirmados (pendientes o en vuelo)."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE state IN ('pending', 'in_flight')"
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Cuenta los elementos por estado.
+
+        Returns:
+            Diccionario estado -> número de elementos
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) FROM outbox GROUP BY state').fetchall()
+        return {state: count for state, count in rows}
+
+    def close(self) -> None:
+        """Cierra la conexión."""
+        with self._lock:
+            self._conn.close()
+
+
+class GraphSink:
+    """Envía el contenido del outbox al knowledge graph en lotes y en segundo plano."""
+
+    def __init__(self, base_url: str, outbox: Optional[Outbox] = None,
+                 batch_path: str = GRAPHITI_BATCH_PATH, api_key: Optional[str] = GRAPHITI_API_KEY,
+                 max_items: int = BATCH_MAX_ITEMS, max_bytes: int = BATCH_MAX_BYTES,
+                 flush_interval: float = FLUSH_INTERVAL, max_in_flight: int = MAX_IN_FLIGHT,
+                 max_pending: int = MAX_PENDING, timeout: float = REQUEST_TIMEOUT,
+                 retention_days: float = SENT_RETENTION_DAYS):
+        """
+        Inicializa el sink y arranca el hilo de envío.
+
+        Args:
+            base_url: URL base del servidor del grafo
+            outbox: Outbox a drenar (por defecto el de `DEFAULT_OUTBOX_PATH`)
+            batch_path: Ruta del endpoint que recibe los lotes
+            api_key: Token Bearer opcional
+            max_items: Elementos por lote
+            max_bytes: Bytes de payload por lote
+            flush_interval: Espera máxima de un elemento antes de enviar un lote incompleto
+            max_in_flight: Peticiones simultáneas como máximo
+            max_pending: Tamaño del outbox a partir del cual `enqueue` espera
+            timeout: Timeout de cada petición HTTP en segundos
+            retention_days: Días que se conservan en el outbox los elementos enviados
+        """
+        if requests is None:
+            raise ImportError("requests no está instalado. Ejecuta: pip install requests")
+
+        self.url = base_url.rstrip('/') + batch_path
+        self.outbox = outbox or Outbox()
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retention_days = retention_days
+        self._next_prune = 0.0
+
+        # Una sola sesión con tantas conexiones keep-alive como peticiones en vuelo
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(max_in_flight, thread_name_prefix='graph-sink')
+        self._wake = threading.Event()
+        self._drained = threading.Condition()
+        self._stop = threading.Event()
+        self._force = False
+        self.last_error: Optional[str] = None
+        self.thread = threading.Thread(target=self._run, name='graph-sink-flusher', daemon=True)
+        self.thread.start()
+
+    # --- API pública ---
+
+    def enqueue(self, items: List[Tuple[str, Dict]], timeout: Optional[float] = None) -> int:
+        """
+        Guarda elementos en el outbox, esperando si hay demasiados pendientes.
+
+        Los elementos se añaden en tandas de `max_items` y el backlog se vuelve
+        a comprobar antes de cada una, así una llamada con miles de escenas
+        no deja el outbox muy por encima de `max_pending`.
+
+        Args:
+            items: Tuplas (kind, payload), ver `scene_items`
+            timeout: Segundos máximos de espera por backpressure (None = sin límite)
+
+        Returns:
+            Número de elementos nuevos
+
+        Raises:
+            TimeoutError: Si el outbox no baja de `max_pending` a tiempo (lo
+                añadido en tandas anteriores queda en el outbox)
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        added = 0
+        for start in range(0, len(items), self.max_items):
+            chunk = items[start:start + self.max_items]
+            self._wait_for_room(len(chunk), deadline)
+            added += self.outbox.add(chunk)
+            self._wake.set()
+        return added
+
+    def _wait_for_room(self, needed: int, deadline: Optional[float]) -> None:
+        """
+        Espera a que quepan `needed` elementos más sin superar `max_pending`.
+
+        Con el outbox vacío siempre hay sitio, aunque la tanda sea más grande
+        que `max_pending`.
+        """
+        with self._drained:
+            while True:
+                backlog = self.outbox.backlog()
+                if not backlog or backlog + needed <= self.max_pending:
+                    return
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("El outbox del grafo está lleno; el servidor no da abasto")
+                self._wake.set()
+                self._drained.wait(min(remaining, 1.0) if remaining is not None else 1.0)
+
+    def enqueue_scenes(self, episode_name: str, scenes: List[Dict], timeout: Optional[float] = None) -> int:
+        """
+        Encola las escenas de un episodio con sus relaciones.
+
+        Args:
+            episode_name: Nombre del episodio
+            scenes: Escenas completas
+            timeout: Ver `enqueue`
+
+        Returns:
+            Número de elementos nuevos
+        """
+        items = [item for scene in scenes for item in scene_items(episode_name, scene)]
+        return self.enqueue(items, timeout)
+
+    def flush(self, timeout: float = 60.0) -> bool:
+        """
+        Envía ya todo lo pendiente y espera a que se confirme.
+
+        Args:
+            timeout: Segundos máximos de espera
+
+        Returns:
+            True si el outbox quedó vacío
+        """
+        deadline = time.monotonic() + timeout
+        self._force = True
+        try:
+            with self._drained:
+                while self.outbox.backlog():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._wake.set()
+                    self._drained.wait(min(remaining, 0.5))
+            return True
+        finally:
+            self._force = False
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Intenta vaciar el outbox y detiene el envío (lo no enviado sigue en disco).
+
+        Args:
+            timeout: Segundos máximos para el vaciado final
+        """
+        self.flush(timeout)
+        self._stop.set()
+        self._wake.set()
+        self.thread.join()
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    # --- Envío ---
+
+    def _run(self) -> None:
+        """Bucle del hilo de fondo: lanza lotes mientras haya hueco y estén listos."""
+        while not self._stop.is_set():
+            self._wake.wait(min(self.flush_interval / 2, 1.0))
+            self._wake.clear()
+            try:
+                self._prune()
+                self._dispatch()
+            except Exception as e:
+                self.last_error = str(e)
+                logging.error(f"Error en el envío al grafo: {e}")
+
+    def _prune(self) -> None:
+        """Limpia los elementos enviados antiguos, como mucho una vez cada PRUNE_INTERVAL."""
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + PRUNE_INTERVAL
+        removed = self.outbox.prune_sent(self.retention_days)
+        if removed:
+            logging.info(f"Outbox del grafo: {removed} elementos enviados eliminados")
+
+    def _dispatch(self) -> None:
+        """Reclama y envía lotes hasta agotar los huecos en vuelo o los elementos listos."""
+        max_wait = 0.0 if self._force else self.flush_interval
+        while self.outbox.ready(self.max_items, self.max_bytes, max_wait):
+            if not self._slots.acquire(blocking=False):
+                return  # backpressure: al terminar un envío se vuelve a intentar
+            batch = self.outbox.claim(self.max_items, self.max_bytes)
+            if not batch:
+                self._slots.release()
+                return
+            self._executor.submit(self._send, batch)
+
+    def _send(self, batch: List[Dict]) -> None:
+        """Envía un lote y actualiza el outbox según la respuesta."""
+        keys = [item['key'] for item in batch]
+        batch_key = hashlib.sha256('\n'.join(keys).encode('ascii')).hexdigest()[:32]
+        # entity + version permiten al servidor quedarse con la última versión de cada escena
+        body = {'items': [{'idempotency_key': item['key'], 'kind': item['kind'], 'entity': item['entity'],
+                           'version': item['version'], 'payload': item['payload']}
+                          for item in batch]}
+        attempts = max(item['attempts'] for item in batch) + 1
+        try:
+            response = self.session.post(self.url, json=body, timeout=self.timeout,
+                                         headers={'Idempotency-Key': batch_key})
+            if response.ok or response.status_code == 409:
+                # 409: el servidor ya tenía este lote (reenvío tras un fallo)
+                self.outbox.mark_sent(keys)
+                self.last_error = None
+            elif 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                self.outbox.mark_rejected(keys, error)
+                self.last_error = error
+                logging.error(f"Lote rechazado por el grafo ({len(keys)} elementos): {error}")
+            else:
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else self._backoff(attempts)
+                self.outbox.mark_failed(keys, f"HTTP {response.status_code}", delay)
+                self.last_error = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            self.outbox.mark_failed(keys, str(e), self._backoff(attempts))
+            self.last_error = str(e)
+            logging.warning(f"Envío al grafo fallido, se reintentará: {e}")
+        finally:
+            self._slots.release()
+            with self._drained:
+                self._drained.notify_all()
+            self._wake.set()
+
+    @staticmethod
+    def _backoff(attempts: int) -> float:
+        """Espera exponencial acotada tras `attempts` intentos."""
+        return min(2.0 ** attempts, MAX_BACKOFF)
+
+
+_sink: Optional[GraphSink] = None
+_lock = threading.Lock()
+
+
+def get_graph_sink() -> Optional[GraphSink]:
+    """
+    Devuelve el sink del proceso, creándolo si `GRAPHITI_URL` está configurada.
+
+    Returns:
+        Instancia única de GraphSink o None si no hay servidor configurado
+    """
+    global _sink
+    if not GRAPHITI_URL:
+        return None
+    with _lock:
+        if _sink is None:
+            _sink = GraphSink(GRAPHITI_URL)
+        return _sink
+
+
+class _MockGraphHandler(BaseHTTPRequestHandler):
+    """Handler del servidor de prueba: registra los elementos por clave y la última versión por entidad."""
+
+    def log_message(self, format, *args):
+        logging.debug("mock-graph: " + format % args)
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_concurrent = max(server.max_concurrent, server.in_flight)
+            server.requests += 1
+            fail = server.fail_every and server.requests % server.fail_every == 0
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if server.delay:
+                time.sleep(server.delay)
+            if fail:
+                self.send_response(503)
+                self.send_header('Retry-After', '0')
+                self.end_headers()
+                return
+            with server.lock:
+                server.batch_sizes.append(len(body.get('items', [])))
+                for item in body.get('items', []):
+                    server.received[item['idempotency_key']] = item
+                    current = server.entities.get(item.get('entity'))
+                    if current is None or item.get('version', 1) >= current.get('version', 1):
+                        server.entities[item.get('entity')] = item
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{"status": "ok"}')
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+class MockGraphServer:
+    """Servidor HTTP local que imita el endpoint de lotes, para pruebas."""
+
+    def __init__(self, fail_every: int = 0, delay: float = 0.0):
+        """
+        Arranca el servidor en un puerto libre.
+
+        Args:
+            fail_every: Responder 503 a una de cada N peticiones (0 = nunca)
+            delay: Segundos de latencia simulada por petición
+        """
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _MockGraphHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.received = {}  # idempotency_key -> elemento
+        self.httpd.entities = {}  # entidad -> última versión recibida
+        self.httpd.batch_sizes = []
+        self.httpd.requests = 0
+        self.httpd.in_flight = 0
+        self.httpd.max_concurrent = 0
+        self.httpd.fail_every = fail_every
+        self.httpd.delay = delay
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='mock-graph-server', daemon=True)
+        self.thread.start()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def received(self) -> Dict[str, Dict]:
+        return self.httpd.received
+
+    @property
+    def entities(self) -> Dict[str, Dict]:
+        return self.httpd.entities
+
+    @property
+    def batch_sizes(self) -> List[int]:
+        return self.httpd.batch_sizes
+
+    @property
+    def max_concurrent(self) -> int:
+        return self.httpd.max_concurrent
+
+    def shutdown(self) -> None:
+        """Detiene el servidor."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,296 @@
+"""Módulo de índice de keyframes (GOP) para seeks rápidos y exactos.
+
+En H.264 con GOP largo, un seek a un fotograma arbitrario decodifica
+desde el keyframe anterior y OpenCV lo hace de forma lenta e inconsistente.
+Aquí se hace una pasada única con ffprobe (solo lee paquetes, no decodifica)
+que guarda el número de fotograma, el PTS y el offset en bytes de cada
+keyframe en un `.npz` compacto junto al video.
+
+- `nearest_keyframe(frame)`: keyframe anterior o igual a `frame` (O(log n)).
+- `read_frame(frame)`: salta al keyframe anterior y decodifica solo el tramo
+  hasta `frame`; si el fotograma pedido está más adelante en el mismo GOP
+  que la posición actual, sigue leyendo sin volver a saltar.
+- `keyframe_info(frame)`: fotograma, PTS y offset en bytes del keyframe
+  anterior. OpenCV solo sabe saltar por tiempo o fotograma, así que
+  `read_frame` usa el PTS; el offset es para consumidores que leen el
+  contenedor por bytes (exportar clips con rangos HTTP, demuxers de
+  MPEG-TS) y además delata un índice obsoleto: si apunta más allá del
+  final del archivo, el video cambió y el índice se descarta.
+"""
+
+import logging
+import shutil
+import subprocess
+import threading
+from fractions import Fraction
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - OpenCV viene con scenedetect[opencv]
+    cv2 = None
+
+INDEX_SUFFIX = '.keyframes.npz'
+
+
+def index_path_for(video_path: str) -> Path:
+    """
+    Devuelve la ruta del índice de keyframes (junto al video).
+
+    Args:
+        video_path: Ruta al archivo de video
+
+    Returns:
+        Ruta del archivo .npz
+    """
+    path = Path(video_path)
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def _parse_compact(line: str) -> Tuple[str, Dict[str, str]]:
+    """Parsea una línea 'seccion|clave=valor|...' de ffprobe -of compact."""
+    section, *fields = line.strip().split('|')
+    return section, dict(field.split('=', 1) for field in fields if '=' in field)
+
+
+class KeyframeIndex:
+    """Índice de keyframes de un video con lectura de fotogramas exacta."""
+
+    def __init__(self, video_path: str, frames: np.ndarray, pts: np.ndarray,
+                 pos: np.ndarray, fps: float, time_base: Fraction, start_time: float = 0.0):
+        """
+        Inicializa el índice (usar `build` o `load`).
+
+        Args:
+            video_path: Ruta al archivo de video
+            frames: Número de fotograma de cada keyframe (ordenado)
+            pts: PTS de cada keyframe en unidades de `time_base`
+            pos: Offset en bytes de cada keyframe en el archivo (-1 si se desconoce)
+            fps: Fotogramas por segundo
+            time_base: Base de tiempo del stream de video
+            start_time: Tiempo de inicio del stream en segundos
+        """
+        self.video_path = str(video_path)
+        self.frames = frames
+        self.pts = pts
+        self.pos = pos
+        self.fps = fps
+        self.time_base = time_base
+        self.start_time = start_time
+
+        self._cap = None
+        self._cap_next_frame = None  # fotograma que devolverá el próximo grab()
+        self._cap_lock = threading.Lock()
+
+    # --- Construcción y persistencia ---
+
+    @classmethod
+    def build(cls, video_path: str) -> 'KeyframeIndex':
+        """
+        Construye el índice con ffprobe leyendo solo los paquetes.
+
+        Args:
+            video_path: Ruta al archivo de video
+
+        Returns:
+            Índice construido (y guardado junto al video)
+        """
+        ffprobe = shutil.which('ffprobe')
+        if ffprobe is None:
+            raise RuntimeError("ffprobe no está instalado o no está en el PATH")
+
+        cmd = [
+            ffprobe, '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'stream=avg_frame_rate,r_frame_rate,time_base,start_time:packet=pts,flags,pos',
+            '-of', 'compact', str(video_path),
+        ]
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+        fps = None
+        time_base = Fraction(1, 1000)
+        start_time = 0.0
+        pts_list, pos_list = [], []
+        for line in process.stdout:
+            section, fields = _parse_compact(line)
+            if section == 'packet':
+                if 'K' in fields.get('flags', '') and fields.get('pts', 'N/A') != 'N/A':
+                    pts_list.append(int(fields['pts']))
+                    pos = fields.get('pos', 'N/A')
+                    pos_list.append(int(pos) if pos != 'N/A' else -1)
+            elif section == 'stream':
+                rate = fields.get('avg_frame_rate', '0/0')
+                if rate in ('0/0', 'N/A'):
+                    rate = fields.get('r_frame_rate', '0/0')
+                if rate not in ('0/0', 'N/A'):
+                    fps = float(Fraction(rate))
+                if fields.get('time_base', 'N/A') != 'N/A':
+                    time_base = Fraction(fields['time_base'])
+                if fields.get('start_time', 'N/A') != 'N/A':
+                    start_time = float(fields['start_time'])
+
+        stderr = process.stderr.read()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffprobe falló indexando keyframes: {stderr.strip()}")
+        if not fps:
+            raise RuntimeError("No se pudo determinar la tasa de fotogramas del video")
+
+        # Los paquetes vienen en orden de decodificación; el índice va en orden de presentación
+        pts = np.asarray(pts_list, dtype=np.int64)
+        pos = np.asarray(pos_list, dtype=np.int64)
+        order = np.argsort(pts, kind='stable')
+        pts, pos = pts[order], pos[order]
+        seconds = pts * float(time_base) - start_time
+        frames = np.rint(seconds * fps).astype(np.int64)
+
+        index = cls(video_path, frames, pts, pos, fps, time_base, start_time)
+        index.save()
+        logging.info(f"Índice de keyframes: {len(frames)} keyframes en {video_path}")
+        return index
+
+    def save(self) -> None:
+        """Guarda el índice en `<video>.keyframes.npz`."""
+        np.savez_compressed(
+            index_path_for(self.video_path),
+            frames=self.frames, pts=self.pts, pos=self.pos,
+            fps=np.float64(self.fps),
+            time_base=np.array([self.time_base.numerator, self.time_base.denominator], dtype=np.int64),
+            start_time=np.float64(self.start_time),
+        )
+
+    @classmethod
+    def load(cls, video_path: str) -> Optional['KeyframeIndex']:
+        """
+        Carga el índice guardado junto al video.
+
+        Args:
+            video_path: Ruta al archivo de video
+
+        Returns:
+            Índice o None si no existe, es anterior al video o sus offsets
+            apuntan fuera del archivo
+        """
+        path = index_path_for(video_path)
+        video_stat = Path(video_path).stat()
+        if not path.exists() or path.stat().st_mtime < video_stat.st_mtime:
+            return None
+        with np.load(path) as data:
+            num, den = data['time_base']
+            if 'pos' in data.files:
+                pos = data['pos']
+            else:  # índices antiguos sin offsets
+                pos = np.full(len(data['frames']), -1, dtype=np.int64)
+            index = cls(video_path, data['frames'], data['pts'], pos,
+                        float(data['fps']), Fraction(int(num), int(den)), float(data['start_time']))
+        if len(pos) and int(pos.max()) >= video_stat.st_size:
+            logging.info(f"Índice de keyframes obsoleto (offsets fuera del archivo): {path}")
+            return None
+        return index
+
+    # --- Consultas ---
+
+    def nearest_keyframe(self, frame: int) -> int:
+        """
+        Devuelve el keyframe anterior o igual a `frame`.
+
+        Args:
+            frame: Número de fotograma
+
+        Returns:
+            Número de fotograma del keyframe
+        """
+        i = int(np.searchsorted(self.frames, frame, side='right')) - 1
+        return int(self.frames[max(i, 0)]) if len(self.frames) else 0
+
+    def keyframe_info(self, frame: int) -> Dict:
+        """
+        Devuelve fotograma, PTS (segundos) y offset en bytes del keyframe anterior.
+
+        Args:
+            frame: Número de fotograma
+
+        Returns:
+            Diccionario con 'frame', 'pts_time' y 'pos' (-1 si se desconoce)
+        """
+        i = max(int(np.searchsorted(self.frames, frame, side='right')) - 1, 0)
+        return {
+            'frame': int(self.frames[i]),
+            'pts_time': float(int(self.pts[i]) * self.time_base) - self.start_time,
+            'pos': int(self.pos[i]),
+        }
+
+    def read_frame(self, frame: int) -> Optional[np.ndarray]:
+        """
+        Lee un fotograma exacto decodificando solo desde el keyframe anterior.
+
+        Args:
+            frame: Número de fotograma
+
+        Returns:
+            Fotograma BGR o None si no se pudo leer
+        """
+        if cv2 is None:
+            raise ImportError("OpenCV no está instalado. Ejecuta: pip install opencv-python")
+
+        with self._cap_lock:
+            if self._cap is None:
+                self._cap = cv2.VideoCapture(self.video_path)
+                self._cap_next_frame = None
+
+            keyframe = self.keyframe_info(frame)
+            # Reutilizar la posición actual si el fotograma está más adelante en el mismo GOP
+            current = self._cap_next_frame
+            if current is None or not (keyframe['frame'] <= current <= frame):
+                self._cap.set(cv2.CAP_PROP_POS_MSEC, keyframe['pts_time'] * 1000.0)
+                # El seek puede no caer justo en el keyframe (edit lists, B-frames,
+                # redondeo del PTS): la posición real la dice el propio decodificador
+                current = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES))
+                if current > frame:
+                    self._cap.set(cv2.CAP_PROP_POS_FRAMES, frame)
+                    current = int(self._cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+            while current < frame:
+                if not self._cap.grab():
+                    self._cap_next_frame = None
+                    return None
+                current += 1
+
+            ok, image = self._cap.read()
+            self._cap_next_frame = frame + 1 if ok else None
+            return image if ok else None
+
+    def close(self) -> None:
+        """Libera el lector de video."""
+        with self._cap_lock:
+            if self._cap is not None:
+                self._cap.release()
+                self._cap = None
+
+
+_indexes: Dict[str, KeyframeIndex] = {}
+_lock = threading.Lock()
+
+
+def get_keyframe_index(video_path: str, build: bool = True) -> Optional[KeyframeIndex]:
+    """
+    Devuelve el índice de keyframes de un video (cargándolo o construyéndolo).
+
+    Args:
+        video_path: Ruta al archivo de video
+        build: Construirlo si no existe en disco
+
+    Returns:
+        KeyframeIndex o None si no existe y `build` es False
+    """
+    key = str(video_path)
+    with _lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = KeyframeIndex.load(key)
+            if index is None and build:
+                index = KeyframeIndex.build(key)
+            if index is not None:
+                _indexes[key] = index
+        return index
@@ -0,0 +1,434 @@
+"""Módulo de persistencia del proyecto de curación en SQLite.
+
+Las escenas curadas, notas y anotaciones de personajes se guardan en una
+base SQLite en modo WAL. Cada edición (fusión, división, cambio de
+anotación) es una transacción pequeña que toca solo las filas afectadas
+y deja una entrada en el historial de ediciones, así que no hace falta
+reescribir el proyecto completo en cada guardado.
+
+Las escenas se identifican dentro de un episodio por `start_frame`, que
+no cambia al renumerar los IDs visibles ('scene_001', ...). Por eso
+'merged_from' y el historial guardan rangos de fotogramas, nunca IDs.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_DB_PATH = Path(os.environ.get('ST_PROJECT_DB', 'data/curator.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    id INTEGER PRIMARY KEY,
+    video_key TEXT NOT NULL UNIQUE,
+    filename TEXT NOT NULL,
+    threshold REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS scenes (
+    episode_id INTEGER NOT NULL REFERENCES episodes(id) ON DELETE CASCADE,
+    start_frame INTEGER NOT NULL,
+    end_frame INTEGER NOT NULL,
+    start_time REAL NOT NULL,
+    end_time REAL NOT NULL,
+    start_timecode TEXT,
+    end_timecode TEXT,
+    status TEXT NOT NULL DEFAULT 'detected',
+    notes TEXT NOT NULL DEFAULT '',
+    ai_analysis TEXT,
+    thumbnail_path TEXT,
+    merged_from TEXT,
+    PRIMARY KEY (episode_id, start_frame)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS annotations (
+    episode_id INTEGER NOT NULL,
+    start_frame INTEGER NOT NULL,
+    character TEXT NOT NULL,
+    PRIMARY KEY (episode_id, start_frame, character),
+    FOREIGN KEY (episode_id, start_frame) REFERENCES scenes(episode_id, start_frame)
+        ON DELETE CASCADE ON UPDATE CASCADE
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS edit_history (
+    id INTEGER PRIMARY KEY,
+    episode_id INTEGER NOT NULL REFERENCES episodes(id) ON DELETE CASCADE,
+    operation TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_history_episode ON edit_history(episode_id, id);
+"""
+
+# Columnas ligeras para la timeline/tabla (sin notas ni análisis IA)
+SUMMARY_COLUMNS = ('start_frame', 'end_frame', 'start_time', 'end_time',
+                   'start_timecode', 'end_timecode', 'status')
+
+
+class ProjectStore:
+    """Almacén del proyecto de curación respaldado por SQLite (WAL)."""
+
+    def __init__(self, db_path: Path = DEFAULT_DB_PATH):
+        """
+        Abre (o crea) la base de datos del proyecto.
+
+        Args:
+            db_path: Ruta del archivo SQLite
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Streamlit ejecuta los reruns en hilos distintos: una conexión compartida con lock
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        """Ejecuta un bloque dentro de una transacción explícita."""
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            else:
+                self._conn.execute('COMMIT')
+
+    def _log_edit(self, conn: sqlite3.Connection, episode_id: int, operation: str, payload: Dict) -> None:
+        """Registra una edición en el historial (dentro de la transacción actual)."""
+        now = time.time()
+        conn.execute(
+            'INSERT INTO edit_history (episode_id, operation, payload, created_at) VALUES (?, ?, ?, ?)',
+            (episode_id, operation, json.dumps(payload, ensure_ascii=False), now)
+        )
+        conn.execute('UPDATE episodes SET updated_at = ? WHERE id = ?', (now, episode_id))
+
+    @staticmethod
+    def _scene_row(episode_id: int, scene: Dict) -> tuple:
+        """Convierte un diccionario de escena en una fila de la tabla scenes."""
+        return (
+            episode_id,
+            int(scene['start_frame']),
+            int(scene['end_frame']),
+            float(scene['start_time']),
+            float(scene['end_time']),
+            scene.get('start_timecode'),
+            scene.get('end_timecode'),
+            scene.get('status', 'detected'),
+            scene.get('notes', ''),
+            json.dumps(scene['ai_analysis'], ensure_ascii=False) if scene.get('ai_analysis') is not None else None,
+            scene.get('thumbnail_path'),
+            json.dumps(scene['merged_from']) if scene.get('merged_from') else None,
+        )
+
+    def _insert_scenes(self, conn: sqlite3.Connection, episode_id: int, scenes: Iterable[Dict]) -> None:
+        """Inserta escenas y sus anotaciones."""
+        scenes = list(scenes)
+        conn.executemany(
+            'INSERT INTO scenes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [self._scene_row(episode_id, s) for s in scenes]
+        )
+        conn.executemany(
+            'INSERT OR IGNORE INTO annotations VALUES (?, ?, ?)',
+            [(episode_id, int(s['start_frame']), c) for s in scenes for c in s.get('characters', [])]
+        )
+
+    # --- Episodios ---
+
+    def get_or_create_episode(self, video_key: str, filename: str) -> int:
+        """
+        Devuelve el ID del episodio para un video, creándolo si no existe.
+
+        Args:
+            video_key: Clave de contenido del video (`video_cache_key`)
+            filename: Nombre original del archivo
+
+        Returns:
+            ID del episodio
+        """
+        with self._transaction() as conn:
+            row = conn.execute('SELECT id FROM episodes WHERE video_key = ?', (video_key,)).fetchone()
+            if row is not None:
+                return row['id']
+            now = time.time()
+            cursor = conn.execute(
+                'INSERT INTO episodes (video_key, filename, created_at, updated_at) VALUES (?, ?, ?, ?)',
+                (video_key, filename, now, now)
+            )
+            return cursor.lastrowid
+
+    def episode_filenames(self) -> Dict[int, str]:
+        """
+        Devuelve el nombre de archivo de cada episodio del proyecto.
+
+        Returns:
+            Diccionario episode_id -> nombre de archivo
+        """
+        with self._lock:
+            rows = self._conn.execute('SELECT id, filename FROM episodes').fetchall()
+        return {row['id']: row['filename'] for row in rows}
+
+    def has_scenes(self, episode_id: int) -> bool:
+        """Indica si el episodio ya tiene escenas guardadas."""
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM scenes WHERE episode_id = ? LIMIT 1', (episode_id,)).fetchone()
+        return row is not None
+
+    # --- Escenas ---
+
+    def replace_scenes(self, episode_id: int, scenes: List[Dict], operation: str = 'detect',
+                       threshold: Optional[float] = None) -> None:
+        """
+        Reemplaza todas las escenas del episodio (detección o edición masiva).
+
+        Args:
+            episode_id: ID del episodio
+            scenes: Lista completa de escenas
+            operation: Nombre de la operación para el historial
+            threshold: Umbral de detección usado, si aplica
+        """
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM scenes WHERE episode_id = ?', (episode_id,))
+            self._insert_scenes(conn, episode_id, scenes)
+            if threshold is not None:
+                conn.execute('UPDATE episodes SET threshold = ? WHERE id = ?', (threshold, episode_id))
+            self._log_edit(conn, episode_id, operation, {'scene_count': len(scenes), 'threshold': threshold})
+
+    def merge_scenes(self, episode_id: int, merged: Dict) -> None:
+        """
+        Fusiona en la base las escenas cubiertas por `merged`.
+
+        Solo se tocan las filas del rango. Personajes y notas de las escenas
+        absorbidas se combinan en SQL, así que funciona aunque en memoria
+        solo estén cargados los resúmenes.
+
+        Args:
+            episode_id: ID del episodio
+            merged: Escena resultante (de `merge_scene_range`)
+        """
+        start, end = int(merged['start_frame']), int(merged['end_frame'])
+        with self._transaction() as conn:
+            conn.execute(
+                'INSERT OR IGNORE INTO annotations '
+                'SELECT episode_id, ?, character FROM annotations '
+                'WHERE episode_id = ? AND start_frame > ? AND start_frame < ?',
+                (start, episode_id, start, end)
+            )
+            notes = [row['notes'] for row in conn.execute(
+                "SELECT notes FROM scenes WHERE episode_id = ? AND start_frame >= ? AND start_frame < ? "
+                "AND notes != '' ORDER BY start_frame",
+                (episode_id, start, end)
+            )]
+            conn.execute(
+                'DELETE FROM scenes WHERE episode_id = ? AND start_frame > ? AND start_frame < ?',
+                (episode_id, start, end)
+            )
+            conn.execute(
+                'UPDATE scenes SET end_frame = ?, end_time = ?, end_timecode = ?, status = ?, notes = ?, '
+                'merged_from = ? WHERE episode_id = ? AND start_frame = ?',
+                (end, float(merged['end_time']), merged.get('end_timecode'), merged.get('status', 'edited'),
+                 '\n'.join(notes), json.dumps(merged.get('merged_from') or []), episode_id, start)
+            )
+            self._log_edit(conn, episode_id, 'merge', {
+                'start_frame': start, 'end_frame': end, 'merged_from': merged.get('merged_from', [])
+            })
+
+    def split_scene(self, episode_id: int, left: Dict, right: Dict) -> None:
+        """
+        Divide una escena en dos: actualiza la izquierda e inserta la derecha.
+
+        Args:
+            episode_id: ID del episodio
+            left: Primera mitad (mismo `start_frame` que la escena original)
+            right: Segunda mitad
+        """
+        with self._transaction() as conn:
+            conn.execute(
+                'UPDATE scenes SET end_frame = ?, end_time = ?, end_timecode = ?, status = ? '
+                'WHERE episode_id = ? AND start_frame = ?',
+                (int(left['end_frame']), float(left['end_time']), left.get('end_timecode'),
+                 left.get('status', 'edited'), episode_id, int(left['start_frame']))
+            )
+            self._insert_scenes(conn, episode_id, [right])
+            self._log_edit(conn, episode_id, 'split', {
+                'start_frame': int(left['start_frame']), 'split_frame': int(right['start_frame'])
+            })
+
+    def update_annotation(self, episode_id: int, start_frame: int,
+                          characters: Optional[List[str]] = None,
+                          notes: Optional[str] = None,
+                          status: Optional[str] = None) -> None:
+        """
+        Guarda un cambio de anotación de una escena en una sola transacción.
+
+        Args:
+            episode_id: ID del episodio
+            start_frame: Fotograma inicial de la escena
+            characters: Lista completa de personajes (None = sin cambios)
+            notes: Notas de contexto (None = sin cambios)
+            status: Estado de la escena (None = sin cambios)
+        """
+        payload = {'start_frame': int(start_frame)}
+        with self._transaction() as conn:
+            if characters is not None:
+                conn.execute('DELETE FROM annotations WHERE episode_id = ? AND start_frame = ?',
+                             (episode_id, start_frame))
+                conn.executemany('INSERT OR IGNORE INTO annotations VALUES (?, ?, ?)',
+                                 [(episode_id, start_frame, c) for c in characters])
+                payload['characters'] = list(characters)
+            if notes is not None:
+                conn.execute('UPDATE scenes SET notes = ? WHERE episode_id = ? AND start_frame = ?',
+                             (notes, episode_id, start_frame))
+                payload['notes'] = notes
+            if status is not None:
+                conn.execute('UPDATE scenes SET status = ? WHERE episode_id = ? AND start_frame = ?',
+                             (status, episode_id, start_frame))
+                payload['status'] = status
+            self._log_edit(conn, episode_id, 'annotate', payload)
+
+    # --- Lectura ---
+
+    def load_scene_summaries(self, episode_id: int) -> List[Dict]:
+        """
+        Carga la lista ligera de escenas (sin notas ni análisis IA).
+
+        Args:
+            episode_id: ID del episodio
+
+        Returns:
+            Lista de escenas ordenada, con 'id', 'index' y 'duration' calculados
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT {", ".join(SUMMARY_COLUMNS)} FROM scenes WHERE episode_id = ? ORDER BY start_frame',
+                (episode_id,)
+            ).fetchall()
+
+        scenes = []
+        for i, row in enumerate(rows):
+            scene = dict(row)
+            scene.update({
+                'id': f"scene_{i+1:03d}",
+                'index': i,
+                'duration': scene['end_time'] - scene['start_time'],
+                'characters': [],
+                'notes': '',
+                'ai_analysis': None,
+                'thumbnail_path': None,
+                'loaded': False,
+            })
+            scenes.append(scene)
+        return scenes
+
+    def load_scene(self, episode_id: int, start_frame: int) -> Optional[Dict]:
+        """
+        Carga una escena completa con sus personajes.
+
+        Args:
+            episode_id: ID del episodio
+            start_frame: Fotograma inicial de la escena
+
+        Returns:
+            Diccionario de la escena (sin 'id'/'index') o None si no existe
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM scenes WHERE episode_id = ? AND start_frame = ?',
+                (episode_id, start_frame)
+            ).fetchone()
+            if row is None:
+                return None
+            characters = [r['character'] for r in self._conn.execute(
+                'SELECT character FROM annotations WHERE episode_id = ? AND start_frame = ? ORDER BY character',
+                (episode_id, start_frame)
+            )]
+
+        scene = dict(row)
+        scene.pop('episode_id')
+        scene['duration'] = scene['end_time'] - scene['start_time']
+        scene['characters'] = characters
+        scene['ai_analysis'] = json.loads(scene['ai_analysis']) if scene['ai_analysis'] else None
+        scene['merged_from'] = json.loads(scene['merged_from']) if scene['merged_from'] else None
+        if scene['merged_from'] is None:
+            scene.pop('merged_from')
+        scene['loaded'] = True
+        return scene
+
+    def load_scenes(self, episode_id: int) -> List[Dict]:
+        """
+        Carga todas las escenas completas del episodio (para ediciones masivas).
+
+        Args:
+            episode_id: ID del episodio
+
+        Returns:
+            Lista de escenas ordenada, con personajes y notas
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM scenes WHERE episode_id = ? ORDER BY start_frame', (episode_id,)
+            ).fetchall()
+            characters: Dict[int, List[str]] = {}
+            for r in self._conn.execute(
+                'SELECT start_frame, character FROM annotations WHERE episode_id = ? ORDER BY character',
+                (episode_id,)
+            ):
+                characters.setdefault(r['start_frame'], []).append(r['character'])
+
+        scenes = []
+        for i, row in enumerate(rows):
+            scene = dict(row)
+            scene.pop('episode_id')
+            scene.update({
+                'id': f"scene_{i+1:03d}",
+                'index': i,
+                'duration': scene['end_time'] - scene['start_time'],
+                'characters': characters.get(scene['start_frame'], []),
+                'ai_analysis': json.loads(scene['ai_analysis']) if scene['ai_analysis'] else None,
+                'loaded': True,
+            })
+            if scene['merged_from']:
+                scene['merged_from'] = json.loads(scene['merged_from'])
+            else:
+                scene.pop('merged_from')
+            scenes.append(scene)
+        return scenes
+
+    def get_history(self, episode_id: int, limit: int = 50) -> List[Dict]:
+        """
+        Devuelve las últimas ediciones del episodio.
+
+        Args:
+            episode_id: ID del episodio
+            limit: Número máximo de entradas
+
+        Returns:
+            Lista de ediciones, la más reciente primero
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, operation, payload, created_at FROM edit_history '
+                'WHERE episode_id = ? ORDER BY id DESC LIMIT ?',
+                (episode_id, limit)
+            ).fetchall()
+        return [dict(row, payload=json.loads(row['payload'])) for row in rows]
+
+    def close(self) -> None:
+        """Cierra la conexión."""
+        with self._lock:
+            self._conn.close()
+        logging.info(f"Proyecto cerrado: {self.db_path}")
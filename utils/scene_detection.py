@@ -4,23 +4,42 @@ Este módulo proporciona funcionalidades para detectar escenas en videos
 utilizando diferentes algoritmos de detección de PySceneDetect.
 """
 
+import inspect
 import logging
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 import tempfile
 import os
+import threading
 
 try:
     from scenedetect import open_video, SceneManager, detect
     from scenedetect.detectors import ContentDetector, ThresholdDetector
     from scenedetect.video_splitter import split_video_ffmpeg
     from scenedetect.frame_timecode import FrameTimecode
+    from scenedetect.scene_manager import compute_downscale_factor
+    import cv2
 except ImportError as e:
     logging.error(f"Error importing PySceneDetect: {e}")
     raise ImportError("PySceneDetect no está instalado. Ejecuta: pip install scenedetect[opencv]")
 
 import streamlit as st
 
+from .detection_checkpoint import CHECKPOINT_EVERY, load_checkpoint, restore_detector, save_checkpoint
+from .scene_grouping import SIGNATURE_STRIDE, frame_signature, save_frame_signatures
+
+# PySceneDetect >= 0.7 pasa la posición (FrameTimecode) a los detectores; 0.6 el número de fotograma
+_TIMECODE_POSITIONS = 'timecode' in inspect.signature(ContentDetector.process_frame).parameters
+
+
+class DetectionCancelled(Exception):
+    """La detección se detuvo a petición (el progreso queda en el checkpoint)."""
+
+
+def _frame_number(cut) -> int:
+    """Número de fotograma de un corte (FrameTimecode en 0.7, int en 0.6)."""
+    return int(getattr(cut, 'frame_num', cut))
+
 
 class SceneDetector:
     """Clase principal para detección de escenas en videos."""
@@ -37,7 +56,10 @@ class SceneDetector:
         self.threshold = threshold
         self.video = None
         self.scene_manager = None
+        self.detector = None
         self.scenes = []
+        # Firmas de color cada SIGNATURE_STRIDE fotogramas, calculadas en la misma pasada
+        self.signatures = []
         
         if not self.video_path.exists():
             raise FileNotFoundError(f"Video no encontrado: {video_path}")
@@ -50,20 +72,28 @@ class SceneDetector:
             self.scene_manager = SceneManager()
             
             # Agregar detector de contenido con el umbral especificado
-            self.scene_manager.add_detector(
-                ContentDetector(threshold=self.threshold)
-            )
+            self.detector = ContentDetector(threshold=self.threshold)
+            self.scene_manager.add_detector(self.detector)
             
         except Exception as e:
             logging.error(f"Error configurando managers: {e}")
             raise
     
-    def detect_scenes(self, progress_callback=None) -> List[Dict]:
+    def detect_scenes(self, progress_callback=None, use_checkpoint: bool = True,
+                      checkpoint_every: int = CHECKPOINT_EVERY,
+                      stop_event: Optional[threading.Event] = None) -> List[Dict]:
         """
         Detecta escenas en el video.
         
+        Los fotogramas se pasan directamente al detector (con el mismo
+        reescalado que aplica SceneManager) para poder guardar checkpoints
+        periódicos y reanudar desde el último si el proceso se interrumpe.
+        
         Args:
             progress_callback: Función callback para mostrar progreso
+            use_checkpoint: Guardar/reanudar checkpoints en disco
+            checkpoint_every: Fotogramas procesados entre checkpoints
+            stop_event: Evento para detener la detección (lanza DetectionCancelled)
             
         Returns:
             Lista de diccionarios con información de escenas
@@ -71,17 +101,32 @@ class SceneDetector:
         try:
             self._setup_managers()
             
-            # Detectar escenas
-            if progress_callback:
-                progress_callback("Analizando video...")
+            cuts: List[int] = []
+            next_frame = 0
+            self.signatures = []
+            state = load_checkpoint(str(self.video_path), self.threshold) if use_checkpoint else None
+            if state is not None:
+                restore_detector(self.detector, state['detector_state'], self.video.frame_rate)
+                cuts = list(state['cuts'])
+                self.signatures = list(state['signatures'])
+                next_frame = state['next_frame']
+                logging.info(f"Reanudando detección desde el fotograma {next_frame} ({len(cuts)} cortes)")
+                if progress_callback:
+                    progress_callback(f"Reanudando desde el fotograma {next_frame}...")
             
-            self.scene_manager.detect_scenes(
-                video=self.video,
-                show_progress=False  # Usamos nuestro propio callback
-            )
+            if state is None or not state.get('complete'):
+                if next_frame > 0:
+                    self.video.seek(next_frame)
+                
+                # Detectar escenas
+                if progress_callback:
+                    progress_callback("Analizando video...")
+                
+                next_frame = self._run_detector(cuts, next_frame, progress_callback,
+                                                use_checkpoint, checkpoint_every, stop_event)
             
             # Obtener lista de escenas
-            scene_list = self.scene_manager.get_scene_list()
+            scene_list = self._scenes_from_cuts(cuts, next_frame)
             
             # Procesar escenas
             self.scenes = self._process_scenes(scene_list)
@@ -91,10 +136,107 @@ class SceneDetector:
             
             return self.scenes
             
+        except DetectionCancelled:
+            raise
         except Exception as e:
             logging.error(f"Error detectando escenas: {e}")
             raise
     
+    def _run_detector(self, cuts: List[int], next_frame: int, progress_callback,
+                      use_checkpoint: bool, checkpoint_every: int,
+                      stop_event: Optional[threading.Event] = None) -> int:
+        """
+        Procesa los fotogramas restantes del video acumulando cortes.
+        
+        Args:
+            cuts: Lista de cortes confirmados (se amplía en el sitio)
+            next_frame: Número del siguiente fotograma a procesar
+            progress_callback: Función callback para mostrar progreso
+            use_checkpoint: Guardar checkpoints en disco
+            checkpoint_every: Fotogramas procesados entre checkpoints
+            stop_event: Evento para detener la detección
+            
+        Returns:
+            Número total de fotogramas procesados
+        """
+        total_frames = self.video.duration.get_frames() if self.video.duration else 0
+        # Mismo reescalado que SceneManager (factor según el lado mayor)
+        downscale = compute_downscale_factor(max(self.video.frame_size))
+        last_saved = next_frame
+        position = None
+        
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                if use_checkpoint:
+                    self._save_checkpoint(cuts, next_frame, complete=False)
+                raise DetectionCancelled(f"Detección detenida en el fotograma {next_frame}")
+            
+            frame = self.video.read()
+            if frame is False or frame is None:
+                break
+            
+            if downscale > 1:
+                frame = cv2.resize(
+                    frame,
+                    (max(1, round(frame.shape[1] / downscale)), max(1, round(frame.shape[0] / downscale))),
+                    interpolation=cv2.INTER_LINEAR
+                )
+            
+            if next_frame % SIGNATURE_STRIDE == 0:
+                self.signatures.append(frame_signature(frame))
+            
+            position = self.video.position if _TIMECODE_POSITIONS else next_frame
+            cuts.extend(_frame_number(cut) for cut in self.detector.process_frame(position, frame))
+            next_frame += 1
+            
+            if next_frame - last_saved >= checkpoint_every:
+                last_saved = next_frame
+                if use_checkpoint:
+                    self._save_checkpoint(cuts, next_frame, complete=False)
+                if progress_callback and total_frames:
+                    progress_callback(f"Analizando video... {100 * next_frame / total_frames:.0f}%")
+        
+        if position is not None:
+            cuts.extend(_frame_number(cut) for cut in self.detector.post_process(position))
+        if use_checkpoint:
+            self._save_checkpoint(cuts, next_frame, complete=True)
+        save_frame_signatures(str(self.video_path), self.signatures)
+        return next_frame
+    
+    def _save_checkpoint(self, cuts: List[int], next_frame: int, complete: bool) -> None:
+        """Guarda el estado actual de la detección en disco."""
+        save_checkpoint(str(self.video_path), self.threshold, {
+            'next_frame': next_frame,
+            'cuts': list(cuts),
+            'detector': self.detector,
+            'signatures': self.signatures,
+            'complete': complete,
+        })
+    
+    def _scenes_from_cuts(self, cuts: List[int], end_frame: int) -> List[Tuple]:
+        """
+        Convierte la lista de cortes en tuplas (inicio, fin) de FrameTimecode.
+        
+        Igual que SceneManager.get_scene_list(), sin cortes no hay escenas.
+        
+        Args:
+            cuts: Números de fotograma de cada corte
+            end_frame: Número de fotogramas procesados
+            
+        Returns:
+            Lista de tuplas (start_time, end_time)
+        """
+        if not cuts:
+            return []
+        
+        fps = self.video.frame_rate
+        boundaries = [0] + sorted(set(cuts)) + [end_frame]
+        return [
+            (FrameTimecode(start, fps), FrameTimecode(end, fps))
+            for start, end in zip(boundaries[:-1], boundaries[1:])
+            if end > start
+        ]
+    
     def _process_scenes(self, scene_list: List[Tuple]) -> List[Dict]:
         """
         Procesa la lista de escenas raw de PySceneDetect.
@@ -181,7 +323,7 @@ class SceneDetector:
             info = {
                 'filename': self.video_path.name,
                 'path': str(self.video_path),
-                'fps': video_fps,
+                'fps': float(video_fps),
                 'frame_count': frame_count,
                 'duration': duration,
                 'duration_formatted': self._format_time(duration),
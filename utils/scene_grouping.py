@@ -0,0 +1,374 @@
+"""Módulo de agrupación automática de planos en escenas semánticas.
+
+PySceneDetect devuelve micro-planos (cada corte de cámara). Este módulo
+calcula una firma de color compacta por plano y construye una matriz de
+similitud en banda (solo planos cercanos) con NumPy para proponer fusiones,
+por ejemplo secuencias de diálogo plano/contraplano (A B A B).
+
+Las firmas por fotograma (una cada `SIGNATURE_STRIDE` fotogramas) salen de
+la misma pasada de decodificación de la detección y se cachean por video;
+la firma de un plano es la media de las que caen dentro. Sin esa caché se
+calculan con una única pasada secuencial, nunca con seeks por plano.
+
+Las propuestas son revisables: no modifican la lista de escenas hasta que
+se aplican explícitamente con `apply_grouping`.
+"""
+
+import logging
+from pathlib import Path
+from typing import Callable, List, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - OpenCV viene con scenedetect[opencv]
+    cv2 = None
+
+from .background_jobs import atomic_output, cache_dir
+from .video_proxy import video_cache_key
+
+# Bins del histograma HSV (H, S, V) -> 8 * 4 * 4 = 128 dimensiones
+HIST_BINS = (8, 4, 4)
+SIGNATURE_SIZE = int(np.prod(HIST_BINS))
+
+# Resolución de muestreo para calcular la firma (suficiente para color)
+SAMPLE_SIZE = (64, 36)
+
+# Una firma cada N fotogramas (~4 por segundo a 24 fps)
+SIGNATURE_STRIDE = 6
+SIGNATURE_DIR = cache_dir('signatures', 'ST_SIGNATURE_DIR')
+
+
+def frame_signature(frame: np.ndarray) -> np.ndarray:
+    """
+    Calcula la firma de color de un fotograma BGR.
+
+    Args:
+        frame: Fotograma BGR de OpenCV
+
+    Returns:
+        Vector float32 normalizado (raíz cuadrada del histograma)
+    """
+    small = cv2.resize(frame, SAMPLE_SIZE, interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1, 2], None, list(HIST_BINS), [0, 180, 0, 256, 0, 256])
+    hist = hist.flatten().astype(np.float32)
+    total = hist.sum()
+    if total > 0:
+        hist /= total
+    # sqrt(p) tiene norma L2 = 1, así el producto punto es el coeficiente de Bhattacharyya
+    return np.sqrt(hist)
+
+
+def signatures_path_for(video_path: str, stride: int = SIGNATURE_STRIDE) -> Path:
+    """
+    Devuelve la ruta de caché de las firmas por fotograma de un video.
+
+    Args:
+        video_path: Ruta al archivo de video
+        stride: Fotogramas entre firmas
+
+    Returns:
+        Ruta del archivo .npy (puede no existir todavía)
+    """
+    return SIGNATURE_DIR / f"{video_cache_key(video_path)}_{stride}f.npy"
+
+
+def save_frame_signatures(video_path: str, signatures: np.ndarray,
+                          stride: int = SIGNATURE_STRIDE) -> None:
+    """
+    Guarda las firmas por fotograma de un video (escritura atómica).
+
+    Args:
+        video_path: Ruta al archivo de video
+        signatures: Matriz (n_muestras, SIGNATURE_SIZE); la fila k es el fotograma k * stride
+        stride: Fotogramas entre firmas
+    """
+    with atomic_output(signatures_path_for(video_path, stride)) as partial:
+        np.save(partial, np.asarray(signatures, dtype=np.float16).reshape(-1, SIGNATURE_SIZE))
+
+
+def compute_frame_signatures(video_path: str, stride: int = SIGNATURE_STRIDE,
+                             progress_callback: Optional[Callable[[str], None]] = None) -> np.ndarray:
+    """
+    Devuelve las firmas por fotograma, de la caché o con una pasada secuencial.
+
+    La pasada usa grab() para avanzar y solo convierte (retrieve) uno de
+    cada `stride` fotogramas.
+
+    Args:
+        video_path: Ruta al archivo de video
+        stride: Fotogramas entre firmas
+        progress_callback: Función opcional que recibe mensajes de progreso
+
+    Returns:
+        Matriz (n_muestras, SIGNATURE_SIZE); la fila k es el fotograma k * stride
+    """
+    path = signatures_path_for(video_path, stride)
+    if path.exists():
+        return np.load(path).astype(np.float32)
+    if cv2 is None:
+        raise ImportError("OpenCV no está instalado. Ejecuta: pip install opencv-python")
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise IOError(f"No se pudo abrir el video: {video_path}")
+
+    signatures = []
+    frame_idx = 0
+    try:
+        while cap.grab():
+            if frame_idx % stride == 0:
+                ok, frame = cap.retrieve()
+                signatures.append(frame_signature(frame) if ok else np.zeros(SIGNATURE_SIZE, np.float32))
+                if progress_callback and len(signatures) % 1000 == 0:
+                    progress_callback(f"Firmas de color: {frame_idx} fotogramas")
+            frame_idx += 1
+    finally:
+        cap.release()
+
+    result = np.array(signatures, dtype=np.float32).reshape(-1, SIGNATURE_SIZE)
+    save_frame_signatures(video_path, result, stride)
+    return result
+
+
+def compute_shot_signatures(video_path: str, scenes: List[Dict],
+                            stride: int = SIGNATURE_STRIDE,
+                            frame_signatures: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Calcula la firma de color de cada plano como media de sus firmas por fotograma.
+
+    Args:
+        video_path: Ruta al archivo de video
+        scenes: Lista de escenas (salida de `_process_scenes`)
+        stride: Fotogramas entre firmas
+        frame_signatures: Firmas por fotograma ya cargadas (None = caché o pasada secuencial)
+
+    Returns:
+        Matriz (n_planos, SIGNATURE_SIZE) con filas de norma unitaria
+    """
+    if frame_signatures is None:
+        frame_signatures = compute_frame_signatures(video_path, stride)
+    n_samples = len(frame_signatures)
+    signatures = np.zeros((len(scenes), SIGNATURE_SIZE), dtype=np.float32)
+    if n_samples == 0 or not scenes:
+        return signatures
+
+    starts = np.array([int(scene.get('start_frame', 0)) for scene in scenes])
+    ends = np.array([int(scene.get('end_frame', 0)) for scene in scenes])
+    # Muestras con fotograma dentro de [inicio, fin); un plano más corto que
+    # `stride` se queda con la muestra más cercana a su inicio
+    first = np.minimum(-(-starts // stride), n_samples - 1)
+    last = np.clip(-(-ends // stride), first + 1, n_samples)
+
+    cumsum = np.vstack([np.zeros((1, SIGNATURE_SIZE)), np.cumsum(frame_signatures, axis=0, dtype=np.float64)])
+    sums = cumsum[last] - cumsum[first]
+    norms = np.linalg.norm(sums, axis=1, keepdims=True)
+    np.divide(sums, norms, out=sums, where=norms > 0)
+    signatures[:] = sums
+    if np.any(norms == 0):
+        logging.warning(f"{int(np.sum(norms == 0))} planos sin firma de color")
+    return signatures
+
+
+def banded_similarity(signatures: np.ndarray, window: int = 4) -> np.ndarray:
+    """
+    Calcula la similitud entre cada plano y los `window` planos siguientes.
+
+    Args:
+        signatures: Matriz (n, d) de firmas con norma unitaria
+        window: Ancho de la banda (número de planos vecinos a comparar)
+
+    Returns:
+        Matriz (n, window) donde band[i, k-1] = sim(i, i+k); -inf fuera de rango
+        (así el relleno nunca cuenta como enlace, con ninguna tolerancia)
+    """
+    n = len(signatures)
+    band = np.full((n, window), -np.inf, dtype=np.float32)
+    for k in range(1, min(window, n - 1) + 1):
+        band[:n - k, k - 1] = np.einsum('ij,ij->i', signatures[:-k], signatures[k:])
+    return band
+
+
+def propose_groups(signatures: np.ndarray, tolerance: float = 0.25,
+                   window: int = 4) -> List[Dict]:
+    """
+    Propone grupos contiguos de planos visualmente similares.
+
+    Dos planos a distancia <= `window` quedan enlazados si su similitud es
+    >= 1 - tolerance; todo el rango entre ellos pasa a formar parte del mismo
+    grupo (así A B A B queda unido aunque A y B no se parezcan).
+
+    Args:
+        signatures: Matriz (n, d) de firmas por plano
+        tolerance: Tolerancia de similitud (0 = idénticos, 1 = todo se agrupa)
+        window: Distancia máxima en planos para enlazar
+
+    Returns:
+        Lista de propuestas con 'start_index', 'end_index' (inclusive) y 'similarity'
+    """
+    n = len(signatures)
+    if n < 2:
+        return []
+
+    band = banded_similarity(signatures, window)
+    linked = band >= (1.0 - tolerance)
+
+    # Índice más lejano enlazado desde cada plano (i si no enlaza con nadie)
+    offsets = np.arange(1, window + 1)
+    idx = np.arange(n)
+    reach = idx + np.where(linked, offsets, 0).max(axis=1)
+    reach = np.maximum.accumulate(reach)
+
+    # Un grupo termina donde el alcance acumulado no supera al propio plano
+    ends = np.flatnonzero(reach == idx)
+    starts = np.r_[0, ends[:-1] + 1]
+
+    proposals = []
+    for start, end in zip(starts, ends):
+        if end == start:
+            continue
+        scores = band[start:end + 1][linked[start:end + 1]]
+        proposals.append({
+            'start_index': int(start),
+            'end_index': int(end),
+            'similarity': float(scores.mean()) if scores.size else 0.0,
+        })
+    return proposals
+
+
+def merge_scene_range(scenes: List[Dict]) -> Dict:
+    """
+    Fusiona una secuencia contigua de escenas en una sola.
+
+    'merged_from' guarda los rangos [start_frame, end_frame] de los planos
+    originales: a diferencia de los IDs visibles, no cambian al renumerar.
+
+    Args:
+        scenes: Escenas contiguas a fusionar (en orden)
+
+    Returns:
+        Diccionario de escena que abarca del inicio de la primera al final de la última
+    """
+    first, last = scenes[0], scenes[-1]
+    merged = dict(first)
+
+    characters = []
+    for scene in scenes:
+        for character in scene.get('characters', []):
+            if character not in characters:
+                characters.append(character)
+
+    merged.update({
+        'end_time': last['end_time'],
+        'duration': last['end_time'] - first['start_time'],
+        'end_frame': last.get('end_frame', 0),
+        'end_timecode': last.get('end_timecode', ''),
+        'status': 'edited',
+        'characters': characters,
+        'notes': '\n'.join(s['notes'] for s in scenes if s.get('notes')),
+        'merged_from': [list(r) for s in scenes
+                        for r in s.get('merged_from', [[int(s['start_frame']), int(s['end_frame'])]])],
+    })
+    return merged
+
+
+def _timecode(seconds: float) -> str:
+    """Formatea segundos como los timecodes de PySceneDetect (HH:MM:SS.mmm)."""
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    return f"{hours:02d}:{minutes:02d}:{millis // 1000:02d}.{millis % 1000:03d}"
+
+
+def split_scene_at(scene: Dict, split_frame: int) -> Tuple[Dict, Dict]:
+    """
+    Divide una escena en dos en un fotograma.
+
+    La primera mitad conserva notas, análisis IA y el 'merged_from'; la
+    segunda hereda los personajes y empieza sin notas.
+
+    Args:
+        scene: Escena a dividir (con fotogramas y tiempos)
+        split_frame: Primer fotograma de la segunda mitad
+
+    Returns:
+        Tupla (izquierda, derecha)
+
+    Raises:
+        ValueError: Si `split_frame` no cae estrictamente dentro de la escena
+    """
+    start, end = int(scene['start_frame']), int(scene['end_frame'])
+    if not start < split_frame < end:
+        raise ValueError(f"El fotograma {split_frame} no está dentro de la escena ({start}-{end})")
+    fps = (end - start) / (scene['end_time'] - scene['start_time'])
+    split_time = scene['start_time'] + (split_frame - start) / fps
+
+    left = dict(scene)
+    left.update({
+        'end_frame': int(split_frame),
+        'end_time': split_time,
+        'end_timecode': _timecode(split_time),
+        'duration': split_time - scene['start_time'],
+        'status': 'edited',
+    })
+    right = {key: value for key, value in scene.items() if key != 'merged_from'}
+    right.update({
+        'start_frame': int(split_frame),
+        'start_time': split_time,
+        'start_timecode': _timecode(split_time),
+        'duration': scene['end_time'] - split_time,
+        'status': 'edited',
+        'characters': list(scene.get('characters', [])),
+        'notes': '',
+        'ai_analysis': None,
+        'thumbnail_path': None,
+        'audio_hints': [],
+    })
+    return left, right
+
+
+def renumber_scenes(scenes: List[Dict]) -> List[Dict]:
+    """
+    Reasigna 'id' e 'index' de forma secuencial tras una edición.
+
+    Args:
+        scenes: Lista de escenas
+
+    Returns:
+        La misma lista con ids actualizados
+    """
+    for i, scene in enumerate(scenes):
+        scene['id'] = f"scene_{i+1:03d}"
+        scene['index'] = i
+    return scenes
+
+
+def apply_grouping(scenes: List[Dict], proposals: List[Dict],
+                   accepted: Optional[List[int]] = None) -> List[Dict]:
+    """
+    Aplica las propuestas de agrupación aceptadas a la lista de escenas.
+
+    Args:
+        scenes: Lista de escenas original
+        proposals: Propuestas de `propose_groups`
+        accepted: Índices de las propuestas a aplicar (None = todas)
+
+    Returns:
+        Nueva lista de escenas con los grupos fusionados y renumerados
+    """
+    if accepted is None:
+        accepted = range(len(proposals))
+    chosen = sorted((proposals[i] for i in accepted), key=lambda p: p['start_index'])
+
+    result = []
+    cursor = 0
+    for proposal in chosen:
+        start, end = proposal['start_index'], proposal['end_index']
+        result.extend(dict(s) for s in scenes[cursor:start])
+        result.append(merge_scene_range(scenes[start:end + 1]))
+        cursor = end + 1
+    result.extend(dict(s) for s in scenes[cursor:])
+
+    return renumber_scenes(result)
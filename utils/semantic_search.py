@@ -0,0 +1,493 @@
+"""Módulo de búsqueda semántica local sobre notas y análisis IA de las escenas.
+
+Cada escena con texto (notas + `ai_analysis`) se convierte en un vector:
+
+- Si está instalado `sentence-transformers`, un modelo local en CPU
+  (`ST_EMBEDDING_MODEL`, por defecto `DEFAULT_EMBEDDING_MODEL`).
+- Si no, o con `ST_EMBEDDING_MODEL=tfidf`, TF-IDF con hashing (unigramas
+  y bigramas en `HASH_DIM` cubetas con signo), sin dependencias ni
+  vocabulario que reconstruir. Los vectores guardan solo la TF sublineal
+  normalizada; el IDF se calcula a partir de las frecuencias de documento
+  en memoria y se aplica al consultar, así editar una nota nunca obliga a
+  re-ponderar el resto.
+
+Límite del hashing: las filas son densas, así que `HASH_DIM` es pequeño.
+Una escena con notas y análisis largos tiene unos 300 términos, y cada
+término de la consulta cae en la cubeta de alguno de ellos con
+probabilidad ~1 - (1 - 1/1024)^300 ≈ 25%. Las colisiones añaden ruido a
+la similitud y candidatos de más; sirve como respaldo sin dependencias,
+pero para colecciones grandes conviene instalar el modelo.
+
+Los vectores viven en una matriz `float32` mapeada en memoria
+(`data/search/vectors.f32`) con las claves (episodio, fotograma inicial,
+hash del texto) en `keys.i64`. La búsqueda aproximada depende del tipo
+de vector:
+
+- TF-IDF (disperso): listas invertidas por cubeta de hash; los candidatos
+  son las escenas que comparten alguno de los términos más raros de la
+  consulta.
+- Modelo denso: LSH de hiperplanos aleatorios (varias tablas, con
+  multi-probe a distancia 1).
+
+Los candidatos se reordenan con el producto exacto. Actualizar una escena
+reescribe solo su fila y sus entradas en el índice aproximado.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+INDEX_DIR = Path(os.environ.get('ST_SEARCH_DIR', 'data/search'))
+DEFAULT_EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+EMBEDDING_MODEL = os.environ.get('ST_EMBEDDING_MODEL', DEFAULT_EMBEDDING_MODEL)
+
+HASH_DIM = 1024  # ver el límite de colisiones en la cabecera del módulo
+INITIAL_CAPACITY = 1024
+
+# LSH (solo embeddings densos): tablas x bits por código
+LSH_TABLES = 8
+LSH_BITS = 10
+LSH_SEED = 1234
+
+# Términos de la consulta (los de mayor IDF) que se usan para buscar candidatos
+MAX_QUERY_TERMS = 8
+
+# Palabras vacías (español e inglés) que no aportan al hashing
+STOPWORDS = frozenset("""
+a al algo con de del el ella ellos en es esta este esto la las lo los mas muy no o para pero por que se si
+sin sobre su sus un una uno y ya
+an and are as at be by for from has he her his in is it its of on or she that the their they this to was
+were with
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def scene_text(scene: Dict) -> str:
+    """
+    Devuelve el texto buscable de una escena (notas + análisis IA).
+
+    Args:
+        scene: Escena completa
+
+    Returns:
+        Texto concatenado ('' si no hay nada que indexar)
+    """
+    parts = [scene.get('notes') or '']
+
+    def collect(node):
+        if isinstance(node, str):
+            parts.append(node)
+        elif isinstance(node, dict):
+            for value in node.values():
+                collect(value)
+        elif isinstance(node, list):
+            for value in node:
+                collect(value)
+
+    collect(scene.get('ai_analysis'))
+    return '\n'.join(part for part in parts if part).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Normaliza (minúsculas, sin acentos) y separa en unigramas y bigramas.
+
+    Args:
+        text: Texto libre
+
+    Returns:
+        Lista de términos
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    words = [w for w in _TOKEN_RE.findall(text) if len(w) > 1 and w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class HashedTfidfEmbedder:
+    """Embeddings TF con hashing; el IDF se aplica en la consulta."""
+
+    name = f'hashed-tfidf-{HASH_DIM}'
+    dim = HASH_DIM
+    uses_idf = True  # vectores dispersos: índice invertido en lugar de LSH
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Calcula vectores TF sublineales normalizados.
+
+        Args:
+            texts: Textos a convertir
+
+        Returns:
+            Matriz (n, dim) float32 con filas de norma unitaria (o cero)
+        """
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for term, count in Counter(tokenize(text)).items():
+                h = zlib.crc32(term.encode('utf-8'))
+                sign = 1.0 if (h >> 31) & 1 else -1.0
+                vectors[i, h % self.dim] += sign * (1.0 + np.log(count))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+
+class SentenceTransformerEmbedder:
+    """Embeddings densos con un modelo local de sentence-transformers (CPU)."""
+
+    uses_idf = False
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.name = f'st-{model_name}'
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def get_embedder():
+    """
+    Devuelve el embedder configurado (modelo local o TF-IDF con hashing).
+
+    El modelo se usa siempre que `sentence-transformers` esté instalado;
+    `ST_EMBEDDING_MODEL=tfidf` fuerza el hashing.
+
+    Returns:
+        Instancia con `name`, `dim`, `uses_idf` y `embed(texts)`
+    """
+    if EMBEDDING_MODEL and EMBEDDING_MODEL.lower() != 'tfidf':
+        try:
+            return SentenceTransformerEmbedder(EMBEDDING_MODEL)
+        except ImportError:
+            if EMBEDDING_MODEL != DEFAULT_EMBEDDING_MODEL:
+                logging.warning("sentence-transformers no está instalado; se usa TF-IDF con hashing")
+        except Exception as e:
+            # Instalado pero el modelo no carga (ej. sin red para descargarlo)
+            logging.warning(f"No se pudo cargar el modelo {EMBEDDING_MODEL}; se usa TF-IDF con hashing: {e}")
+    return HashedTfidfEmbedder()
+
+
+class SemanticIndex:
+    """Índice vectorial mapeado en memoria con búsqueda aproximada."""
+
+    def __init__(self, index_dir: Path = INDEX_DIR, embedder=None):
+        """
+        Abre (o crea) el índice.
+
+        Args:
+            index_dir: Directorio de los archivos del índice
+            embedder: Embedder a usar (por defecto `get_embedder()`)
+        """
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder or get_embedder()
+        self.dim = self.embedder.dim
+        self._lock = threading.RLock()
+
+        rng = np.random.default_rng(LSH_SEED)
+        self._planes = rng.standard_normal((LSH_TABLES * LSH_BITS, self.dim)).astype(np.float32)
+        self._bit_weights = (1 << np.arange(LSH_BITS)).astype(np.int64)
+
+        meta = self._read_meta()
+        if meta is None or meta.get('embedder') != self.embedder.name:
+            if meta is not None:
+                logging.info("El embedder cambió; se reinicia el índice semántico")
+            self.capacity = INITIAL_CAPACITY
+            self._create_files()
+        else:
+            self.capacity = meta['capacity']
+        self._open_files()
+        self._build_memory_structures()
+
+    # --- Archivos ---
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.index_dir / 'meta.json'
+
+    def _read_meta(self) -> Optional[Dict]:
+        if not self._meta_path.exists():
+            return None
+        with open(self._meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_meta(self) -> None:
+        tmp_path = self._meta_path.with_suffix('.json.part')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'embedder': self.embedder.name, 'dim': self.dim, 'capacity': self.capacity}, f)
+        tmp_path.replace(self._meta_path)
+
+    def _create_files(self) -> None:
+        """Crea archivos vacíos (todas las filas libres)."""
+        np.zeros((self.capacity, self.dim), dtype=np.float32).tofile(self.index_dir / 'vectors.f32')
+        np.full((self.capacity, 3), -1, dtype=np.int64).tofile(self.index_dir / 'keys.i64')
+        self._write_meta()
+
+    def _open_files(self) -> None:
+        self.vectors = np.memmap(self.index_dir / 'vectors.f32', dtype=np.float32, mode='r+',
+                                 shape=(self.capacity, self.dim))
+        self.keys = np.memmap(self.index_dir / 'keys.i64', dtype=np.int64, mode='r+',
+                              shape=(self.capacity, 3))
+
+    def _grow(self) -> None:
+        """Duplica la capacidad ampliando los archivos en disco."""
+        self.vectors.flush()
+        self.keys.flush()
+        del self.vectors, self.keys
+        old = self.capacity
+        self.capacity *= 2
+        with open(self.index_dir / 'vectors.f32', 'r+b') as f:
+            f.truncate(self.capacity * self.dim * 4)
+        with open(self.index_dir / 'keys.i64', 'ab') as f:
+            np.full((self.capacity - old, 3), -1, dtype=np.int64).tofile(f)
+        self._open_files()
+        self._codes = np.concatenate([self._codes, np.zeros((self.capacity - old, LSH_TABLES), dtype=np.int64)])
+        self._free.extend(range(self.capacity - 1, old - 1, -1))
+        self._write_meta()
+
+    # --- Estructuras en memoria ---
+
+    def _lsh_codes(self, vectors: np.ndarray) -> np.ndarray:
+        """Código LSH (entero de LSH_BITS bits) de cada vector en cada tabla."""
+        bits = (vectors @ self._planes.T > 0).reshape(len(vectors), LSH_TABLES, LSH_BITS)
+        return bits.astype(np.int64) @ self._bit_weights
+
+    def _build_memory_structures(self) -> None:
+        """Reconstruye filas, frecuencias de documento y el índice aproximado desde los archivos."""
+        used = np.flatnonzero(self.keys[:, 0] >= 0)
+        self._rows: Dict[tuple, int] = {(int(e), int(f)): int(r)
+                                        for r, (e, f) in zip(used, self.keys[used, :2])}
+        self._free = sorted(set(range(self.capacity)) - set(used.tolist()), reverse=True)
+
+        self._df = np.zeros(self.dim, dtype=np.int64)
+        self._codes = np.zeros((self.capacity, LSH_TABLES), dtype=np.int64)
+        self._buckets: List[Dict[int, set]] = [{} for _ in range(LSH_TABLES)]
+        self._postings: Dict[int, set] = {}
+        for start in range(0, len(used), 4096):
+            rows = used[start:start + 4096]
+            block = np.asarray(self.vectors[rows])
+            self._df += (block != 0).sum(axis=0)
+            if not self.embedder.uses_idf:
+                self._codes[rows] = self._lsh_codes(block)
+            for row, vector in zip(rows, block):
+                self._index_row(int(row), vector)
+
+    def _index_row(self, row: int, vector: np.ndarray) -> None:
+        """Añade una fila al índice aproximado (listas invertidas o cubetas LSH)."""
+        if self.embedder.uses_idf:
+            for dim in np.flatnonzero(vector):
+                self._postings.setdefault(int(dim), set()).add(row)
+        else:
+            for table, code in enumerate(self._codes[row]):
+                self._buckets[table].setdefault(int(code), set()).add(row)
+
+    def _unindex_row(self, row: int) -> None:
+        """Quita una fila del índice aproximado (antes de borrar su vector)."""
+        if self.embedder.uses_idf:
+            entries = [(self._postings, int(dim)) for dim in np.flatnonzero(self.vectors[row])]
+        else:
+            entries = [(self._buckets[table], int(code)) for table, code in enumerate(self._codes[row])]
+        for index, key in entries:
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.discard(row)
+                if not bucket:
+                    del index[key]
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    # --- Actualización incremental ---
+
+    @staticmethod
+    def _text_hash(text: str) -> int:
+        return zlib.crc32(text.encode('utf-8'))
+
+    def upsert(self, episode_id: int, start_frame: int, text: str) -> bool:
+        """
+        Indexa (o reindexa) el texto de una escena.
+
+        Args:
+            episode_id: ID del episodio
+            start_frame: Fotograma inicial de la escena
+            text: Texto buscable (vacío = quitarla del índice)
+
+        Returns:
+            True si el índice cambió
+        """
+        if not text.strip():
+            return self.remove(episode_id, start_frame)
+
+        key = (int(episode_id), int(start_frame))
+        text_hash = self._text_hash(text)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is not None and self.keys[row, 2] == text_hash:
+                return False
+            vector = self.embedder.embed([text])[0]
+
+            if row is None:
+                if not self._free:
+                    self._grow()
+                row = self._free.pop()
+                self._rows[key] = row
+            else:
+                self._df -= self.vectors[row] != 0
+                self._unindex_row(row)
+
+            self.vectors[row] = vector
+            self.keys[row] = (key[0], key[1], text_hash)
+            self._df += vector != 0
+            if not self.embedder.uses_idf:
+                self._codes[row] = self._lsh_codes(vector[None, :])[0]
+            self._index_row(row, vector)
+            return True
+
+    def remove(self, episode_id: int, start_frame: int) -> bool:
+        """
+        Quita una escena del índice.
+
+        Args:
+            episode_id: ID del episodio
+            start_frame: Fotograma inicial de la escena
+
+        Returns:
+            True si estaba indexada
+        """
+        with self._lock:
+            row = self._rows.pop((int(episode_id), int(start_frame)), None)
+            if row is None:
+                return False
+            self._df -= self.vectors[row] != 0
+            self._unindex_row(row)
+            self.vectors[row] = 0.0
+            self.keys[row] = -1
+            self._free.append(row)
+            return True
+
+    def sync_episode(self, episode_id: int, scenes: List[Dict]) -> int:
+        """
+        Alinea el índice con las escenas de un episodio (tras detectar, fusionar o editar en bloque).
+
+        Solo se recalculan las escenas cuyo texto cambió; las que ya no
+        existen se eliminan.
+
+        Args:
+            episode_id: ID del episodio
+            scenes: Escenas completas del episodio
+
+        Returns:
+            Número de filas añadidas, actualizadas o eliminadas
+        """
+        changed = 0
+        with self._lock:
+            current = {int(scene['start_frame']) for scene in scenes}
+            stale = [frame for (episode, frame) in self._rows if episode == episode_id and frame not in current]
+            for frame in stale:
+                changed += self.remove(episode_id, frame)
+            for scene in scenes:
+                changed += self.upsert(episode_id, scene['start_frame'], scene_text(scene))
+            self.flush()
+        return changed
+
+    def flush(self) -> None:
+        """Asegura que los cambios de las matrices mapeadas llegan a disco."""
+        with self._lock:
+            self.vectors.flush()
+            self.keys.flush()
+
+    # --- Búsqueda ---
+
+    def _query_weights(self) -> np.ndarray:
+        """IDF suavizado al cuadrado (se aplica una vez por lado del producto)."""
+        n = max(len(self._rows), 1)
+        idf = np.log((1.0 + n) / (1.0 + self._df)) + 1.0
+        return (idf * idf).astype(np.float32)
+
+    def _candidates(self, query_vector: np.ndarray) -> set:
+        """Filas candidatas para una consulta según el índice aproximado."""
+        candidates = set()
+        if self.embedder.uses_idf:
+            # Los términos más raros de la consulta son los que más pesan en el producto
+            dims = np.flatnonzero(query_vector)
+            for dim in dims[np.argsort(self._df[dims])][:MAX_QUERY_TERMS]:
+                candidates |= self._postings.get(int(dim), set())
+            return candidates
+
+        # LSH: cubetas de la consulta y las de distancia Hamming 1
+        for table, code in enumerate(self._lsh_codes(query_vector[None, :])[0]):
+            buckets = self._buckets[table]
+            candidates |= buckets.get(int(code), set())
+            for bit in range(LSH_BITS):
+                candidates |= buckets.get(int(code) ^ (1 << bit), set())
+        return candidates
+
+    def search(self, query: str, k: int = 10, episode_id: Optional[int] = None,
+               exact: bool = False) -> List[Dict]:
+        """
+        Busca las escenas más parecidas a una consulta en lenguaje natural.
+
+        Args:
+            query: Texto de la consulta
+            k: Número de resultados
+            episode_id: Limitar a un episodio (None = toda la temporada)
+            exact: Comparar con todas las filas en lugar de usar el índice aproximado
+
+        Returns:
+            Lista de resultados con 'episode_id', 'start_frame' y 'score', de mayor a menor
+        """
+        query_vector = self.embedder.embed([query])[0]
+        if not query_vector.any():
+            return []
+
+        with self._lock:
+            if exact:
+                rows = np.fromiter(self._rows.values(), dtype=np.int64)
+            else:
+                rows = np.fromiter(self._candidates(query_vector), dtype=np.int64)
+                if len(rows) < k:
+                    # Pocos candidatos: índice pequeño o consulta rara, el exacto es barato
+                    rows = np.fromiter(self._rows.values(), dtype=np.int64)
+            if episode_id is not None:
+                rows = rows[self.keys[rows, 0] == episode_id]
+            if not len(rows):
+                return []
+
+            weighted = query_vector * self._query_weights() if self.embedder.uses_idf else query_vector
+            scores = np.asarray(self.vectors[rows]) @ weighted
+            scores /= np.linalg.norm(weighted)
+            top = np.argsort(-scores)[:k]
+            keys = self.keys[rows[top]]
+
+        return [{'episode_id': int(e), 'start_frame': int(f), 'score': float(s)}
+                for (e, f, _), s in zip(keys, scores[top]) if s > 0]
+
+
+_index: Optional[SemanticIndex] = None
+_lock = threading.Lock()
+
+
+def get_semantic_index() -> SemanticIndex:
+    """
+    Devuelve el índice semántico del proceso, abriéndolo si hace falta.
+
+    Returns:
+        Instancia única de SemanticIndex
+    """
+    global _index
+    with _lock:
+        if _index is None:
+            _index = SemanticIndex()
+        return _index
@@ -0,0 +1,102 @@
+"""Módulo de detección especulativa en segundo plano.
+
+En cuanto se sube un video (o se mueve el slider de umbral) se lanza la
+detección completa en un hilo de baja prioridad. El resultado queda en el
+checkpoint de `detection_checkpoint`, así que al pulsar "Analizar":
+
+- si la pasada terminó, la detección carga el checkpoint completo al instante;
+- si sigue en marcha, se espera a que termine (se une a ella);
+- si el umbral cambió, la pasada anterior se detiene y su progreso queda
+  guardado por si se vuelve a ese umbral.
+
+Los trabajos se identifican por la ruta de su checkpoint (contenido del
+video + umbral), no por la ruta del archivo subido: dos sesiones que suben
+el mismo episodio comparten una sola pasada y un solo escritor del checkpoint.
+"""
+
+import logging
+from pathlib import Path
+from typing import Optional
+
+from .background_jobs import BackgroundJob, find_jobs, get_job, start_job
+from .detection_checkpoint import checkpoint_path_for
+from .scene_detection import SceneDetector, DetectionCancelled
+from .video_proxy import video_cache_key
+
+# Incremento de "nice" para el hilo especulativo (solo Linux; en otros SO se ignora)
+BACKGROUND_NICENESS = 10
+
+JOB_PREFIX = 'speculative:'
+
+
+def _job_key(video_path: str, threshold: float) -> str:
+    return f"{JOB_PREFIX}{checkpoint_path_for(video_path, float(threshold))}"
+
+
+def _jobs_for_video(video_path: Optional[str] = None):
+    """Trabajos especulativos de un video (por contenido), o todos."""
+    jobs = find_jobs(JOB_PREFIX)
+    if video_path is None:
+        return jobs
+    content_key = f"{video_cache_key(video_path)}_"
+    return [job for job in jobs if Path(job.key[len(JOB_PREFIX):]).name.startswith(content_key)]
+
+
+def start_speculative_detection(video_path: str, threshold: float) -> BackgroundJob:
+    """
+    Lanza (o reutiliza) la detección especulativa para un video y umbral.
+
+    Detiene las pasadas del mismo video con otros umbrales para no
+    competir por la CPU. Si otra sesión ya lanzó la misma pasada (mismo
+    contenido y umbral) se devuelve esa.
+
+    Args:
+        video_path: Ruta al archivo de video
+        threshold: Umbral de detección
+
+    Returns:
+        Trabajo en curso o terminado
+    """
+    key = _job_key(video_path, threshold)
+    for job in _jobs_for_video(video_path):
+        if job.key != key and job.running:
+            job.cancel()
+
+    def run(job: BackgroundJob) -> None:
+        try:
+            detector = SceneDetector(video_path, threshold)
+            detector.detect_scenes(progress_callback=lambda message: setattr(job, 'message', message),
+                                   stop_event=job.stop_event)
+            job.message = "Completada"
+            print(f"[TERMINAL SPECULATIVE] ✅ Detección especulativa completada (umbral {threshold:g})")
+        except DetectionCancelled:
+            job.message = "Detenida"
+
+    job = start_job(key, run, name=f'speculative-{threshold:g}', niceness=BACKGROUND_NICENESS)
+    logging.info(f"Detección especulativa: {video_path} (umbral {threshold:g}, {job.status})")
+    return job
+
+
+def get_speculative_job(video_path: str, threshold: float) -> Optional[BackgroundJob]:
+    """
+    Devuelve el trabajo especulativo para un video y umbral, si existe.
+
+    Args:
+        video_path: Ruta al archivo de video
+        threshold: Umbral de detección
+
+    Returns:
+        BackgroundJob o None
+    """
+    return get_job(_job_key(video_path, threshold))
+
+
+def cancel_speculative_detection(video_path: Optional[str] = None) -> None:
+    """
+    Detiene las pasadas especulativas en curso.
+
+    Args:
+        video_path: Solo las de este video, por contenido (None = todas)
+    """
+    for job in _jobs_for_video(video_path):
+        job.cancel()
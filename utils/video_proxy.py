@@ -0,0 +1,382 @@
+"""Módulo de proxies de reproducción y servidor HTTP local con rangos.
+
+`st.video(ruta)` lee y envía el archivo completo al navegador en cada
+rerun. Aquí cada episodio se transcodifica una sola vez a una versión
+ligera (baja resolución, keyframes frecuentes, `faststart`) y se sirve
+desde un servidor HTTP local que soporta peticiones `Range`, de modo que
+el reproductor solo recibe una URL y pide los bytes que necesita.
+
+URLs públicas: el servidor escucha en `ST_PROXY_HOST`:`ST_PROXY_PORT`, pero
+la URL que recibe el navegador se construye aparte:
+
+- con `ST_PROXY_PUBLIC_URL` (ej. `https://curator.example.com/media`) si
+  el servidor está detrás de un proxy inverso en el mismo origen que la app;
+  es la única opción válida cuando la app se sirve por HTTPS (el navegador
+  bloquea un video `http://` dentro de una página `https://`);
+- si no, con el host por el que el navegador accede a la app y el puerto
+  del servidor, así que un navegador remoto funciona si el servidor escucha
+  en una interfaz accesible (`ST_PROXY_HOST=0.0.0.0`) y el puerto es fijo
+  y está abierto (`ST_PROXY_PORT`).
+"""
+
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import subprocess
+import threading
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlsplit
+
+from .background_jobs import BackgroundJob, atomic_output, cache_dir, get_job, start_job
+
+# Configuración del proxy
+PROXY_HEIGHT = 360
+PROXY_KEYINT = 24  # Un keyframe por segundo aprox. (seek rápido)
+PROXY_DIR = cache_dir('proxies', 'ST_PROXY_DIR')
+
+# Configuración del servidor local
+SERVER_HOST = os.environ.get('ST_PROXY_HOST', '127.0.0.1')
+SERVER_PORT = int(os.environ.get('ST_PROXY_PORT', '0'))  # 0 = puerto libre
+PUBLIC_URL = os.environ.get('ST_PROXY_PUBLIC_URL', '').rstrip('/')
+CHUNK_SIZE = 256 * 1024
+KEY_SAMPLE_SIZE = 1024 * 1024
+
+_RANGE_RE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+def video_cache_key(video_path: str) -> str:
+    """
+    Genera una clave estable para un video a partir de su contenido.
+
+    Se usa el tamaño más una muestra del inicio y del final del archivo, así
+    que volver a subir el mismo episodio (con otro nombre temporal) reutiliza
+    proxies, filmstrips y checkpoints.
+
+    Args:
+        video_path: Ruta al archivo de video
+
+    Returns:
+        Hash corto en hexadecimal
+    """
+    stat = Path(video_path).stat()
+    return _content_key(str(video_path), stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=256)
+def _content_key(video_path: str, size: int, mtime_ns: int) -> str:
+    """Hash de tamaño + primer y último bloque (cacheado por ruta/tamaño/fecha)."""
+    digest = hashlib.sha1(str(size).encode('utf-8'))
+    with open(video_path, 'rb') as f:
+        digest.update(f.read(KEY_SAMPLE_SIZE))
+        if size > 2 * KEY_SAMPLE_SIZE:
+            f.seek(-KEY_SAMPLE_SIZE, os.SEEK_END)
+            digest.update(f.read(KEY_SAMPLE_SIZE))
+    return digest.hexdigest()[:16]
+
+
+def proxy_path_for(video_path: str, height: int = PROXY_HEIGHT) -> Path:
+    """
+    Devuelve la ruta del proxy en caché para un video.
+
+    Args:
+        video_path: Ruta al archivo de video original
+        height: Altura del proxy en píxeles
+
+    Returns:
+        Ruta del archivo proxy (puede no existir todavía)
+    """
+    return PROXY_DIR / f"{video_cache_key(video_path)}_{height}p.mp4"
+
+
+def transcode_proxy(video_path: str, height: int = PROXY_HEIGHT) -> Path:
+    """
+    Transcodifica el video a un proxy ligero con ffmpeg (bloqueante).
+
+    Args:
+        video_path: Ruta al archivo de video original
+        height: Altura del proxy en píxeles
+
+    Returns:
+        Ruta del proxy generado
+    """
+    output = proxy_path_for(video_path, height)
+    if output.exists():
+        return output
+
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg no está instalado o no está en el PATH")
+
+    # Renombrado atómico: un proxy a medias nunca se sirve
+    with atomic_output(output) as partial:
+        cmd = [
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-i', str(video_path),
+            '-vf', f'scale=-2:{height}',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '28',
+            '-g', str(PROXY_KEYINT), '-keyint_min', str(PROXY_KEYINT), '-sc_threshold', '0',
+            '-c:a', 'aac', '-b:a', '96k',
+            '-movflags', '+faststart',
+            str(partial),
+        ]
+        logging.info(f"Generando proxy: {' '.join(cmd)}")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg falló generando el proxy: {result.stderr.strip()}")
+    return output
+
+
+class _RangeRequestHandler(BaseHTTPRequestHandler):
+    """Handler HTTP que sirve archivos registrados con soporte de `Range`."""
+
+    def log_message(self, format, *args):
+        logging.debug(f"[proxy] {self.address_string()} {format % args}")
+
+    def _resolve(self) -> Optional[Path]:
+        token = self.path.lstrip('/').split('?', 1)[0]
+        return self.server.files.get(token)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool) -> None:
+        path = self._resolve()
+        if path is None or not path.exists():
+            self.send_error(404, "Archivo no registrado")
+            return
+
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        status = 200
+
+        range_header = self.headers.get('Range')
+        if range_header:
+            match = _RANGE_RE.fullmatch(range_header.strip())
+            if not match or not (match.group(1) or match.group(2)):
+                self.send_error(416, "Rango inválido")
+                return
+            if match.group(1):
+                start = int(match.group(1))
+                if match.group(2):
+                    end = min(int(match.group(2)), size - 1)
+            else:
+                # bytes=-N -> últimos N bytes
+                start = max(0, size - int(match.group(2)))
+            if start > end or start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.end_headers()
+                return
+            status = 206
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header('Content-Type', mimetypes.guess_type(path.name)[0] or 'application/octet-stream')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(length))
+        self.send_header('Cache-Control', 'public, max-age=86400')
+        if status == 206:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+
+        if not send_body:
+            return
+
+        try:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                remaining = length
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # El navegador cancela peticiones al hacer seek; es normal
+            pass
+
+
+class ProxyServer:
+    """Servidor HTTP local en segundo plano que sirve videos por token."""
+
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                 public_url: str = PUBLIC_URL):
+        """
+        Inicializa y arranca el servidor.
+
+        Args:
+            host: Interfaz donde escuchar
+            port: Puerto (0 = elegir uno libre)
+            public_url: URL base fija para el navegador ('' = derivarla de la página)
+        """
+        self.public_url = public_url.rstrip('/')
+        self._warned = set()
+        self.httpd = ThreadingHTTPServer((host, port), _RangeRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.files = {}  # token -> Path
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='st-proxy-server', daemon=True)
+        self.thread.start()
+        logging.info(f"Servidor de proxies escuchando en {self.base_url}")
+
+    @property
+    def base_url(self) -> str:
+        """URL local del servidor (la interfaz comodín se traduce a loopback)."""
+        host, port = self.httpd.server_address[:2]
+        if host in ('0.0.0.0', '::', ''):
+            host = '127.0.0.1'
+        return f"http://{_url_host(host)}:{port}"
+
+    def public_base_url(self, page_url: Optional[str] = None) -> str:
+        """
+        URL base con la que el navegador alcanza el servidor.
+
+        Args:
+            page_url: URL de la app tal como la ve el navegador (None = desconocida)
+
+        Returns:
+            URL base sin barra final
+        """
+        if self.public_url:
+            return self.public_url
+        if not page_url:
+            return self.base_url
+
+        page = urlsplit(page_url)
+        if not page.hostname:
+            return self.base_url
+        bind_host = self.httpd.server_address[0]
+        if page.scheme == 'https':
+            self._warn_once('https', "La app se sirve por HTTPS y el servidor de proxies por HTTP: "
+                                     "el navegador bloqueará los videos. Configura ST_PROXY_PUBLIC_URL "
+                                     "con un proxy inverso en el mismo origen.")
+        elif bind_host in ('127.0.0.1', '::1', 'localhost') and page.hostname not in ('127.0.0.1', '::1', 'localhost'):
+            self._warn_once('loopback', f"El servidor de proxies solo escucha en {bind_host} pero el navegador "
+                                        f"accede por {page.hostname}; usa ST_PROXY_HOST=0.0.0.0 y un ST_PROXY_PORT fijo.")
+        return f"http://{_url_host(page.hostname)}:{self.httpd.server_address[1]}"
+
+    def _warn_once(self, key: str, message: str) -> None:
+        if key not in self._warned:
+            self._warned.add(key)
+            logging.warning(message)
+
+    def register(self, file_path: Path, page_url: Optional[str] = None) -> str:
+        """
+        Registra un archivo y devuelve su URL para el navegador.
+
+        Args:
+            file_path: Ruta del archivo a servir
+            page_url: URL de la app en el navegador (para derivar el host público)
+
+        Returns:
+            URL absoluta del archivo
+        """
+        file_path = Path(file_path)
+        token = f"{video_cache_key(str(file_path))}{file_path.suffix.lower()}"
+        self.httpd.files[token] = file_path
+        return f"{self.public_base_url(page_url)}/{token}"
+
+    def shutdown(self) -> None:
+        """Detiene el servidor."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_server: Optional[ProxyServer] = None
+_lock = threading.Lock()
+
+
+def _url_host(host: str) -> str:
+    """Host listo para una URL (las IPv6 van entre corchetes)."""
+    return f"[{host}]" if ':' in host else host
+
+
+def get_proxy_server() -> ProxyServer:
+    """
+    Devuelve el servidor de proxies del proceso, arrancándolo si hace falta.
+
+    Returns:
+        Instancia única de ProxyServer
+    """
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ProxyServer()
+        return _server
+
+
+def start_proxy(video_path: str, height: int = PROXY_HEIGHT) -> Optional[BackgroundJob]:
+    """
+    Lanza la transcodificación del proxy en segundo plano (una vez por video).
+
+    Args:
+        video_path: Ruta al archivo de video original
+        height: Altura del proxy en píxeles
+
+    Returns:
+        Trabajo en segundo plano, o None si el proxy ya estaba en caché
+    """
+    output = proxy_path_for(video_path, height)
+    if output.exists():
+        return None
+
+    def run(job: BackgroundJob) -> None:
+        job.message = "Transcodificando proxy"
+        transcode_proxy(video_path, height)
+        print(f"[TERMINAL PROXY] ✅ Proxy listo: {output}")
+
+    return start_job(str(output), run, name=f'proxy-{output.stem}')
+
+
+def get_playback_url(video_path: str, height: int = PROXY_HEIGHT,
+                     page_url: Optional[str] = None) -> str:
+    """
+    Devuelve la URL de reproducción: el proxy si está listo, si no el original.
+
+    En ambos casos el archivo se sirve con soporte de rangos, así que los
+    reruns de Streamlit solo reenvían la URL y nunca los bytes del video.
+
+    Args:
+        video_path: Ruta al archivo de video original
+        height: Altura del proxy en píxeles
+        page_url: URL de la app en el navegador (para derivar el host público)
+
+    Returns:
+        URL HTTP del video
+    """
+    server = get_proxy_server()
+    output = proxy_path_for(video_path, height)
+    if output.exists():
+        return server.register(output, page_url)
+    return server.register(Path(video_path), page_url)
+
+
+def get_proxy_status(video_path: str, height: int = PROXY_HEIGHT) -> str:
+    """
+    Estado del proxy de un video.
+
+    Args:
+        video_path: Ruta al archivo de video original
+        height: Altura del proxy en píxeles
+
+    Returns:
+        'ready', 'running', 'error' o 'missing'
+    """
+    output = proxy_path_for(video_path, height)
+    if output.exists():
+        return 'ready'
+    job = get_job(str(output))
+    if job is None:
+        return 'missing'
+    if job.status == 'error':
+        return 'error'
+    return 'running' if job.running else 'missing'